@@ -0,0 +1,69 @@
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import internals.handlers
+import internals.objects
+from benchmarks.meshes import write_tori
+from benchmarks.suite import light
+from internals.render import Renderer
+from internals.vectors import Vector, Quaternion
+
+
+def run(objects: int, rings: int, segments: int, moving: list[int], frames: int, instances: bool):
+    # instances places copies of a single parsed torus in the same row instead of reading all of them
+    scene = internals.handlers.SceneData()
+    with tempfile.TemporaryDirectory() as directory:
+        write_tori(os.path.join(directory, "tori.obj"), objects=1 if instances else objects,
+                   rings=rings, segments=segments)
+        start = time.perf_counter()
+        scene.read_file(file_path=directory, file_name="tori.obj")
+    if instances:
+        scene.add_instances("Torus.000", [
+            internals.objects.Transform(position=Vector(6 * index, 0, 0)) for index in range(1, objects)
+        ])
+    print(f"{objects} objects, {2 * objects * rings * segments} triangles, "
+          f"loading takes {time.perf_counter() - start:.3f} seconds")
+    print("moving objects\ttransform seconds per frame\tseconds per frame")
+
+    camera_position = Vector(3 * (objects - 1), -6 * objects - 6, 0)
+    camera_angle = Quaternion.from_euler(0, (0, 1, 0))
+    names = list(scene.get_objects().keys())
+
+    for count in moving:
+        transform_timings = []
+        frame_timings = []
+        for frame in range(frames):
+            # the first count objects spin in place, the others stay where they are
+            for name in names[:count]:
+                scene.get_objects()[name].transform.rotation = Quaternion.from_euler(
+                    (frame + 1) * math.pi / 16, (0, 0, 1))
+            start = time.perf_counter()
+            scene.update_transforms()
+            transform_timings.append(time.perf_counter() - start)
+            Renderer(
+                data_handler=scene,
+                tan_fy=math.tan(math.pi / 4),
+                aspect_ratio=1.5,
+                camera_position=camera_position,
+                screen_height=800,
+                camera_angle=camera_angle,
+                light=light,
+            ).render_triangles()
+            frame_timings.append(time.perf_counter() - start)
+        print(f"{count}\t{min(transform_timings):.4f}\t{min(frame_timings):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of moving some objects of a scene every frame")
+    parser.add_argument("--objects", type=int, default=8)
+    parser.add_argument("--rings", type=int, default=150)
+    parser.add_argument("--segments", type=int, default=150)
+    parser.add_argument("--moving", type=int, nargs="+", default=[0, 1, 8])
+    parser.add_argument("--frames", type=int, default=5)
+    parser.add_argument("--instances", action="store_true", help="copy one parsed torus instead of reading all")
+    arguments = parser.parse_args()
+    run(arguments.objects, arguments.rings, arguments.segments, arguments.moving, arguments.frames,
+        arguments.instances)
@@ -0,0 +1,110 @@
+import math
+
+
+def torus_obj_lines(name: str, rings: int, segments: int, offset: tuple = (0, 0, 0),
+                    vertex_start: int = 0, normal_start: int = 0,
+                    major_radius: float = 2, minor_radius: float = 0.7):
+    # Yields the lines of an "o" block with rings * segments quads and one normal per quad.
+    # vertex_start and normal_start are the numbers of records written before this block
+    yield f"o {name}"
+    for i in range(rings):
+        u = 2 * math.pi * i / rings
+        for j in range(segments):
+            v = 2 * math.pi * j / segments
+            yield (f"v {(major_radius + minor_radius * math.cos(v)) * math.cos(u) + offset[0]:.6f} "
+                   f"{(major_radius + minor_radius * math.cos(v)) * math.sin(u) + offset[1]:.6f} "
+                   f"{minor_radius * math.sin(v) + offset[2]:.6f}")
+    for i in range(rings):
+        u = 2 * math.pi * (i + 0.5) / rings
+        for j in range(segments):
+            v = 2 * math.pi * (j + 0.5) / segments
+            yield f"vn {math.cos(v) * math.cos(u):.4f} {math.cos(v) * math.sin(u):.4f} {math.sin(v):.4f}"
+    yield "s 0"
+    for i in range(rings):
+        for j in range(segments):
+            first = vertex_start + i * segments + j + 1
+            second = vertex_start + ((i + 1) % rings) * segments + j + 1
+            third = vertex_start + ((i + 1) % rings) * segments + (j + 1) % segments + 1
+            fourth = vertex_start + i * segments + (j + 1) % segments + 1
+            normal = normal_start + i * segments + j + 1
+            yield f"f {first}//{normal} {second}//{normal} {third}//{normal} {fourth}//{normal}"
+
+
+def write_tori(path: str, objects: int, rings: int, segments: int):
+    # Writes a row of tori along the x axis, every torus has 2 * rings * segments triangles
+    with open(path, "w") as file:
+        for index in range(objects):
+            for line in torus_obj_lines(
+                    name=f"Torus.{index:03}",
+                    rings=rings,
+                    segments=segments,
+                    offset=(6 * index, 0, 0),
+                    vertex_start=index * rings * segments,
+                    normal_start=index * rings * segments,
+            ):
+                file.write(line + "\n")
+
+
+def sphere_obj_lines(name: str, stacks: int, slices: int, offset: tuple = (0, 0, 0),
+                     vertex_start: int = 0, normal_start: int = 0, radius: float = 2):
+    # Yields the lines of an "o" block with a UV sphere, triangle fans at the poles and quads between them,
+    # 2 * (stacks - 1) * slices triangles. Every vertex has its own normal
+    yield f"o {name}"
+    points = [(0, 0, -1)]
+    for i in range(1, stacks):
+        theta = math.pi * i / stacks - math.pi / 2
+        for j in range(slices):
+            phi = 2 * math.pi * j / slices
+            points.append((math.cos(theta) * math.cos(phi), math.cos(theta) * math.sin(phi), math.sin(theta)))
+    points.append((0, 0, 1))
+    for x, y, z in points:
+        yield f"v {radius * x + offset[0]:.6f} {radius * y + offset[1]:.6f} {radius * z + offset[2]:.6f}"
+    for x, y, z in points:
+        yield f"vn {x:.4f} {y:.4f} {z:.4f}"
+    yield "s 1"
+
+    def corner(index):
+        return f"{vertex_start + index + 1}//{normal_start + index + 1}"
+
+    top = len(points) - 1
+    for j in range(slices):
+        yield f"f {corner(0)} {corner(1 + (j + 1) % slices)} {corner(1 + j)}"
+    for i in range(stacks - 2):
+        for j in range(slices):
+            first = 1 + i * slices + j
+            second = 1 + i * slices + (j + 1) % slices
+            yield f"f {corner(first)} {corner(second)} {corner(second + slices)} {corner(first + slices)}"
+    for j in range(slices):
+        ring = 1 + (stacks - 2) * slices
+        yield f"f {corner(ring + j)} {corner(ring + (j + 1) % slices)} {corner(top)}"
+
+
+def write_spheres(path: str, objects: int, stacks: int, slices: int):
+    # Writes a row of spheres along the x axis, every sphere has 2 * (stacks - 1) * slices triangles
+    vertex_count = 2 + (stacks - 1) * slices
+    with open(path, "w") as file:
+        for index in range(objects):
+            for line in sphere_obj_lines(
+                    name=f"Sphere.{index:03}",
+                    stacks=stacks,
+                    slices=slices,
+                    offset=(6 * index, 0, 0),
+                    vertex_start=index * vertex_count,
+                    normal_start=index * vertex_count,
+            ):
+                file.write(line + "\n")
+
+
+def write_shape(path: str, shape: str, triangles: int, objects: int = 1) -> int:
+    # Writes about triangles triangles split between objects tori or spheres, returns the exact count
+    per_object = max(triangles // objects, 8)
+    if shape == "torus":
+        side = max(round(math.sqrt(per_object / 2)), 3)
+        write_tori(path, objects=objects, rings=side, segments=side)
+        return 2 * objects * side * side
+    if shape == "sphere":
+        slices = max(round(math.sqrt(per_object)), 3)
+        stacks = max(round(per_object / (2 * slices)) + 1, 2)
+        write_spheres(path, objects=objects, stacks=stacks, slices=slices)
+        return 2 * objects * (stacks - 1) * slices
+    raise KeyError(f"Unknown shape {shape}")
@@ -0,0 +1,39 @@
+import argparse
+import os
+import tempfile
+import time
+
+import internals.handlers
+from benchmarks.meshes import write_tori
+
+
+def run(objects: int, rings: int, segments: int, worker_counts: list[int], repeats: int):
+    with tempfile.TemporaryDirectory() as directory:
+        write_tori(os.path.join(directory, "tori.obj"), objects=objects, rings=rings, segments=segments)
+        size = os.path.getsize(os.path.join(directory, "tori.obj"))
+        print(f"{objects} objects, {2 * objects * rings * segments} triangles, {size / 1e6:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+        print("workers\tseconds\tMB/s\tspeedup")
+
+        baseline = None
+        for workers in worker_counts:
+            timings = []
+            for _ in range(repeats):
+                reader = internals.handlers.FileHandler(file_path=directory, file_name="tori.obj")
+                start = time.perf_counter()
+                reader.interpret_file(workers=workers)
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            baseline = baseline or best
+            print(f"{workers}\t{best:.3f}\t{size / 1e6 / best:.1f}\t{baseline / best:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel OBJ loading scaling")
+    parser.add_argument("--objects", type=int, default=8)
+    parser.add_argument("--rings", type=int, default=200)
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeats", type=int, default=3)
+    arguments = parser.parse_args()
+    run(arguments.objects, arguments.rings, arguments.segments, arguments.workers, arguments.repeats)
@@ -0,0 +1,68 @@
+import argparse
+import math
+import os
+import tempfile
+import time
+
+import internals.handlers
+import internals.parallel
+from benchmarks.meshes import write_tori
+from benchmarks.suite import light
+from internals.render import Renderer
+from internals.vectors import Vector, Quaternion
+
+
+def run(objects: int, rings: int, segments: int, worker_counts: list[int], frames: int):
+    scene = internals.handlers.SceneData()
+    with tempfile.TemporaryDirectory() as directory:
+        write_tori(os.path.join(directory, "tori.obj"), objects=objects, rings=rings, segments=segments)
+        scene.read_file(file_path=directory, file_name="tori.obj")
+    print(f"{objects} objects, {2 * objects * rings * segments} triangles, {os.cpu_count()} CPUs")
+    print("workers\tseconds per frame\tframes/s\tspeedup")
+
+    # the camera sees the whole row of tori, so nothing is simplified or culled by the hierarchy
+    camera_position = Vector(3 * (objects - 1), -6 * objects - 6, 0)
+    camera_angle = Quaternion.from_euler(0, (0, 1, 0))
+
+    def frame(render_pool):
+        renderer = Renderer(
+            data_handler=scene,
+            tan_fy=math.tan(math.pi / 4),
+            aspect_ratio=1.5,
+            camera_position=camera_position,
+            screen_height=800,
+            camera_angle=camera_angle,
+            light=light,
+            lod_tolerance=0,
+            render_pool=render_pool,
+        )
+        return renderer.render_triangles()
+
+    baseline = None
+    for workers in worker_counts:
+        render_pool = internals.parallel.RenderPool(workers=workers) if workers > 1 else None
+        try:
+            # the first frame starts the workers and copies the mesh into shared memory
+            frame(render_pool)
+            timings = []
+            for _ in range(frames):
+                start = time.perf_counter()
+                frame(render_pool)
+                timings.append(time.perf_counter() - start)
+        finally:
+            if render_pool is not None:
+                render_pool.close()
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{workers}\t{best:.3f}\t{1 / best:.1f}\t{baseline / best:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame rendering scaling with worker processes")
+    parser.add_argument("--objects", type=int, default=4)
+    parser.add_argument("--rings", type=int, default=300)
+    parser.add_argument("--segments", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--frames", type=int, default=5)
+    arguments = parser.parse_args()
+    run(arguments.objects, arguments.rings, arguments.segments, arguments.workers, arguments.frames)
@@ -0,0 +1,184 @@
+import argparse
+import json
+import math
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import internals.handlers
+import internals.raster
+import internals.rgb
+from benchmarks.meshes import write_shape
+from internals.render import Renderer
+from internals.vectors import Vector, Quaternion, rotate_vector_by_quaternion
+
+light = internals.rgb.Light(
+    intensity=1,
+    direction=Vector(-1, -1, -1),
+    albedo=0.18,
+    color=internals.rgb.RGB(255, 255, 255)
+)
+
+
+def measure(function, repeats: int, number: int = 1, memory: bool = False) -> dict:
+    # Best of repeats runs of number calls in seconds per call. The peak of Python and numpy
+    # allocations is taken in one extra run, tracemalloc slows the calls down too much to time them
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    result = {"seconds": min(timings), "median": float(np.median(timings))}
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def bench_vectors(repeats: int) -> dict:
+    results = dict()
+    vector = Vector(1, 2, 3)
+    quaternion = Quaternion.from_euler(0.3, (0, 0, 1))
+    other = Quaternion.from_euler(0.2, (1, 0, 0))
+    results["vector * scalar"] = measure(lambda: vector * 1.5, repeats, number=10000)
+    results["vector dot product"] = measure(lambda: vector.dot_product(Vector(3, 2, 1)), repeats, number=10000)
+    results["vector normalize"] = measure(lambda: vector.normalize(), repeats, number=10000)
+    results["quaternion * quaternion"] = measure(lambda: quaternion * other, repeats, number=10000)
+    results["quaternion from euler"] = measure(lambda: Quaternion.from_euler(0.3, (0, 0, 1)), repeats, number=10000)
+    results["rotate vector"] = measure(lambda: rotate_vector_by_quaternion(vector, quaternion), repeats, number=10000)
+    points = np.random.default_rng(0).normal(size=(100000, 3))
+    results["rotate 100000 points"] = measure(lambda: quaternion.rotate_many(points), repeats, number=10)
+    return results
+
+
+def bench_parsing(directory: str, file_name: str, repeats: int) -> dict:
+    size = os.path.getsize(os.path.join(directory, file_name))
+    result = measure(
+        lambda: internals.handlers.FileHandler(file_path=directory, file_name=file_name).interpret_file(),
+        repeats,
+        memory=True,
+    )
+    result["megabytes_per_second"] = size / 1e6 / result["seconds"]
+    return result
+
+
+def bench_rendering(directory: str, file_name: str, triangles: int, repeats: int) -> dict:
+    # Frames of the whole model from a camera 3 radii away, with and without simplified levels
+    scene = internals.handlers.SceneData()
+    scene.read_file(file_path=directory, file_name=file_name)
+    vertices = scene.get_mesh().vertices
+    center = (vertices.max(axis=0) + vertices.min(axis=0)) / 2
+    radius = float(np.linalg.norm(vertices.max(axis=0) - vertices.min(axis=0))) / 2
+    camera_position = Vector(float(center[0]), float(center[1] - 3 * radius), float(center[2]))
+    camera_angle = Quaternion.from_euler(0, (0, 1, 0))
+
+    def renderer(**kwargs) -> Renderer:
+        return Renderer(
+            data_handler=scene,
+            tan_fy=math.tan(math.pi / 4),
+            aspect_ratio=1.5,
+            camera_position=camera_position,
+            screen_height=800,
+            camera_angle=camera_angle,
+            light=light,
+            **kwargs,
+        )
+
+    rasterizer = internals.raster.Rasterizer(width=1200, height=800)
+    results = {
+        "polygons": measure(lambda: renderer(lod_tolerance=0).render_polygons(), repeats, memory=True),
+        "polygons with levels": measure(lambda: renderer().render_polygons(), repeats),
+        "raster frame": measure(lambda: renderer(lod_tolerance=0).render_frame(rasterizer), repeats, memory=True),
+    }
+    for result in results.values():
+        result["triangles_per_second"] = triangles / result["seconds"]
+    return results
+
+
+def run(shapes: list[str], triangle_counts: list[int], objects: int, repeats: int, groups: list[str]) -> dict:
+    # Results as {group: {case: {measure: value}}}, cases of meshes are named after their shape and size
+    results = {"system": {"python": platform.python_version(), "numpy": np.__version__,
+                          "machine": platform.machine(), "cpus": os.cpu_count()}}
+    if "vectors" in groups:
+        results["vectors"] = bench_vectors(repeats)
+    if "parsing" not in groups and "rendering" not in groups:
+        return results
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shape in shapes:
+            for triangles in triangle_counts:
+                file_name = f"{shape}_{triangles}.obj"
+                exact = write_shape(os.path.join(directory, file_name), shape, triangles, objects=objects)
+                case = f"{shape} {exact}"
+                if "parsing" in groups:
+                    results.setdefault("parsing", dict())[case] = bench_parsing(directory, file_name, repeats)
+                if "rendering" in groups:
+                    for name, result in bench_rendering(directory, file_name, exact, repeats).items():
+                        results.setdefault("rendering", dict())[f"{case} {name}"] = result
+                os.remove(os.path.join(directory, file_name))
+    return results
+
+
+def _format(key: str, value) -> str:
+    if key == "peak_bytes":
+        return f"{value / 2 ** 20:.1f} MiB"
+    if key in ("seconds", "median"):
+        return f"{value * 1000:.3f} ms" if value >= 1e-4 else f"{value * 1e6:.2f} us"
+    if key == "megabytes_per_second":
+        return f"{value:.1f} MB/s"
+    if key == "triangles_per_second":
+        return f"{value / 1e6:.2f} M triangles/s"
+    return str(value)
+
+
+def report(results: dict, baseline: dict | None = None, threshold: float = 0.1) -> str:
+    # One line per case. Against a baseline the best time is compared, changes within threshold are noise
+    lines = []
+    for group, cases in results.items():
+        if group == "system":
+            lines.append(", ".join(f"{key} {value}" for key, value in cases.items()))
+            continue
+        lines.append(f"\n{group}")
+        for case, result in cases.items():
+            line = f"  {case:<40}" + "  ".join(_format(key, value) for key, value in result.items())
+            previous = (baseline or dict()).get(group, dict()).get(case)
+            if previous is not None:
+                ratio = previous["seconds"] / result["seconds"]
+                verdict = "faster" if ratio > 1 + threshold else "slower" if ratio < 1 - threshold else "same"
+                line += f"  | {ratio:.2f}x {verdict}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Timings of vector math, OBJ parsing and rendering")
+    parser.add_argument("--groups", nargs="+", choices=("vectors", "parsing", "rendering"),
+                        default=["vectors", "parsing", "rendering"])
+    parser.add_argument("--shapes", nargs="+", choices=("torus", "sphere"), default=["torus", "sphere"])
+    parser.add_argument("--triangles", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="approximate triangle counts of the generated meshes, millions work but take a while")
+    parser.add_argument("--objects", type=int, default=1, help="objects the triangles are split between")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="write the results as JSON, to be used as a later baseline")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change that counts as a difference")
+    arguments = parser.parse_args()
+
+    current = run(arguments.shapes, arguments.triangles, arguments.objects, arguments.repeats, arguments.groups)
+    previous = None
+    if arguments.baseline is not None:
+        with open(arguments.baseline) as file:
+            previous = json.load(file)
+    print(report(current, previous, arguments.threshold))
+    if arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump(current, file, indent=2)
@@ -0,0 +1,242 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import internals.handlers
+import internals.parallel
+import internals.profiler
+import internals.raster
+import internals.rgb
+from internals.render import Renderer
+from internals.vectors import Vector, Quaternion
+
+default_light = internals.rgb.Light(
+    intensity=1,
+    direction=Vector(-1, -1, -1),
+    albedo=0.18,
+    color=internals.rgb.RGB(255, 255, 255)
+)
+
+
+def read_camera_path(path: str) -> list[tuple[Vector, Quaternion]]:
+    # One frame per line: position x y z followed by the camera quaternion w x y z
+    cameras = []
+    with open(path) as file:
+        for line_number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line[0] == "#":
+                continue
+            values = list(map(float, line.split()))
+            if len(values) != 7:
+                raise ValueError(f"Expected 7 values at line {line_number} of {path} but got {len(values)}")
+            cameras.append((Vector(*values[:3]), Quaternion(*values[3:])))
+    return cameras
+
+
+def turntable(frames: int, distance: float, height: float = 0) -> list[tuple[Vector, Quaternion]]:
+    # Cameras on a circle around the z axis, all looking at the origin
+    cameras = []
+    for frame in range(frames):
+        angle = 2 * math.pi * frame / frames
+        position = Vector(distance * math.sin(angle), -distance * math.cos(angle), height)
+        pitch = math.atan2(height, distance)
+        camera_angle = Quaternion.from_euler(pitch, (1, 0, 0)) * Quaternion.from_euler(-angle, (0, 0, 1))
+        cameras.append((position, camera_angle))
+    return cameras
+
+
+class FrameRenderer:
+    # Renders frames of one model into image files without Tk
+    _data_handler: internals.handlers.SceneData
+    _rasterizer: internals.raster.Rasterizer
+    width: int
+    height: int
+    fov: float
+    light: internals.rgb.Light
+    output_directory: str
+    image_format: str
+    triangle_budget: int | None
+    profiler: internals.profiler.Profiler | None
+    render_pool: internals.parallel.RenderPool | None
+
+    def __init__(self, model_path: str, width: int, height: int, output_directory: str, fov: float = math.pi / 2,
+                 light: internals.rgb.Light = default_light, image_format: str = "png",
+                 cache_directory: str | None = None, triangle_budget: int | None = None,
+                 profiler: internals.profiler.Profiler | None = None, render_workers: int = 1):
+        if image_format not in ("png", "ppm"):
+            raise KeyError(f"Unknown image format {image_format}")
+        self._data_handler = internals.handlers.SceneData()
+        self._data_handler.read_file(
+            file_path=os.path.dirname(model_path) or ".",
+            file_name=os.path.basename(model_path),
+            cache_directory=cache_directory,
+        )
+        self._rasterizer = internals.raster.Rasterizer(width=width, height=height)
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.light = light
+        self.output_directory = output_directory
+        self.image_format = image_format
+        self.triangle_budget = triangle_budget
+        self.profiler = internals.profiler.disabled if profiler is None else profiler
+        # render_workers > 1 splits the triangles of every frame between that many processes
+        self.render_pool = internals.parallel.RenderPool(workers=render_workers) if render_workers > 1 else None
+
+    def close(self):
+        if self.render_pool is not None:
+            self.render_pool.close()
+
+    def render(self, index: int, camera_position: Vector, camera_angle: Quaternion) -> tuple[str, float]:
+        # Returns the written file and the time it took to render and write it
+        start_time = time.perf_counter()
+        with self.profiler.frame():
+            renderer = Renderer(
+                data_handler=self._data_handler,
+                tan_fy=math.tan(self.fov / 2),
+                aspect_ratio=self.width / self.height,
+                camera_position=camera_position,
+                screen_height=self.height,
+                camera_angle=camera_angle,
+                light=self.light,
+                triangle_budget=self.triangle_budget,
+                profiler=self.profiler,
+                render_pool=self.render_pool,
+            )
+            frame = renderer.render_frame(self._rasterizer)
+
+            path = os.path.join(self.output_directory, f"frame_{index:05}.{self.image_format}")
+            with self.profiler.stage("encode"), open(path, "wb") as file:
+                if self.image_format == "png":
+                    file.write(internals.raster.to_png(frame))
+                else:
+                    file.write(internals.raster.to_ppm(frame))
+        return path, time.perf_counter() - start_time
+
+
+_worker_renderer: FrameRenderer | None = None
+
+
+def _initialize_worker(arguments: tuple, options: dict):
+    global _worker_renderer
+    _worker_renderer = FrameRenderer(*arguments, **options)
+
+
+def _render_in_worker(index: int, camera_position: Vector, camera_angle: Quaternion) -> tuple[str, float]:
+    return _worker_renderer.render(index, camera_position, camera_angle)
+
+
+def render_frames(model_path: str, cameras: list[tuple[Vector, Quaternion]], width: int, height: int,
+                  output_directory: str, workers: int = 1, report=None, **kwargs) -> list[float]:
+    # Renders one image per camera and returns the per-frame times.
+    # report, if given, is called as report(index, path, seconds) in frame order.
+    # Keyword arguments are passed to FrameRenderer, a profiler and render_workers > 1 can only be given
+    # when the frames are rendered in one process
+    os.makedirs(output_directory, exist_ok=True)
+    arguments = (model_path, width, height, output_directory)
+
+    timings = []
+    if workers > 1 and cameras and kwargs.get("profiler") is not None:
+        raise ValueError("Profiling needs workers=1, worker processes do not share the profiler")
+    if workers > 1 and cameras and kwargs.get("render_workers", 1) > 1:
+        raise ValueError("Frames and triangles can not both be split between processes")
+    if workers > 1 and cameras:
+        # every worker loads the model once, a cache_directory lets them share the memory-mapped arrays
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                                 initargs=(arguments, kwargs)) as executor:
+            positions, angles = zip(*cameras)
+            for index, (path, seconds) in enumerate(executor.map(_render_in_worker, range(len(cameras)),
+                                                                 positions, angles)):
+                timings.append(seconds)
+                if report is not None:
+                    report(index, path, seconds)
+        return timings
+
+    frame_renderer = FrameRenderer(*arguments, **kwargs)
+    try:
+        for index, (camera_position, camera_angle) in enumerate(cameras):
+            path, seconds = frame_renderer.render(index, camera_position, camera_angle)
+            timings.append(seconds)
+            if report is not None:
+                report(index, path, seconds)
+    finally:
+        frame_renderer.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render frames of a model without a display")
+    parser.add_argument("model", help="path to the .obj file")
+    parser.add_argument("output", help="directory for the rendered frames")
+    cameras = parser.add_mutually_exclusive_group(required=True)
+    cameras.add_argument("--cameras", help="file with one 'x y z qw qx qy qz' camera per line")
+    cameras.add_argument("--turntable", type=int, metavar="FRAMES", help="orbit the origin in this many frames")
+    parser.add_argument("--distance", type=float, default=5, help="turntable distance from the origin")
+    parser.add_argument("--height", type=float, default=0, help="turntable height above the origin")
+    parser.add_argument("--resolution", default="1200x800", help="WIDTHxHEIGHT")
+    parser.add_argument("--fov", type=float, default=90, help="vertical field of view in degrees")
+    parser.add_argument("--intensity", type=float, default=default_light.intensity, help="light intensity")
+    parser.add_argument("--format", choices=("png", "ppm"), default="png")
+    parser.add_argument("--workers", type=int, default=1, help="processes that render whole frames")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="processes that share the triangles of every frame, needs --workers 1")
+    parser.add_argument("--cache", help="directory for the parsed model cache")
+    parser.add_argument("--budget", type=int, help="triangles per frame before distant objects are simplified")
+    parser.add_argument("--profile", help="write per-stage timings to this file, needs --workers 1")
+    parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                        help="summary and frames as JSON or a Chrome trace")
+    arguments = parser.parse_args()
+
+    width, height = map(int, arguments.resolution.lower().split("x"))
+    if arguments.cameras is not None:
+        camera_path = read_camera_path(arguments.cameras)
+    else:
+        camera_path = turntable(arguments.turntable, distance=arguments.distance, height=arguments.height)
+
+    profiler = None
+    if arguments.workers > 1 and arguments.render_workers > 1:
+        parser.error("--render-workers needs --workers 1")
+    if arguments.profile is not None:
+        if arguments.workers > 1:
+            parser.error("--profile needs --workers 1")
+        profiler = internals.profiler.Profiler(history=max(len(camera_path), 1))
+
+    start_time = time.perf_counter()
+    timings = render_frames(
+        model_path=arguments.model,
+        cameras=camera_path,
+        width=width,
+        height=height,
+        output_directory=arguments.output,
+        workers=arguments.workers,
+        report=lambda index, path, seconds: print(f"{path}\t{round(seconds, 3)} seconds"),
+        fov=math.radians(arguments.fov),
+        light=internals.rgb.Light(
+            intensity=arguments.intensity,
+            direction=default_light.direction,
+            albedo=default_light.albedo,
+            color=default_light.color,
+        ),
+        image_format=arguments.format,
+        cache_directory=arguments.cache,
+        triangle_budget=arguments.budget,
+        profiler=profiler,
+        render_workers=arguments.render_workers,
+    )
+    total = time.perf_counter() - start_time
+    if timings:
+        print(f"{len(timings)} frames in {round(total, 3)} seconds, "
+              f"{round(sum(timings) / len(timings), 3)} seconds per frame on average, "
+              f"{round(len(timings) / total, 2)} frames per second")
+    if profiler is not None:
+        print(profiler.report())
+        if arguments.profile_format == "chrome":
+            profiler.export_chrome_trace(arguments.profile)
+        else:
+            profiler.export_json(arguments.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,133 @@
+import bisect
 import math
 from tkinter import *
 from tkinter import ttk
 import time
 
+import numpy as np
+
+import internals.controls
 import internals.handlers
+import internals.parallel
+import internals.profiler
+import internals.raster
 import internals.rgb
-from internals.render import Renderer
+import internals.scheduler
+from internals.render import Renderer, ProjectedTriangles, DepthOrder
 from internals.vectors import Vector, Quaternion
 
 base_camera_position = Vector(0, -5, 0)
 base_camera_angle = Quaternion.from_euler(0, (0, 1, 0))
 
 
+class CanvasLayer:
+    # Keeps one canvas item per mesh triangle between frames. Only items whose coordinates, color or
+    # visibility changed are touched, culled triangles are hidden instead of deleted
+    canvas: Canvas
+    _items: np.ndarray
+    _points: np.ndarray
+    _colors: np.ndarray
+    _shown: np.ndarray
+    _stacking: np.ndarray
+    palette: internals.rgb.HexPalette
+
+    def __init__(self, canvas: Canvas, triangle_count: int, palette: internals.rgb.HexPalette | None = None):
+        self.canvas = canvas
+        self.palette = internals.rgb.HexPalette() if palette is None else palette
+        self._items = np.zeros(triangle_count, dtype=np.int64)
+        self._points = np.zeros((triangle_count, 6))
+        self._colors = np.zeros((triangle_count, 3), dtype=np.int64)
+        self._shown = np.zeros(triangle_count, dtype=bool)
+        # item ids from bottom to top as they are stacked on the canvas
+        self._stacking = np.zeros(0, dtype=np.int64)
+
+    def draw(self, projected: ProjectedTriangles, fills: list[str] | None = None) -> int:
+        # projected must be in drawing order, furthest first, fills are the colors of all mesh triangles,
+        # without them the colors of projected are converted where needed. Returns the number of canvas calls made
+        indexes = projected.indexes
+        points = projected.points.reshape(-1, 6)
+        colors = projected.colors
+        calls = 0
+
+        def fill_colors(mask: np.ndarray) -> list[str]:
+            if fills is None:
+                return self.palette.lookup(colors[mask])
+            return [fills[index] for index in indexes[mask].tolist()]
+
+        created = self._items[indexes] == 0
+        for index, polygon_points, fill in zip(indexes[created].tolist(), points[created].tolist(),
+                                               fill_colors(created)):
+            self._items[index] = self.canvas.create_polygon(polygon_points, fill=fill)
+        calls += int(np.count_nonzero(created))
+
+        existing = ~created
+        moved = existing & (self._points[indexes] != points).any(axis=1)
+        recolored = existing & (self._colors[indexes] != colors).any(axis=1)
+        shown = existing & ~self._shown[indexes]
+
+        for item, polygon_points in zip(self._items[indexes[moved]].tolist(), points[moved].tolist()):
+            self.canvas.coords(item, polygon_points)
+        for item, fill in zip(self._items[indexes[recolored]].tolist(), fill_colors(recolored)):
+            self.canvas.itemconfigure(item, fill=fill)
+        # where hidden items are stacked is not tracked, shown ones are moved on top like new ones
+        for item in self._items[indexes[shown]].tolist():
+            self.canvas.itemconfigure(item, state="normal")
+            self.canvas.tag_raise(item)
+        calls += int(np.count_nonzero(moved)) + int(np.count_nonzero(recolored)) + 2 * int(np.count_nonzero(shown))
+
+        visible = np.zeros(len(self._shown), dtype=bool)
+        visible[indexes] = True
+        hidden = np.flatnonzero(self._shown & ~visible)
+        for item in self._items[hidden].tolist():
+            self.canvas.itemconfigure(item, state="hidden")
+        calls += len(hidden)
+
+        self._points[indexes] = points
+        self._colors[indexes] = colors
+        self._shown = visible
+
+        # the canvas stacks new items on top of the others and shown ones on top of those, each in drawing
+        # order. Items in the longest run that is already in order stay, the rest are raised above their predecessor
+        order = self._items[indexes]
+        still_shown = np.isin(self._stacking, order)
+        current = np.concatenate((self._stacking[still_shown], order[created], order[shown]))
+        if not np.array_equal(current, order):
+            sorter = np.argsort(current)
+            stacked = _increasing_subsequence(sorter[np.searchsorted(current, order, sorter=sorter)])
+            previous_items = order[:-1].tolist()
+            for position in np.flatnonzero(~stacked).tolist():
+                if position:
+                    self.canvas.tag_raise(int(order[position]), previous_items[position - 1])
+                else:
+                    self.canvas.tag_lower(int(order[position]))
+            calls += int(np.count_nonzero(~stacked))
+        self._stacking = order
+        return calls
+
+
+def _increasing_subsequence(sequence: np.ndarray) -> np.ndarray:
+    # Mask of one longest strictly increasing subsequence
+    tails = []
+    tail_positions = []
+    predecessors = [-1] * len(sequence)
+    for position, value in enumerate(sequence.tolist()):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_positions.append(position)
+        else:
+            tails[length] = value
+            tail_positions[length] = position
+        predecessors[position] = tail_positions[length - 1] if length else -1
+
+    mask = np.zeros(len(sequence), dtype=bool)
+    position = tail_positions[-1] if tail_positions else -1
+    while position != -1:
+        mask[position] = True
+        position = predecessors[position]
+    return mask
+
+
 class Window:
     fov = math.pi / 2
     tan_fy = math.tan(fov / 2)
@@ -21,6 +137,25 @@ class Window:
     camera_angle = base_camera_angle
     move_magnitude = 0.5
     rotate_magnitude = math.radians(10)
+    # speeds of held keys per second, WASD moves, R and F move up and down, the arrows, Q and E rotate
+    move_speed = 5
+    rotate_speed = math.radians(90)
+    # held keys are read tick_rate times per second, frames are requested at most target_fps times per second
+    tick_rate = 60
+    target_fps = 30
+    # "canvas" draws every polygon as a canvas item, "raster" draws one z-buffered image
+    backend = "canvas"
+    # triangles per frame before distant objects are simplified further, None for no limit
+    triangle_budget = None
+    # "flat", "smooth" or "object", see Renderer.shading_method. The canvas backend fills smooth triangles
+    # with the average of their corners
+    shading_method = "flat"
+    # steps per channel of the canvas fill colors, fewer steps mean fewer distinct colors for Tk to allocate
+    color_levels = 256
+    # processes that share the triangles of every frame, 1 renders in the window's process
+    render_workers = 1
+    # milliseconds between checks for a finished frame
+    poll_interval = 10
     scene_light = internals.rgb.Light(
         intensity=1,
         direction=internals.vectors.Vector(-1, -1, -1),
@@ -38,12 +173,42 @@ class Window:
 
         # initialize handlers
         self.data_handler = internals.handlers.SceneData()
-        self.data_handler.read_file(file_path="../data", file_name="torus.obj")
+        self.data_handler.read_file(file_path="../data", file_name="torus.obj", cache_directory="../data/.cache")
 
         # initialize and place widgets
         self.canvas = Canvas(self.root, width=int(self.aspect_ratio * self.screen_height), height=self.screen_height,
                              bg='#808080')
         self.canvas.pack()
+        self.rasterizer = internals.raster.Rasterizer(
+            width=int(self.aspect_ratio * self.screen_height),
+            height=self.screen_height,
+            background=internals.rgb.RGB.from_hex('#808080'),
+        )
+        self.image = None
+        self.image_item = None
+        self.palette = internals.rgb.HexPalette(self.color_levels)
+        self.layer = CanvasLayer(self.canvas, triangle_count=len(self.data_handler.get_lod_mesh()),
+                                 palette=self.palette)
+        self.depth_order = DepthOrder()
+        self.render_pool = internals.parallel.RenderPool(self.render_workers) if self.render_workers > 1 else None
+        self.profiler = internals.profiler.Profiler()
+        # p prints the per-stage timings of the last frames
+        self.root.bind("<p>", lambda event: print(self.profiler.report()))
+        # frames are rendered on a background thread and drawn here once they are done
+        self.scheduler = internals.scheduler.RenderScheduler(self._render)
+        self.root.after(self.poll_interval, self._poll)
+
+        self.controller = internals.controls.CameraController(move_speed=self.move_speed,
+                                                              rotate_speed=self.rotate_speed)
+        self.pacer = internals.controls.FramePacer(target_fps=self.target_fps)
+        self.root.bind("<KeyPress>", lambda event: self.controller.press(event.keysym))
+        self.root.bind("<KeyRelease>", lambda event: self.controller.release(event.keysym, time.time()))
+        self.root.bind("<FocusOut>", lambda event: self.controller.release_all())
+        # the camera changed since the last requested frame
+        self.camera_changed = False
+        self.last_tick = time.time()
+        self.root.after(round(1000 / self.tick_rate), self._tick)
+        self.overlay = self.canvas.create_text(8, 8, anchor="nw", text="", fill="white", font="TkFixedFont")
 
         self.rotate_button_frame = Frame(self.root)
         self.rotate_button_frame.pack(side="left")
@@ -91,32 +256,91 @@ class Window:
         self.refresh()
 
     def refresh(self):
+        # Asks for a frame of the current camera on the next tick and returns at once, buttons pressed
+        # while a frame is rendering only cause one more frame of the latest camera
+        self.camera_changed = True
+
+    def _tick(self):
+        now = time.time()
+        try:
+            self.camera_position, self.camera_angle, moved = self.controller.update(
+                self.camera_position, self.camera_angle, elapsed=now - self.last_tick, now=now)
+            self.camera_changed = self.camera_changed or moved
+            if self.camera_changed and self.pacer.ready(now, busy=self.scheduler.busy):
+                self.scheduler.request((self.camera_position, self.camera_angle, now))
+                self.pacer.requested(now)
+                self.camera_changed = False
+        finally:
+            self.last_tick = now
+            self.root.after(round(1000 / self.tick_rate), self._tick)
+
+    def _render(self, request: tuple) -> tuple:
+        # Runs on the scheduler's thread, must not touch the widgets
+        camera_position, camera_angle, request_time = request
         start_time = time.time()
-        self.canvas.delete("all")
-
-        renderer = Renderer(
-            data_handler=self.data_handler,
-            tan_fy=self.tan_fy,
-            aspect_ratio=self.aspect_ratio,
-            camera_position=self.camera_position,
-            screen_height=self.screen_height,
-            camera_angle=self.camera_angle,
-            light=self.scene_light,
-        )
-
-        list_of_polygons = renderer.render_polygons()
-        render_time = time.time()
-
-        for polygon in list_of_polygons:
-            self.canvas.create_polygon(polygon.to_tuple(), fill=polygon.color.to_hex())
-
-        list_of_lines = renderer.render_lines()
-
-        for line in list_of_lines:
-            self.canvas.create_line(line.to_tuple(), fill=line.color, width=2)
+        with self.profiler.frame():
+            renderer = Renderer(
+                data_handler=self.data_handler,
+                tan_fy=self.tan_fy,
+                aspect_ratio=self.aspect_ratio,
+                camera_position=camera_position,
+                screen_height=self.screen_height,
+                camera_angle=camera_angle,
+                light=self.scene_light,
+                depth_order=self.depth_order,
+                shading_method=self.shading_method,
+                triangle_budget=self.triangle_budget,
+                profiler=self.profiler,
+                render_pool=self.render_pool,
+            )
+
+            if self.backend == "raster":
+                frame = renderer.render_frame(self.rasterizer)
+                with self.profiler.stage("encode"):
+                    # encoded here, the rasterizer is free for the next frame once this one is handed over
+                    frame = internals.raster.to_ppm(frame)
+                return frame, None, None, request_time, start_time, time.time()
+
+            projected = renderer.render_triangles()
+            # smooth shaded triangles have their own average colors instead of the cached ones
+            fills = self.data_handler.get_shaded_hex(self.scene_light, self.palette) \
+                if self.shading_method == "flat" else None
+            lines = renderer.render_lines()
+        return projected, fills, lines, request_time, start_time, time.time()
+
+    def _poll(self):
+        try:
+            result = self.scheduler.poll()
+            if result is not None:
+                self._draw(*result)
+        finally:
+            self.root.after(self.poll_interval, self._poll)
+
+    def _draw(self, frame, fills: list[str] | None, lines: list | None,
+              request_time: float, start_time: float, render_time: float):
+        if self.backend == "raster":
+            with self.profiler.stage("draw"):
+                self.image = PhotoImage(data=frame, format="PPM")
+                if self.image_item is None:
+                    self.image_item = self.canvas.create_image(0, 0, image=self.image, anchor="nw")
+                else:
+                    self.canvas.itemconfigure(self.image_item, image=self.image)
+        else:
+            # one draw sample per frame, the polygons and the lines above them
+            with self.profiler.stage("draw", polygons_in=len(frame)) as record:
+                self.layer.draw(frame, fills)
+                # the few axis lines are simply recreated above the polygons
+                self.canvas.delete("line")
+                for line in lines:
+                    self.canvas.create_line(line.to_tuple(), fill=line.color, width=2, tags="line")
+                record.polygons_out = len(frame)
         end_time = time.time()
+        self.pacer.presented(end_time, end_time - request_time)
+        self.canvas.itemconfigure(self.overlay, text=(
+            f"{self.pacer.fps:5.1f} FPS {self.pacer.frame_time * 1000:6.1f} ms {self.pacer.skipped} skipped"))
+        self.canvas.tag_raise(self.overlay)
         print(
-            f'Frame rendered/drawn/total: \t {round(render_time - start_time, 3)} \t {round(end_time - render_time, 3)} \t {round(end_time - start_time, 3)} seconds')
+            f'Frame waited/rendered/drawn/total: \t {round(start_time - request_time, 3)} \t {round(render_time - start_time, 3)} \t {round(end_time - render_time, 3)} \t {round(end_time - request_time, 3)} seconds')
 
     def rotate_left(self):
         self.camera_angle = Quaternion.from_euler(self.rotate_magnitude, (0, 0, 1)) * self.camera_angle
@@ -184,3 +408,6 @@ class Window:
 if __name__ == "__main__":
     window = Window()
     window.root.mainloop()
+    window.scheduler.close()
+    if window.render_pool is not None:
+        window.render_pool.close()
@@ -0,0 +1,215 @@
+import numpy as np
+import internals.objects
+import internals.vectors
+
+
+class BoundingVolumeHierarchy:
+    # Axis-aligned bounding boxes over clusters of triangles. Every object range gets its own root, -1 for
+    # empty ranges. The triangles of a node are the contiguous range start:stop of triangle_order
+    leaf_size: int
+    bounds_min: np.ndarray
+    bounds_max: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    start: np.ndarray
+    stop: np.ndarray
+    roots: np.ndarray
+    triangle_order: np.ndarray
+
+    def __init__(self, mesh: internals.objects.Mesh, object_ranges: list[tuple[int, int]], leaf_size: int = 256,
+                 copies: dict | None = None):
+        # object_ranges are the (start, stop) triangle ranges of every object in the mesh. copies maps the index
+        # of a range to an earlier range with the same triangles, such as copies of one mesh, whose tree is
+        # copied instead of built again
+        self.leaf_size = leaf_size
+        self.triangle_order = np.arange(len(mesh), dtype=np.int64)
+        copies = dict() if copies is None else copies
+
+        first, second, third = mesh.vertices[mesh.triangles.T]
+        self._triangle_min = np.minimum(np.minimum(first, second), third)
+        self._triangle_max = np.maximum(np.maximum(first, second), third)
+        self._centroids = (first + second + third) / 3
+
+        self._nodes = []
+        self._bounds_min = []
+        self._bounds_max = []
+        roots = []
+        sizes = dict()
+        for index, (start, stop) in enumerate(object_ranges):
+            if stop <= start:
+                roots.append(-1)
+                continue
+            count = len(self._nodes)
+            if index in copies:
+                source = copies[index]
+                roots.append(self._copy(roots[source], sizes[roots[source]], object_ranges[source][0], start))
+            else:
+                roots.append(self._build(start, stop))
+            sizes[roots[-1]] = len(self._nodes) - count
+        nodes = np.array(self._nodes, dtype=np.int64).reshape(-1, 4)
+        self.left, self.right, self.start, self.stop = nodes.T.copy()
+        self.bounds_min = np.array(self._bounds_min).reshape(-1, 3)
+        self.bounds_max = np.array(self._bounds_max).reshape(-1, 3)
+        self.roots = np.array(roots, dtype=np.int64)
+
+        del self._triangle_min, self._triangle_max, self._centroids, self._nodes, self._bounds_min, self._bounds_max
+
+    def _copy(self, root: int, size: int, source_start: int, start: int) -> int:
+        # Appends the size nodes of the tree at root for the same triangles from start on. Nodes are numbered
+        # depth first, so the nodes of a tree are the ones following its root
+        index = len(self._nodes)
+        shift = start - source_start
+        for left, right, node_start, node_stop in self._nodes[root:root + size]:
+            self._nodes.append([
+                left if left == -1 else left - root + index,
+                right if right == -1 else right - root + index,
+                node_start + shift,
+                node_stop + shift,
+            ])
+        self._bounds_min.extend(self._bounds_min[root:root + size])
+        self._bounds_max.extend(self._bounds_max[root:root + size])
+        source_stop = self._nodes[root][3]
+        self.triangle_order[start:start + source_stop - source_start] = \
+            self.triangle_order[source_start:source_stop] + shift
+        return index
+
+    def _build(self, start: int, stop: int) -> int:
+        triangles = self.triangle_order[start:stop]
+        index = len(self._nodes)
+        self._nodes.append([-1, -1, start, stop])
+        self._bounds_min.append(None)
+        self._bounds_max.append(None)
+
+        if stop - start <= self.leaf_size:
+            self._bounds_min[index] = self._triangle_min[triangles].min(axis=0)
+            self._bounds_max[index] = self._triangle_max[triangles].max(axis=0)
+            return index
+
+        # median split along the longest axis of the centroids
+        centroids = self._centroids[triangles]
+        axis = int(np.argmax(centroids.max(axis=0) - centroids.min(axis=0)))
+        middle = (stop - start) // 2
+        self.triangle_order[start:stop] = triangles[np.argpartition(centroids[:, axis], middle)]
+
+        left = self._nodes[index][0] = self._build(start, start + middle)
+        right = self._nodes[index][1] = self._build(start + middle, stop)
+        self._bounds_min[index] = np.minimum(self._bounds_min[left], self._bounds_min[right])
+        self._bounds_max[index] = np.maximum(self._bounds_max[left], self._bounds_max[right])
+        return index
+
+    def __len__(self):
+        return len(self.left)
+
+    def refit(self, mesh: internals.objects.Mesh, object_ranges: list[int]):
+        # Recomputes the boxes of the given object ranges after their triangles moved in mesh. The tree is kept,
+        # it stays valid for rigidly moved objects. All ranges are refitted together, leaves first
+        # and then their parents one depth at a time
+        roots = self.roots[np.asarray(object_ranges, dtype=np.int64)]
+        depths = []
+        frontier = roots[roots != -1]
+        while len(frontier):
+            depths.append(frontier)
+            inner = frontier[self.left[frontier] != -1]
+            frontier = np.concatenate((self.left[inner], self.right[inner]))
+        if not depths:
+            return
+
+        nodes = np.concatenate(depths)
+        leaves = nodes[self.left[nodes] == -1]
+        counts = self.stop[leaves] - self.start[leaves]
+        offsets = np.cumsum(counts) - counts
+        positions = np.arange(int(counts.sum())) + np.repeat(self.start[leaves] - offsets, counts)
+        first, second, third = mesh.vertices[mesh.triangles[self.triangle_order[positions]].T]
+        # elementwise over the three corners, reducing the short middle axis is several times slower
+        self.bounds_min[leaves] = np.minimum.reduceat(np.minimum(np.minimum(first, second), third), offsets)
+        self.bounds_max[leaves] = np.maximum.reduceat(np.maximum(np.maximum(first, second), third), offsets)
+        for depth in reversed(depths):
+            inner = depth[self.left[depth] != -1]
+            left, right = self.left[inner], self.right[inner]
+            self.bounds_min[inner] = np.minimum(self.bounds_min[left], self.bounds_min[right])
+            self.bounds_max[inner] = np.maximum(self.bounds_max[left], self.bounds_max[right])
+
+    def cull(self, camera_position: internals.vectors.Vector, camera_angle: internals.vectors.Quaternion,
+             tan_fy: float, aspect_ratio: float, near: float = 0.1,
+             object_ranges: np.ndarray | None = None) -> tuple[np.ndarray, int, int]:
+        # Returns the sorted indexes of triangles in nodes that may intersect the view frustum,
+        # the number of tested nodes and the number of nodes rejected as a whole.
+        # object_ranges, if given, are the indexes of the only object ranges to consider
+        frontier = self.roots if object_ranges is None else self.roots[object_ranges]
+        frontier = frontier[frontier != -1]
+
+        # whole objects whose bounding sphere is outside are rejected before their boxes are tested,
+        # the sphere is around the box, so they would have been rejected by the box too
+        outside = self._outside_spheres(frontier, camera_position, camera_angle, tan_fy, aspect_ratio, near)
+        tested = int(np.count_nonzero(outside))
+        culled = tested
+        frontier = frontier[~outside]
+
+        ranges = []
+        while len(frontier):
+            inside, outside = self._classify(frontier, camera_position, camera_angle, tan_fy, aspect_ratio, near)
+            tested += len(frontier)
+            culled += int(np.count_nonzero(outside))
+
+            # nodes fully inside and leaves crossing the frustum are taken as a whole
+            leaf = self.left[frontier] == -1
+            taken = frontier[inside | (~outside & leaf)]
+            ranges.extend(zip(self.start[taken].tolist(), self.stop[taken].tolist()))
+
+            split = frontier[~inside & ~outside & ~leaf]
+            frontier = np.concatenate((self.left[split], self.right[split]))
+
+        if not ranges:
+            return np.zeros(0, dtype=np.int64), tested, culled
+        triangles = np.concatenate([self.triangle_order[start:stop] for start, stop in ranges])
+        triangles.sort()
+        return triangles, tested, culled
+
+    def _outside_spheres(self, nodes: np.ndarray, camera_position: internals.vectors.Vector,
+                         camera_angle: internals.vectors.Quaternion, tan_fy: float, aspect_ratio: float,
+                         near: float) -> np.ndarray:
+        # Whether the spheres around the boxes of nodes are entirely behind one of the planes of _classify
+        low, high = self.bounds_min[nodes], self.bounds_max[nodes]
+        center = camera_angle.rotate_many((low + high) / 2 - np.array(camera_position.to_tuple()))
+        # the rotation matrix of a quaternion rounded to 4 digits also scales by its squared length
+        w, x, y, z = camera_angle.to_tuple()
+        radius = np.linalg.norm(high - low, axis=1) / 2 * (w * w + x * x + y * y + z * z)
+        x, y, z = center[:, 0], center[:, 1], center[:, 2]
+        horizontal = tan_fy * aspect_ratio
+        return (
+            (y - near < -radius)
+            | ((y * horizontal + x) / np.hypot(horizontal, 1) < -radius)
+            | ((y * horizontal - x) / np.hypot(horizontal, 1) < -radius)
+            | ((y * tan_fy + z) / np.hypot(tan_fy, 1) < -radius)
+            | ((y * tan_fy - z) / np.hypot(tan_fy, 1) < -radius)
+        )
+
+    def _classify(self, nodes: np.ndarray, camera_position: internals.vectors.Vector,
+                  camera_angle: internals.vectors.Quaternion, tan_fy: float, aspect_ratio: float,
+                  near: float) -> tuple[np.ndarray, np.ndarray]:
+        # Tests the 8 corners of every box against the near and the 4 side planes in camera space
+        low, high = self.bounds_min[nodes], self.bounds_max[nodes]
+        corners = np.stack([
+            np.stack((
+                high[:, 0] if i & 1 else low[:, 0],
+                high[:, 1] if i & 2 else low[:, 1],
+                high[:, 2] if i & 4 else low[:, 2],
+            ), axis=1)
+            for i in range(8)
+        ], axis=1)
+
+        rotated = camera_angle.rotate_many(
+            corners.reshape(-1, 3) - np.array(camera_position.to_tuple())
+        ).reshape(-1, 8, 3)
+        x, y, z = rotated[:, :, 0], rotated[:, :, 1], rotated[:, :, 2]
+        planes = np.stack((
+            y - near,
+            y * tan_fy * aspect_ratio + x,
+            y * tan_fy * aspect_ratio - x,
+            y * tan_fy + z,
+            y * tan_fy - z,
+        ), axis=2)
+
+        inside = (planes >= 0).all(axis=(1, 2))
+        outside = (planes < 0).all(axis=1).any(axis=1)
+        return inside, outside
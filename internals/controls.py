@@ -0,0 +1,149 @@
+import collections
+import internals.vectors
+
+# held keys and the camera space direction they move in, the same directions as the window's buttons
+MOVE_KEYS = {
+    "w": (0, 1, 0),
+    "s": (0, -1, 0),
+    "a": (-1, 0, 0),
+    "d": (1, 0, 0),
+    "r": (0, 0, -1),
+    "f": (0, 0, 1),
+}
+# held keys and the axes they rotate the camera around
+ROTATE_KEYS = {
+    "Left": (0, 0, 1),
+    "Right": (0, 0, -1),
+    "Up": (1, 0, 0),
+    "Down": (-1, 0, 0),
+    "q": (0, -1, 0),
+    "e": (0, 1, 0),
+}
+
+
+class CameraController:
+    # Moves the camera while keys are held, by move_speed units and rotate_speed radians per second of
+    # elapsed time, so the speed does not depend on how often update() is called.
+    # Auto-repeat sends releases immediately followed by presses, so a release only counts
+    # when the key is not pressed again within repeat_delay seconds
+    move_speed: float
+    rotate_speed: float
+    repeat_delay: float
+    _held: set
+    _released: dict
+
+    def __init__(self, move_speed: float, rotate_speed: float, repeat_delay: float = 0.05):
+        self.move_speed = move_speed
+        self.rotate_speed = rotate_speed
+        self.repeat_delay = repeat_delay
+        self._held = set()
+        self._released = dict()
+
+    @staticmethod
+    def _key(keysym: str) -> str:
+        return keysym.lower() if len(keysym) == 1 else keysym
+
+    def press(self, keysym: str) -> bool:
+        # Returns whether the key moves the camera
+        key = self._key(keysym)
+        if key not in MOVE_KEYS and key not in ROTATE_KEYS:
+            return False
+        self._held.add(key)
+        self._released.pop(key, None)
+        return True
+
+    def release(self, keysym: str, now: float):
+        key = self._key(keysym)
+        if key in self._held:
+            self._released[key] = now
+
+    def release_all(self):
+        self._held.clear()
+        self._released.clear()
+
+    @property
+    def active(self) -> bool:
+        return bool(self._held)
+
+    def update(self, camera_position: internals.vectors.Vector, camera_angle: internals.vectors.Quaternion,
+               elapsed: float, now: float) -> tuple[internals.vectors.Vector, internals.vectors.Quaternion, bool]:
+        # Integrates the held keys over elapsed seconds, returns the new camera and whether it changed
+        for key, released in list(self._released.items()):
+            if now - released >= self.repeat_delay:
+                self._held.discard(key)
+                del self._released[key]
+        if not self._held or elapsed <= 0:
+            return camera_position, camera_angle, False
+
+        direction = [0, 0, 0]
+        for key in self._held & MOVE_KEYS.keys():
+            direction = [total + component for total, component in zip(direction, MOVE_KEYS[key])]
+        moved = direction != [0, 0, 0]
+        if moved:
+            step = internals.vectors.Vector(*direction).normalize() * float(self.move_speed * elapsed)
+            camera_position = camera_position + internals.vectors.rotate_vector_by_quaternion(
+                step, camera_angle.invert())
+
+        rotated = False
+        for key in sorted(self._held & ROTATE_KEYS.keys()):
+            camera_angle = internals.vectors.Quaternion.from_euler(
+                self.rotate_speed * elapsed, ROTATE_KEYS[key]) * camera_angle
+            rotated = True
+        return camera_position, camera_angle, moved or rotated
+
+
+class FramePacer:
+    # Limits frame requests to target_fps and skips frames while the previous one is still rendering,
+    # the camera keeps moving meanwhile and the next frame shows where it is by then. skipped counts the
+    # frame slots of 1 / target_fps seconds that passed while busy, however often ready() was asked.
+    # Keeps the presentation times and frame times of the last history frames for the overlay
+    target_fps: float
+    skipped: int
+    _last_request: float | None
+    _skip_deadline: float | None
+    _presented: collections.deque
+    _frame_times: collections.deque
+
+    def __init__(self, target_fps: float = 30, history: int = 30):
+        if target_fps <= 0:
+            raise ValueError(f"Expected a positive frame rate but got {target_fps}")
+        self.target_fps = target_fps
+        self.skipped = 0
+        self._last_request = None
+        # the end of the next frame slot that counts as skipped when it passes while busy
+        self._skip_deadline = None
+        self._presented = collections.deque(maxlen=history)
+        self._frame_times = collections.deque(maxlen=history)
+
+    def ready(self, now: float, busy: bool) -> bool:
+        # Whether a frame may be requested now, a False while busy counts as a skipped frame
+        if self._last_request is not None and now - self._last_request < 1 / self.target_fps:
+            return False
+        if busy:
+            if self._skip_deadline is None:
+                self._skip_deadline = now
+            if now >= self._skip_deadline:
+                missed = int((now - self._skip_deadline) * self.target_fps) + 1
+                self.skipped += missed
+                self._skip_deadline += missed / self.target_fps
+            return False
+        return True
+
+    def requested(self, now: float):
+        self._last_request = now
+        self._skip_deadline = now + 1 / self.target_fps
+
+    def presented(self, now: float, frame_time: float):
+        # frame_time is the time from the request until the frame was drawn
+        self._presented.append(now)
+        self._frame_times.append(frame_time)
+
+    @property
+    def fps(self) -> float:
+        if len(self._presented) < 2 or self._presented[-1] == self._presented[0]:
+            return 0
+        return (len(self._presented) - 1) / (self._presented[-1] - self._presented[0])
+
+    @property
+    def frame_time(self) -> float:
+        return sum(self._frame_times) / len(self._frame_times) if self._frame_times else 0
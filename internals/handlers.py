@@ -1,4 +1,12 @@
 from abc import ABC, abstractmethod
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import internals.bvh
+import internals.lod
 import internals.objects
 import internals.vectors
 import internals.rgb
@@ -12,121 +20,467 @@ class NoNormalsException(Exception):
     pass
 
 
+class _ObjectBuilder:
+    # Accumulates the records of one "o" block as numeric array chunks.
+    # Face indexes are kept global (0-based) until build, which makes them local to the object.
+    # A builder without a name collects records that continue an object started earlier in the file
+    name: str | None
+    color: internals.rgb.RGB | None
+    smooth_shading: int | None
+    vertex_start: int
+    normal_start: int
+    vertex_chunks: list
+    normal_chunks: list
+    triangle_chunks: list
+    triangle_normal_chunks: list
+    corner_normal_chunks: list
+
+    def __init__(self, name: str | None, vertex_start: int, normal_start: int):
+        self.name = name
+        self.color = None
+        self.smooth_shading = None if name is None else 0
+        self.vertex_start = vertex_start
+        self.normal_start = normal_start
+        self.vertex_chunks = list()
+        self.normal_chunks = list()
+        self.triangle_chunks = list()
+        self.triangle_normal_chunks = list()
+        self.corner_normal_chunks = list()
+
+    def is_empty(self) -> bool:
+        return not (self.vertex_chunks or self.normal_chunks or self.triangle_chunks) and self.smooth_shading is None
+
+    def extend(self, continuation):
+        self.vertex_chunks.extend(continuation.vertex_chunks)
+        self.normal_chunks.extend(continuation.normal_chunks)
+        self.triangle_chunks.extend(continuation.triangle_chunks)
+        self.triangle_normal_chunks.extend(continuation.triangle_normal_chunks)
+        self.corner_normal_chunks.extend(continuation.corner_normal_chunks)
+        if continuation.smooth_shading is not None:
+            self.smooth_shading = continuation.smooth_shading
+
+    def build(self) -> internals.objects.Object:
+        vertices = _concatenate(self.vertex_chunks, np.float64).reshape(-1, 3)
+        normals = _concatenate(self.normal_chunks, np.float64).reshape(-1, 3)
+        triangles = _concatenate(self.triangle_chunks, np.int64).reshape(-1, 3) - self.vertex_start
+        triangle_normals = _concatenate(self.triangle_normal_chunks, np.int64) - self.normal_start
+        corner_normals = _concatenate(self.corner_normal_chunks, np.int64).reshape(-1, 3) - self.normal_start
+
+        if len(triangles) and (triangles.min() < 0 or triangles.max() >= len(vertices)):
+            raise IndexError(f"Object {self.name} has faces referencing vertices of other objects")
+        if len(corner_normals) and (corner_normals.min() < 0 or corner_normals.max() >= len(normals)):
+            raise IndexError(f"Object {self.name} has faces referencing normals of other objects")
+
+        return internals.objects.Object.from_mesh(
+            name=self.name,
+            color=self.color,
+            smooth_shading=self.smooth_shading,
+            mesh=internals.objects.Mesh(
+                vertices=vertices,
+                normals=normals,
+                triangles=triangles,
+                triangle_normals=triangle_normals,
+                corner_normals=corner_normals,
+            ),
+        )
+
+
+def _concatenate(chunks: list, dtype) -> np.ndarray:
+    if not chunks:
+        return np.zeros(0, dtype=dtype)
+    return np.concatenate(chunks).astype(dtype, copy=False)
+
+
 class FileHandler(_AbstractHandler):
     _file_path: str
     _file_name: str
+    chunk_size: int
 
-    def __init__(self, file_path, file_name):
+    def __init__(self, file_path, file_name, chunk_size: int = 1 << 20):
         self._file_path = file_path
         self._file_name = file_name
+        self.chunk_size = chunk_size
 
-    def read_file(self) -> list[str]:
-        with open(f"{self._file_path}/{self._file_name}") as file:
-            list_of_lines = list(map(lambda x: x.rstrip(), file.readlines()))
+    def read_chunks(self, start: int = 0, stop: int | None = None):
+        # Yields (lines, number of bytes they took) for whole lines between the byte offsets start and stop
+        with open(f"{self._file_path}/{self._file_name}", "rb") as file:
+            file.seek(start)
+            position = start
+            remainder = b""
+            while stop is None or position < stop:
+                size = self.chunk_size if stop is None else min(self.chunk_size, stop - position)
+                data = file.read(size)
+                if not data:
+                    break
+                position += len(data)
+                data = remainder + data
+                last_newline = data.rfind(b"\n")
+                if last_newline == -1:
+                    remainder = data
+                    continue
+                remainder = data[last_newline + 1:]
+                yield data[:last_newline].decode("utf-8").splitlines(), last_newline + 1
+            if remainder:
+                yield remainder.decode("utf-8").splitlines(), len(remainder)
 
-        return list_of_lines
+    def interpret_file(self, progress=None, workers: int = 1) -> dict:
+        # progress, if given, is called as progress(bytes_processed, lines_processed) after every chunk,
+        # or after every file range when the file is parsed by several worker processes
+        if workers > 1:
+            parts = self._parse_parallel(workers=workers, progress=progress)
+        else:
+            parts = [self._parse_range(progress=progress)[0]]
 
-    def interpret_file(self):
-        lines = self.read_file()
-        current_object = "None"
         res = dict()
-        line_number = 0
-        previous_indexes = 0
-        previous_normals = 0
-
-        for line in lines:
-            line_number += 1
-            # print(line)
-            first_space = line.find(" ")
-            prefix = line[:first_space]
-            if prefix == "#":
-                continue
-            data = line[first_space + 1:]
-
-            if prefix == "o":
-                current_object = data
-                if data in res.keys():
-                    raise NameError(f"Two objects have the same name {data} in .OBJ file {self._file_name}")
+        current_object: _ObjectBuilder | None = None
+        for builders in parts:
+            continuation = builders[0]
+            if not continuation.is_empty():
+                if current_object is None:
+                    raise KeyError(f"Got records before any object while reading {self._file_name}")
+                current_object.extend(continuation)
+            for builder in builders[1:]:
+                if builder.name in res.keys():
+                    raise NameError(f"Two objects have the same name {builder.name} in .OBJ file {self._file_name}")
+                builder.color = internals.rgb.next_color()
+                res[builder.name] = builder
+                current_object = builder
+
+        return {name: builder.build() for name, builder in res.items()}
+
+    def _parse_parallel(self, workers: int, progress=None) -> list[list[_ObjectBuilder]]:
+        # The file is split into line-aligned byte ranges. Vertex and normal records are counted first,
+        # so every range knows its global index offsets and can resolve relative face indexes on its own
+        ranges = self._split_ranges(workers)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(self._count_records, *zip(*ranges)))
+
+            vertex_count = normal_count = line_number = 0
+            futures = []
+            for (start, stop), (lines, vertices, normals) in zip(ranges, counts):
+                futures.append(executor.submit(self._parse_range, start, stop, vertex_count, normal_count, line_number))
+                vertex_count += vertices
+                normal_count += normals
+                line_number += lines
+
+            parts = []
+            bytes_processed = lines_processed = 0
+            for future, (start, stop), (lines, vertices, normals) in zip(futures, ranges, counts):
+                builders, range_vertices, range_normals = future.result()
+                if (range_vertices, range_normals) != (vertices, normals):
+                    # records the byte count missed, e.g. indented ones, fall back to a single pass
+                    executor.shutdown(cancel_futures=True)
+                    return [self._parse_range(progress=progress)[0]]
+                parts.append(builders)
+                bytes_processed += stop - start
+                lines_processed += lines
+                if progress is not None:
+                    progress(bytes_processed, lines_processed)
+        return parts
+
+    def _split_ranges(self, parts: int) -> list[tuple[int, int]]:
+        file_name = f"{self._file_path}/{self._file_name}"
+        size = os.path.getsize(file_name)
+        offsets = [0]
+        with open(file_name, "rb") as file:
+            for i in range(1, parts):
+                file.seek(max(size * i // parts - 1, offsets[-1]))
+                file.readline()
+                offsets.append(file.tell())
+        offsets.append(size)
+        return [(start, stop) for start, stop in zip(offsets, offsets[1:]) if stop > start]
+
+    def _count_records(self, start: int, stop: int) -> tuple[int, int, int]:
+        # Returns the number of lines, vertex records and normal records between two line-aligned offsets
+        lines = vertices = normals = 0
+        tail = b"\n"
+        with open(f"{self._file_path}/{self._file_name}", "rb") as file:
+            file.seek(start)
+            position = start
+            while position < stop:
+                data = file.read(min(self.chunk_size, stop - position))
+                if not data:
+                    break
+                position += len(data)
+                lines += data.count(b"\n")
+                # the tail of the previous chunk catches records split between chunks
+                window = tail + data
+                vertices += window.count(b"\nv ") - tail.count(b"\nv ")
+                normals += window.count(b"\nvn ") - tail.count(b"\nvn ")
+                tail = window[-3:]
+        return lines, vertices, normals
+
+    def _parse_range(self, start: int = 0, stop: int | None = None, vertex_count: int = 0, normal_count: int = 0,
+                     line_number: int = 0, progress=None) -> tuple[list[_ObjectBuilder], int, int]:
+        # Returns the builders of the range, the first one being an unnamed continuation of the object
+        # that was open at start, and the number of vertex and normal records in the range
+        builders = [_ObjectBuilder(name=None, vertex_start=vertex_count, normal_start=normal_count)]
+        current_object = builders[0]
+        range_vertices = vertex_count
+        range_normals = normal_count
+        bytes_processed = 0
+
+        for lines, chunk_bytes in self.read_chunks(start, stop):
+            vertex_records = []
+            normal_records = []
+            triangles = []
+            triangle_normals = []
+            corner_normals = []
+
+            for line in lines:
+                line_number += 1
+                prefix, _, data = line.strip().partition(" ")
+                if prefix == "#" or prefix == "":
+                    continue
+
+                if prefix == "v":
+                    vertex_records.append(data)
+                    vertex_count += 1
+                elif prefix == "vn":
+                    normal_records.append(data)
+                    normal_count += 1
+                elif prefix == "f":
+                    vertex_indexes = []
+                    normal_indexes = []
+                    for index in data.split():
+                        smol_data = index.split("/")
+                        vertex = int(smol_data[0])
+                        vertex_indexes.append(vertex - 1 if vertex > 0 else vertex_count + vertex)
+                        if len(smol_data) < 3 or not smol_data[2]:
+                            raise NoNormalsException("Normals are missing")
+                        normal = int(smol_data[2])
+                        normal_indexes.append(normal - 1 if normal > 0 else normal_count + normal)
+                    if len(vertex_indexes) < 3:
+                        raise ValueError(f"Got a face with {len(vertex_indexes)} vertices while reading "
+                                         f"{self._file_name} at line {line_number}")
+                    # n-gons are split into a fan of triangles around their first vertex.
+                    # The face normal is that of the last corner, smooth shading uses the normal of every corner
+                    for i in range(1, len(vertex_indexes) - 1):
+                        triangles.extend((vertex_indexes[0], vertex_indexes[i], vertex_indexes[i + 1]))
+                        triangle_normals.append(normal_indexes[-1])
+                        corner_normals.extend((normal_indexes[0], normal_indexes[i], normal_indexes[i + 1]))
+                elif prefix == "s":
+                    current_object.smooth_shading = 0 if data == "off" else int(data)
+                elif prefix == "o":
+                    # records of the object that ends here have to be flushed before switching
+                    self._flush(current_object, vertex_records, normal_records, triangles, triangle_normals,
+                                corner_normals)
+                    vertex_records, normal_records, triangles, triangle_normals, corner_normals = [], [], [], [], []
+                    current_object = _ObjectBuilder(name=data, vertex_start=vertex_count, normal_start=normal_count)
+                    builders.append(current_object)
                 else:
-                    # TODO replace with dataclass
-                    res[data] = internals.objects.Object(data, color=internals.rgb.next_color())
-                    # res[data] = {"polygons": list(), "vertices": list(), "smooth_shading": 0, "normals": list()}
-            elif prefix == "v":
-                v1, v2, v3 = list(map(float, data.split()))
-                # res[current_object]["vertices"].append(
-                #     internals.objects.Vertex(x=v1, y=v2, z=v3)
-                # )
-                res[current_object].vertices.append(
-                    internals.objects.Vertex(x=v1, y=v2, z=v3)
+                    raise KeyError(
+                        f'Got unexpected prefix "{prefix}" while reading {self._file_name} at line {line_number}')
+
+            self._flush(current_object, vertex_records, normal_records, triangles, triangle_normals, corner_normals)
+
+            bytes_processed += chunk_bytes
+            if progress is not None:
+                progress(bytes_processed, line_number)
+
+        return builders, vertex_count - range_vertices, normal_count - range_normals
+
+    def _flush(self, builder: _ObjectBuilder, vertex_records: list[str], normal_records: list[str],
+               triangles: list[int], triangle_normals: list[int], corner_normals: list[int]):
+        if vertex_records:
+            builder.vertex_chunks.append(self._parse_records("v", vertex_records))
+        if normal_records:
+            builder.normal_chunks.append(self._parse_records("vn", normal_records))
+        if triangles:
+            builder.triangle_chunks.append(np.array(triangles, dtype=np.int64))
+            builder.triangle_normal_chunks.append(np.array(triangle_normals, dtype=np.int64))
+            builder.corner_normal_chunks.append(np.array(corner_normals, dtype=np.int64))
+
+    def _parse_records(self, prefix: str, records: list[str]) -> np.ndarray:
+        # all records of a chunk are converted with a single split instead of one call per line
+        values = np.array(" ".join(records).split(), dtype=np.float64)
+        if len(values) != 3 * len(records):
+            for record in records:
+                if len(record.split()) != 3:
+                    raise ValueError(f'Expected 3 values in "{prefix} {record}" while reading {self._file_name}')
+        return values
+
+
+def _shift(indexes: np.ndarray, offset: int) -> np.ndarray:
+    # keeps memory-mapped arrays mapped when there is nothing to shift
+    return indexes + offset if offset else indexes
+
+
+def _checked_range(value, size: int) -> tuple[int, int]:
+    # start and stop of a range stored in a cache entry, within an array of size elements
+    start, stop = value
+    if not isinstance(start, int) or not isinstance(stop, int) or not 0 <= start <= stop <= size:
+        raise ValueError(f"Range {value} is outside of {size} elements")
+    return start, stop
+
+
+class CacheHandler(_AbstractHandler):
+    # Stores parsed scenes with their simplified levels as raw .npy arrays that are memory-mapped on later loads.
+    # Entries are keyed by the source file path, size and modification time
+    version = 3
+    _cache_directory: str
+
+    def __init__(self, cache_directory):
+        self._cache_directory = cache_directory
+
+    def _entry_prefix(self, source_path: str) -> str:
+        path_digest = hashlib.sha1(os.path.abspath(source_path).encode()).hexdigest()[:16]
+        return f"{os.path.basename(source_path)}-{path_digest}-"
+
+    def _entry_path(self, source_path: str) -> str:
+        stat = os.stat(source_path)
+        state_digest = hashlib.sha1(f"{self.version}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+        return os.path.join(self._cache_directory, self._entry_prefix(source_path) + state_digest)
+
+    def load(self, source_path: str, lod_levels: int) \
+            -> tuple[dict, internals.objects.Mesh, internals.objects.Mesh, dict] | None:
+        # Returns the objects, the full detail mesh, the level of detail mesh it is the start of and the
+        # simplified levels of every object as (mesh, cluster size). None when there is no entry for lod_levels
+        # or it can not be read, such an entry is parsed and stored again
+        entry_path = self._entry_path(source_path)
+        try:
+            with open(os.path.join(entry_path, "objects.json")) as file:
+                meta = json.load(file)
+            if meta["lod_levels"] != lod_levels:
+                return None
+            arrays = {
+                name: np.load(os.path.join(entry_path, f"{name}.npy"), mmap_mode="r")
+                for name in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals")
+            }
+            lod_mesh = internals.objects.Mesh(**arrays)
+
+            def part(vertex_range, normal_range, triangle_range) -> internals.objects.Mesh:
+                vertex_start, vertex_stop = _checked_range(vertex_range, len(lod_mesh.vertices))
+                normal_start, normal_stop = _checked_range(normal_range, len(lod_mesh.normals))
+                triangle_start, triangle_stop = _checked_range(triangle_range, len(lod_mesh.triangles))
+                return internals.objects.Mesh(
+                    vertices=lod_mesh.vertices[vertex_start:vertex_stop],
+                    normals=lod_mesh.normals[normal_start:normal_stop],
+                    triangles=_shift(lod_mesh.triangles[triangle_start:triangle_stop], -vertex_start),
+                    triangle_normals=_shift(lod_mesh.triangle_normals[triangle_start:triangle_stop], -normal_start),
+                    corner_normals=_shift(lod_mesh.corner_normals[triangle_start:triangle_stop], -normal_start),
                 )
-                previous_indexes += 1
-            elif prefix == "s":
-                # res[current_object]["smooth_shading"] = int(data)
-                res[current_object].smooth_shading = int(data)
-            elif prefix == "vn":
-                # res[current_object]["normals"].append(internals.vectors.Vector(*list(map(float, data.split()))))
-                res[current_object].normals.append(internals.vectors.Vector(*list(map(float, data.split()))))
-                previous_normals += 1
-            elif prefix == "f":
-                indexes = data.split()
-
-                for i in range(len(indexes)):
-                    smol_data = indexes[i].split("/")
-                    if len(smol_data) == 1:
-                        indexes[i] = int(smol_data[0])
-                        normal = None
-                        material = None
-                    else:
-                        index = int(smol_data[0]) - 1 - previous_indexes
-                        material = smol_data[1]
-                        normal = int(smol_data[2]) - 1 - previous_normals
-                        indexes[i] = int(index)
-                # polygon_normal = res[current_object]["normals"][normal]
-                try:
-                    polygon_normal = res[current_object].normals[normal]
-                except TypeError:
-                    raise NoNormalsException("Normals are missing")
-                if len(indexes) == 3:
-                    # print(indexes)
-                    res[current_object].polygons.append(
-                        internals.objects.Polygon(
-                            first=res[current_object].vertices[indexes[0]],
-                            second=res[current_object].vertices[indexes[1]],
-                            third=res[current_object].vertices[indexes[2]],
-                            color=res[current_object].color,
-                            normal=polygon_normal
-                        )
-                    )
-                elif len(indexes) == 4:
-                        quad = internals.objects.Quad(
-                            first=res[current_object].vertices[indexes[0]],
-                            second=res[current_object].vertices[indexes[1]],
-                            third=res[current_object].vertices[indexes[2]],
-                            fourth=res[current_object].vertices[indexes[3]],
-                            color=res[current_object].color,
-                            normal=polygon_normal,
-                        )
-                        t1, t2 = quad.get_polygons()
-                        res[current_object].polygons.append(t1)
-                        res[current_object].polygons.append(t2)
-                else:
-                    raise NotImplementedError(f"Can only handle triangles and quads but got {len(indexes)}-gon")
 
+            objects = dict()
+            levels = dict()
+            for description in meta["objects"]:
+                name = description["name"]
+                if not len(description["vertices"]) == len(description["triangles"]) == len(description["errors"]):
+                    raise ValueError(f"Object {name} has inconsistent levels")
+                meshes = [
+                    part(vertex_range, description["normals"], triangle_range)
+                    for vertex_range, triangle_range in zip(description["vertices"], description["triangles"])
+                ]
+                objects[name] = internals.objects.Object.from_mesh(
+                    name=name,
+                    color=internals.rgb.RGB(*description["color"]),
+                    smooth_shading=description["smooth_shading"],
+                    mesh=meshes[0],
+                )
+                levels[name] = list(zip(meshes[1:], description["errors"][1:]))
+            # the full detail meshes of all objects come first
+            vertex_count = sum(len(obj.get_mesh().vertices) for obj in objects.values())
+            triangle_count = sum(len(obj.get_mesh()) for obj in objects.values())
+            mesh = internals.objects.Mesh(
+                vertices=lod_mesh.vertices[:vertex_count],
+                normals=lod_mesh.normals,
+                triangles=lod_mesh.triangles[:triangle_count],
+                triangle_normals=lod_mesh.triangle_normals[:triangle_count],
+                corner_normals=lod_mesh.corner_normals[:triangle_count],
+            )
+        except (OSError, ValueError, KeyError, TypeError, IndexError):
+            return None
+        return objects, mesh, lod_mesh, levels
 
-            else:
-                raise KeyError(
-                    f'Got unexpected prefix "{prefix}" while reading {self._file_name} at line {line_number}')
+    def store(self, source_path: str, objects: dict, lod_mesh: internals.objects.Mesh, lod_levels: int,
+              vertex_ranges: dict, triangle_ranges: dict, normal_ranges: dict, errors: dict) -> bool:
+        # The ranges and errors are those of every level of every object by name, as SceneData keeps them.
+        # Returns whether the entry was written, a read-only or full cache directory only means no cache
+        entry_path = self._entry_path(source_path)
+        temporary_path = f"{entry_path}.{os.getpid()}.tmp"
+
+        meta = {"version": self.version, "source": os.path.abspath(source_path), "lod_levels": lod_levels,
+                "objects": list()}
+        for obj in objects.values():
+            meta["objects"].append({
+                "name": obj.name,
+                "color": obj.color.to_tuple(),
+                "smooth_shading": obj.smooth_shading,
+                "normals": normal_ranges[obj.name],
+                "vertices": vertex_ranges[obj.name],
+                "triangles": triangle_ranges[obj.name],
+                "errors": errors[obj.name],
+            })
+
+        try:
+            os.makedirs(temporary_path, exist_ok=True)
+            np.save(os.path.join(temporary_path, "vertices.npy"), lod_mesh.vertices)
+            np.save(os.path.join(temporary_path, "normals.npy"), lod_mesh.normals)
+            np.save(os.path.join(temporary_path, "triangles.npy"), lod_mesh.triangles)
+            np.save(os.path.join(temporary_path, "triangle_normals.npy"), lod_mesh.triangle_normals)
+            np.save(os.path.join(temporary_path, "corner_normals.npy"), lod_mesh.corner_normals)
+            with open(os.path.join(temporary_path, "objects.json"), "w") as file:
+                json.dump(meta, file)
+        except OSError:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            return False
+
+        # drop entries left over from previous versions of the same file
+        prefix = self._entry_prefix(source_path)
+        for entry in os.listdir(self._cache_directory):
+            path = os.path.join(self._cache_directory, entry)
+            if entry.startswith(prefix) and path != temporary_path and not entry.endswith(".tmp"):
+                shutil.rmtree(path, ignore_errors=True)
+
+        try:
+            os.rename(temporary_path, entry_path)
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(temporary_path, ignore_errors=True)
+        return True
+
+
+def _bounding_sphere(vertices: np.ndarray) -> tuple[np.ndarray, float]:
+    # center and radius of the sphere around the bounding box of (N, 3) vertices
+    low = vertices.min(axis=0) if len(vertices) else np.zeros(3)
+    high = vertices.max(axis=0) if len(vertices) else np.zeros(3)
+    return (low + high) / 2, float(np.linalg.norm(high - low)) / 2
+
+
+# the key of objects that are where the file put them
+_identity_key = internals.objects.Transform().to_tuple()
 
-        # return data
-        # print(res)
-        return res
+
+def _positional(lights: internals.rgb.Light | list) -> bool:
+    # whether the shading depends on where a surface is and not only on its normal
+    return any(isinstance(light, internals.rgb.PointLight) for light in internals.rgb.as_lights(lights))
 
 
 class SceneData(_AbstractHandler):
     _lines: list[internals.objects.Line]
     _vertices: list[internals.objects.Vertex]
-    _polygons: list[internals.objects.Polygon]
+    _polygons: list[internals.objects.Polygon] | None
+    _mesh: internals.objects.Mesh
+    _lod_mesh: internals.objects.Mesh
+    _model_mesh: internals.objects.Mesh
+    _detail_levels: list[internals.lod.DetailLevels]
+    _level_errors: dict
+    _triangle_colors: np.ndarray
+    _bvh: internals.bvh.BoundingVolumeHierarchy
     _objects: dict
+    _object_ranges: dict
+    _normal_ranges: dict
+    _vertex_ranges: dict
+    _transform_keys: dict
+    _sources: dict
+    _lod_levels: int
+    _smooth_triangles: np.ndarray
+    _shaded_normals: np.ndarray
+    _shaded_colors: np.ndarray
+    _shaded_hex: list[str]
+    _palette: internals.rgb.HexPalette
+    _shading_keys: dict
+    _hex_keys: dict
 
     def __init__(self):
         self._lines = [
@@ -148,17 +502,372 @@ class SceneData(_AbstractHandler):
         ]
 
         self._polygons = list()
+        self._objects = dict()
+        self._mesh = internals.objects.Mesh.empty()
+        self._lod_mesh = self._mesh
+        self._model_mesh = self._mesh
+        self._detail_levels = list()
+        self._level_errors = dict()
+        self._triangle_colors = np.zeros((0, 3))
+        self._bvh = internals.bvh.BoundingVolumeHierarchy(self._mesh, [])
+        self._object_ranges = dict()
+        self._normal_ranges = dict()
+        self._vertex_ranges = dict()
+        self._transform_keys = dict()
+        self._sources = dict()
+        self._lod_levels = 3
+        self._smooth_triangles = np.zeros(0, dtype=bool)
+        self._palette = internals.rgb.HexPalette()
+        self.invalidate_shading()
+
+    def read_file(self, file_path, file_name, *args, cache_directory: str | None = None, progress=None,
+                  workers: int = 1, lod_levels: int = 3, **kwargs):
+        source_path = f"{file_path}/{file_name}"
+        cache = None
+        loaded = None
+        if cache_directory is not None:
+            try:
+                os.makedirs(cache_directory, exist_ok=True)
+            except OSError:
+                # the model is parsed without a cache
+                pass
+            else:
+                cache = CacheHandler(cache_directory=cache_directory)
+                loaded = cache.load(source_path, lod_levels)
+
+        self._polygons = None
+        self._sources = dict()
+        self._lod_levels = lod_levels
+        if loaded is None:
+            reader = FileHandler(file_path=file_path, file_name=file_name)
+            self._objects = reader.interpret_file(progress=progress, workers=workers)
+            self._mesh = internals.objects.Mesh.merge([obj.get_mesh() for obj in self._objects.values()])
+            self._build_levels(lod_levels)
+            if cache is not None:
+                cache.store(source_path, self._objects, self._lod_mesh, lod_levels, self._vertex_ranges,
+                            self._object_ranges, self._normal_ranges, self._level_errors)
+        else:
+            # the whole level of detail mesh stays memory-mapped, levels are not generated again
+            self._objects, self._mesh, lod_mesh, levels = loaded
+            self._build_levels(lod_levels, levels=levels, lod_mesh=lod_mesh)
+
+    def add_instances(self, name: str, transforms: list[internals.objects.Transform]) \
+            -> list[internals.objects.Object]:
+        # Places a copy of the object name at every transform and returns the copies, named "name:1", "name:2"...
+        # Copies share the parsed mesh and its simplified levels, they are moved like any other object,
+        # copies of the same mesh in one batch, and are culled as a whole by the hierarchy
+        source_name = self._sources.get(name, name)
+        source = self._objects[source_name]
+        number = 0
+        instances = []
+        for transform in transforms:
+            number += 1
+            while f"{source_name}:{number}" in self._objects:
+                number += 1
+            instance = internals.objects.Object.from_mesh(
+                f"{source_name}:{number}",
+                color=source.color,
+                mesh=source.get_mesh(),
+                smooth_shading=source.smooth_shading,
+            )
+            instance.transform = transform
+            self._objects[instance.name] = instance
+            self._sources[instance.name] = source_name
+            instances.append(instance)
+
+        # objects that were moved before are placed again by the next update_transforms()
+        self._mesh = internals.objects.Mesh.merge([obj.get_mesh() for obj in self._objects.values()])
+        self._polygons = None
+        self._build_levels(self._lod_levels)
+        return instances
+
+    def _build_levels(self, lod_levels: int, levels: dict | None = None,
+                      lod_mesh: internals.objects.Mesh | None = None):
+        # The full detail meshes of all objects come first in the level of detail mesh, so its first
+        # len(get_mesh()) triangles are those of get_mesh(). Simplified levels of every object follow,
+        # they refer to the normals of their object in get_mesh() instead of copies.
+        # levels and lod_mesh are given when they were loaded from the cache with the same layout
+        meshes = [obj.get_mesh() for obj in self._objects.values()]
+        # instances use the levels of the object they were copied from
+        levels_by_source = dict() if levels is None else levels
+        for name, mesh in zip(self._objects.keys(), meshes):
+            if name not in self._sources and name not in levels_by_source:
+                levels_by_source[name] = internals.lod.generate_levels(mesh, count=lod_levels)
+        simplified = [levels_by_source[self._sources.get(name, name)] for name in self._objects.keys()]
+        normal_starts = np.cumsum([0] + [len(mesh.normals) for mesh in meshes])
+        self._normal_ranges = {
+            name: (int(start), int(stop))
+            for name, start, stop in zip(self._objects.keys(), normal_starts[:-1], normal_starts[1:])
+        }
+        level_meshes = [
+            (level_mesh, normal_start)
+            for levels, normal_start in zip(simplified, normal_starts) for level_mesh, _ in levels
+        ]
+        vertex_starts = np.cumsum(
+            [len(self._mesh.vertices)] + [len(level_mesh.vertices) for level_mesh, _ in level_meshes]
+        )
+        self._lod_mesh = lod_mesh if lod_mesh is not None else internals.objects.Mesh(
+            vertices=np.concatenate([self._mesh.vertices] + [level_mesh.vertices for level_mesh, _ in level_meshes]),
+            normals=self._mesh.normals,
+            triangles=np.concatenate([self._mesh.triangles] + [
+                level_mesh.triangles + vertex_start
+                for (level_mesh, _), vertex_start in zip(level_meshes, vertex_starts)
+            ]),
+            triangle_normals=np.concatenate([self._mesh.triangle_normals] + [
+                level_mesh.triangle_normals + normal_start for level_mesh, normal_start in level_meshes
+            ]),
+            corner_normals=np.concatenate([self._mesh.corner_normals] + [
+                level_mesh.corner_normals + normal_start for level_mesh, normal_start in level_meshes
+            ]),
+        ) if level_meshes else self._mesh
+        # objects are placed by moving their vertices in a copy of this mesh, see update_transforms
+        self._model_mesh = self._lod_mesh
+
+        offset = 0
+        vertex_offset = 0
+        self._object_ranges = dict()
+        self._vertex_ranges = dict()
+        for name, mesh in zip(self._objects.keys(), meshes):
+            self._object_ranges[name] = [(offset, offset + len(mesh))]
+            self._vertex_ranges[name] = [(vertex_offset, vertex_offset + len(mesh.vertices))]
+            offset += len(mesh)
+            vertex_offset += len(mesh.vertices)
+        for name, levels in zip(self._objects.keys(), simplified):
+            for level_mesh, _ in levels:
+                self._object_ranges[name].append((offset, offset + len(level_mesh)))
+                self._vertex_ranges[name].append((vertex_offset, vertex_offset + len(level_mesh.vertices)))
+                offset += len(level_mesh)
+                vertex_offset += len(level_mesh.vertices)
+
+        self._detail_levels = list()
+        self._level_errors = dict()
+        for name, mesh, levels in zip(self._objects.keys(), meshes, simplified):
+            self._level_errors[name] = [0.0] + [cell_size for _, cell_size in levels]
+            self._detail_levels.append(internals.lod.DetailLevels(
+                *_bounding_sphere(mesh.vertices),
+                ranges=self._object_ranges[name],
+                errors=self._level_errors[name],
+            ))
 
-    def read_file(self, file_path, file_name, *args, **kwargs):
-        pass
-        reader = FileHandler(file_path=file_path, file_name=file_name)
-        self._objects = reader.interpret_file()
+        triangle_colors = np.zeros((len(self._lod_mesh), 3))
+        smooth_triangles = np.zeros(len(self._lod_mesh), dtype=bool)
+        for name, obj in self._objects.items():
+            for start, stop in self._object_ranges[name]:
+                triangle_colors[start:stop] = obj.color.to_tuple()
+                smooth_triangles[start:stop] = bool(obj.smooth_shading)
+        self._triangle_colors = triangle_colors
+        self._smooth_triangles = smooth_triangles
 
-        for obj in self._objects.keys():
-            self._polygons.extend(self._objects[obj].polygons)
+        # every object level is a root of the hierarchy, so its box is tested before its clusters.
+        # Instances take the trees of their source, they are in the same place until they are moved
+        first_ranges = dict(zip(self._object_ranges.keys(), np.cumsum(
+            [0] + [len(ranges) for ranges in self._object_ranges.values()]).tolist()))
+        self._bvh = internals.bvh.BoundingVolumeHierarchy(
+            self._lod_mesh,
+            object_ranges=[object_range for ranges in self._object_ranges.values() for object_range in ranges],
+            copies={
+                first_ranges[name] + level: first_ranges[source] + level
+                for name, source in self._sources.items() for level in range(len(self._object_ranges[name]))
+            },
+        )
+        # every object starts where the file put it
+        self._transform_keys = {name: _identity_key for name in self._objects.keys()}
+        self.invalidate_shading()
+
+    def update_transforms(self) -> list[str]:
+        # Moves the world space vertices and normals of the objects whose transform changed since the last call
+        # and returns their names. Objects that keep their transform are never transformed again. Until the
+        # first one moves the world space meshes are the model space ones, memory-mapped after a cache load,
+        # the first move copies the vertices and normals of the whole level of detail mesh
+        keys = {name: obj.transform.to_tuple() for name, obj in self._objects.items()}
+        moved = [name for name, key in keys.items() if key != self._transform_keys[name]]
+        if not moved:
+            return moved
+
+        model = self._model_mesh
+        copied = self._lod_mesh is model
+        vertices = model.vertices.copy() if copied else self._lod_mesh.vertices
+        normals = model.normals.copy() if copied else self._lod_mesh.normals
+        first_ranges = np.cumsum([0] + [len(ranges) for ranges in self._object_ranges.values()]).tolist()
+        moved_ranges = []
+        indexes = {name: index for index, name in enumerate(self._objects.keys())}
+        batches = dict()
+        for name in moved:
+            batches.setdefault(self._sources.get(name, name), []).append(name)
+        for source, names in batches.items():
+            # copies of one mesh are transformed from the model vertices of their source, one batched (V, 3) by
+            # (K, 3, 3) product for K copies, in parts of about a million vertices
+            linear, translation, normal = (
+                np.stack(matrices) for matrices in zip(*(self._objects[name].transform.matrices() for name in names))
+            )
+            for level, (start, stop) in enumerate(self._vertex_ranges[source]):
+                part = max(1, 2 ** 20 // max(1, stop - start))
+                for first in range(0, len(names), part):
+                    transformed = model.vertices[start:stop] @ linear[first:first + part].transpose(0, 2, 1)
+                    transformed += translation[first:first + part, None]
+                    for name, copy in zip(names[first:first + part], transformed):
+                        copy_start, copy_stop = self._vertex_ranges[name][level]
+                        vertices[copy_start:copy_stop] = copy
+            start, stop = self._normal_ranges[source]
+            for name, copy in zip(names, model.normals[start:stop] @ normal.transpose(0, 2, 1)):
+                copy_start, copy_stop = self._normal_ranges[name]
+                normals[copy_start:copy_stop] = copy
+
+            for name in names:
+                index = indexes[name]
+                start, stop = self._vertex_ranges[name][0]
+                detail_levels = self._detail_levels[index]
+                detail_levels.center, detail_levels.radius = _bounding_sphere(vertices[start:stop])
+                # simplified levels look as much coarser as the object is scaled up
+                detail_levels.errors = [
+                    error * self._objects[name].transform.scale_factor for error in self._level_errors[name]
+                ]
+                moved_ranges.extend(range(first_ranges[index], first_ranges[index + 1]))
+                self._transform_keys[name] = keys[name]
+                self.invalidate_shading(name)
+
+        # new meshes around the same arrays, so holders of the previous ones such as a RenderPool notice the change
+        vertex_count, triangle_count = len(self._mesh.vertices), len(self._mesh)
+        self._lod_mesh = internals.objects.Mesh(
+            vertices=vertices,
+            normals=normals,
+            triangles=model.triangles,
+            triangle_normals=model.triangle_normals,
+            corner_normals=model.corner_normals,
+        )
+        self._mesh = internals.objects.Mesh(
+            vertices=vertices[:vertex_count],
+            normals=normals,
+            triangles=model.triangles[:triangle_count],
+            triangle_normals=model.triangle_normals[:triangle_count],
+            corner_normals=model.corner_normals[:triangle_count],
+        )
+        self._bvh.refit(self._lod_mesh, moved_ranges)
+        self._polygons = None
+        return moved
 
     def get_lines(self) -> list[internals.objects.Line]:
         return self._lines
 
     def get_polygons(self) -> list[internals.objects.Polygon]:
+        if self._polygons is None:
+            self._polygons = [
+                polygon
+                for name, obj in self._objects.items()
+                for polygon in (obj.get_polygons() if self._transform_keys[name] == _identity_key
+                                else self._world_polygons(name))
+            ]
         return self._polygons
+
+    def _world_polygons(self, name: str) -> list[internals.objects.Polygon]:
+        # polygons of an object that was moved, from its part of get_mesh()
+        start, stop = self._object_ranges[name][0]
+        vertex_start, vertex_stop = self._vertex_ranges[name][0]
+        normal_start, normal_stop = self._normal_ranges[name]
+        _, _, polygons = internals.objects.Mesh(
+            vertices=self._mesh.vertices[vertex_start:vertex_stop],
+            normals=self._mesh.normals[normal_start:normal_stop],
+            triangles=self._mesh.triangles[start:stop] - vertex_start,
+            triangle_normals=self._mesh.triangle_normals[start:stop] - normal_start,
+        ).to_polygons(self._objects[name].color)
+        return polygons
+
+    def get_objects(self) -> dict:
+        # objects by name, change their transform to move them, the next update_transforms() applies it
+        return self._objects
+
+    def get_mesh(self) -> internals.objects.Mesh:
+        # triangles are in the same order as get_polygons()
+        return self._mesh
+
+    def get_lod_mesh(self) -> internals.objects.Mesh:
+        # get_mesh() followed by the simplified levels of every object
+        return self._lod_mesh
+
+    def get_detail_levels(self) -> list[internals.lod.DetailLevels]:
+        # one entry per object, ranges are in get_lod_mesh() and their order is that of the roots of get_bvh()
+        return self._detail_levels
+
+    def get_triangle_colors(self) -> np.ndarray:
+        # one row per triangle of get_lod_mesh()
+        return self._triangle_colors
+
+    def get_smooth_triangles(self) -> np.ndarray:
+        # (T,) mask of the triangles of get_lod_mesh() whose objects turn smooth shading on with "s"
+        return self._smooth_triangles
+
+    def get_bvh(self) -> internals.bvh.BoundingVolumeHierarchy:
+        return self._bvh
+
+    def invalidate_shading(self, name: str | None = None):
+        # Forgets the cached shading of one object, or of all of them when name is None
+        if name is None:
+            self._shaded_normals = np.zeros((len(self._lod_mesh.normals), 3), dtype=np.int64)
+            self._shaded_colors = np.zeros((len(self._lod_mesh), 3), dtype=np.int64)
+            self._shaded_hex = [""] * len(self._lod_mesh)
+            self._shading_keys = dict()
+            self._hex_keys = dict()
+        else:
+            self._shading_keys.pop(name, None)
+            self._hex_keys.pop(name, None)
+
+    def _shade(self, lights: internals.rgb.Light | list):
+        # Lights every normal of an object once, flat and smooth colors are both looked up from these.
+        # Point lights depend on where a surface is, with them every triangle is lit at its center instead.
+        # Objects are only shaded again when the lights change
+        key = internals.rgb.lights_key(lights)
+        positional = _positional(lights)
+        mesh = self._lod_mesh
+        for name, ranges in self._object_ranges.items():
+            if self._shading_keys.get(name) != key:
+                color = self._objects[name].color.to_tuple()
+                if positional:
+                    for start, stop in ranges:
+                        self._shaded_colors[start:stop] = internals.rgb.shade(
+                            lights,
+                            mesh.normals[mesh.triangle_normals[start:stop]],
+                            np.broadcast_to(color, (stop - start, 3)),
+                            mesh.vertices[mesh.triangles[start:stop]].mean(axis=1),
+                        )
+                else:
+                    start, stop = self._normal_ranges[name]
+                    self._shaded_normals[start:stop] = internals.rgb.shade(
+                        lights, mesh.normals[start:stop], np.broadcast_to(color, (stop - start, 3)),
+                    )
+                    for start, stop in ranges:
+                        self._shaded_colors[start:stop] = self._shaded_normals[mesh.triangle_normals[start:stop]]
+                self._shading_keys[name] = key
+
+    def get_shaded_corners(self, lights: internals.rgb.Light | list, indexes: np.ndarray,
+                           corner_normals: np.ndarray) -> np.ndarray:
+        # (K, 3, 3) lit colors of the corners of the triangles indexes of get_lod_mesh() for smooth shading,
+        # corner_normals are their (K, 3) normals. Directional lights are looked up from the colors every normal
+        # was lit with, point lights are evaluated at the corners of these triangles only
+        if not _positional(lights):
+            self._shade(lights)
+            return self._shaded_normals[corner_normals]
+        mesh = self._lod_mesh
+        return internals.rgb.shade(
+            lights,
+            mesh.normals[corner_normals].reshape(-1, 3),
+            np.repeat(self._triangle_colors[indexes], 3, axis=0),
+            mesh.vertices[mesh.triangles[indexes]].reshape(-1, 3),
+        ).reshape(-1, 3, 3)
+
+    def get_shaded_colors(self, lights: internals.rgb.Light | list) -> np.ndarray:
+        # (T, 3) lit colors of every triangle of get_lod_mesh()
+        self._shade(lights)
+        return self._shaded_colors
+
+    def get_shaded_hex(self, lights: internals.rgb.Light | list,
+                       palette: internals.rgb.HexPalette | None = None) -> list[str]:
+        # get_shaded_colors as canvas color strings of palette, exact colors by default
+        palette = self._palette if palette is None else palette
+        key = (internals.rgb.lights_key(lights), palette.levels)
+        shaded_colors = self.get_shaded_colors(lights)
+        for name, ranges in self._object_ranges.items():
+            if self._hex_keys.get(name) != key:
+                for start, stop in ranges:
+                    self._shaded_hex[start:stop] = palette.lookup(shaded_colors[start:stop])
+                self._hex_keys[name] = key
+        return self._shaded_hex
@@ -0,0 +1,125 @@
+import heapq
+import numpy as np
+import internals.objects
+import internals.vectors
+
+
+class DetailLevels:
+    # Triangle ranges of one object at decreasing detail in a merged mesh. errors are the cluster sizes
+    # the levels were simplified with, 0 for the full detail level
+    center: np.ndarray
+    radius: float
+    ranges: list[tuple[int, int]]
+    errors: list[float]
+
+    def __init__(self, center: np.ndarray, radius: float, ranges: list[tuple[int, int]], errors: list[float]):
+        self.center = center
+        self.radius = radius
+        self.ranges = ranges
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def triangle_count(self, level: int) -> int:
+        start, stop = self.ranges[level]
+        return stop - start
+
+
+def cluster_vertices(mesh: internals.objects.Mesh, cell_size: float) -> internals.objects.Mesh:
+    # Vertex clustering: vertices in the same grid cell are merged into their average,
+    # triangles that lose a corner or become duplicates are dropped. Faces keep their normals
+    if not len(mesh.vertices):
+        return mesh
+    cells = np.floor((mesh.vertices - mesh.vertices.min(axis=0)) / cell_size).astype(np.int64)
+    _, clusters, counts = _unique_rows(cells, return_inverse=True, return_counts=True)
+
+    vertices = np.zeros((len(counts), 3))
+    np.add.at(vertices, clusters, mesh.vertices)
+    vertices /= counts[:, None]
+
+    triangles = clusters[mesh.triangles]
+    keep = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) \
+        & (triangles[:, 2] != triangles[:, 0])
+    triangles = triangles[keep]
+    triangle_normals = mesh.triangle_normals[keep]
+    corner_normals = mesh.corner_normals[keep]
+
+    _, first = _unique_rows(np.sort(triangles, axis=1), return_index=True)
+    first.sort()
+    return internals.objects.Mesh(
+        vertices=vertices,
+        normals=mesh.normals,
+        triangles=triangles[first],
+        triangle_normals=triangle_normals[first],
+        corner_normals=corner_normals[first],
+    )
+
+
+def _unique_rows(rows: np.ndarray, **kwargs) -> tuple:
+    # np.unique over the rows of a non-negative (N, 3) integer array, on one int64 key per row when it fits
+    bounds = rows.max(axis=0, initial=0) + 1
+    if float(bounds[0]) * float(bounds[1]) * float(bounds[2]) >= 2 ** 63:
+        results = np.unique(rows, axis=0, **kwargs)
+    else:
+        results = np.unique((rows[:, 0] * bounds[1] + rows[:, 1]) * bounds[2] + rows[:, 2], **kwargs)
+    return tuple(result.reshape(-1) if index else result for index, result in enumerate(results))
+
+
+def generate_levels(mesh: internals.objects.Mesh, count: int = 3, reduction: float = 0.5) \
+        -> list[tuple[internals.objects.Mesh, float]]:
+    # Up to count simplified meshes with their cluster sizes, every one at most reduction times
+    # the triangles of the previous one. Cells start at 1/64 of the bounding box diagonal and double
+    levels = []
+    if not len(mesh):
+        return levels
+    diagonal = float(np.linalg.norm(mesh.vertices.max(axis=0) - mesh.vertices.min(axis=0)))
+    if diagonal == 0:
+        return levels
+
+    triangle_count = len(mesh)
+    cell_size = diagonal / 64
+    while len(levels) < count and cell_size <= diagonal:
+        simplified = cluster_vertices(mesh, cell_size)
+        if 0 < len(simplified) <= triangle_count * reduction:
+            levels.append((simplified, cell_size))
+            triangle_count = len(simplified)
+        cell_size *= 2
+    return levels
+
+
+def select_levels(objects: list[DetailLevels], camera_position: internals.vectors.Vector, tan_fy: float,
+                  screen_height: int, tolerance: float = 1, budget: int | None = None) -> list[int]:
+    # Picks the coarsest level of every object whose cluster size stays within tolerance pixels on screen,
+    # measured at the nearest point of the object's bounding sphere. If the chosen levels have more than
+    # budget triangles, the objects whose next level looks smallest on screen are coarsened first
+    position = np.array(camera_position.to_tuple())
+    pixels_per_unit = []
+    chosen = []
+    for detail_levels in objects:
+        distance = max(float(np.linalg.norm(detail_levels.center - position)) - detail_levels.radius, 0.1)
+        scale = screen_height / (2 * distance * tan_fy)
+        level = 0
+        while level + 1 < len(detail_levels) and detail_levels.errors[level + 1] * scale <= tolerance:
+            level += 1
+        pixels_per_unit.append(scale)
+        chosen.append(level)
+
+    if budget is None:
+        return chosen
+
+    total = sum(detail_levels.triangle_count(level) for detail_levels, level in zip(objects, chosen))
+    candidates = [
+        (detail_levels.errors[level + 1] * scale, index)
+        for index, (detail_levels, level, scale) in enumerate(zip(objects, chosen, pixels_per_unit))
+        if level + 1 < len(detail_levels)
+    ]
+    heapq.heapify(candidates)
+    while total > budget and candidates:
+        _, index = heapq.heappop(candidates)
+        detail_levels = objects[index]
+        total -= detail_levels.triangle_count(chosen[index]) - detail_levels.triangle_count(chosen[index] + 1)
+        chosen[index] += 1
+        if chosen[index] + 1 < len(detail_levels):
+            heapq.heappush(candidates, (detail_levels.errors[chosen[index] + 1] * pixels_per_unit[index], index))
+    return chosen
@@ -1,10 +1,11 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import internals.vectors
 import internals.rgb
 
 
 class Vertex(internals.vectors.Vector):
-    pass
+    __slots__ = ()
 
 
 class Object2D(ABC):
@@ -112,13 +113,143 @@ class Quad(Polygon):
         )
 
 
+class Mesh:
+    # Indexed triangle mesh: every vertex is stored once and referenced by triangles.
+    # triangle_normals is the normal of every face, corner_normals the normals of its three corners
+    # for smooth shading, the face normal at every corner when not given
+    vertices: np.ndarray
+    normals: np.ndarray
+    triangles: np.ndarray
+    triangle_normals: np.ndarray
+    corner_normals: np.ndarray
+
+    def __init__(self, vertices: np.ndarray, normals: np.ndarray, triangles: np.ndarray,
+                 triangle_normals: np.ndarray, corner_normals: np.ndarray | None = None):
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.triangle_normals = np.asarray(triangle_normals, dtype=np.int64).reshape(-1)
+        if corner_normals is None:
+            self.corner_normals = np.repeat(self.triangle_normals[:, None], 3, axis=1)
+        else:
+            self.corner_normals = np.asarray(corner_normals, dtype=np.int64).reshape(-1, 3)
+
+    @staticmethod
+    def empty():
+        return Mesh(vertices=[], normals=[], triangles=[], triangle_normals=[])
+
+    @staticmethod
+    def merge(meshes: list):
+        vertex_offset = 0
+        normal_offset = 0
+        triangles = []
+        triangle_normals = []
+        corner_normals = []
+        for mesh in meshes:
+            triangles.append(mesh.triangles + vertex_offset)
+            triangle_normals.append(mesh.triangle_normals + normal_offset)
+            corner_normals.append(mesh.corner_normals + normal_offset)
+            vertex_offset += len(mesh.vertices)
+            normal_offset += len(mesh.normals)
+
+        if not meshes:
+            return Mesh.empty()
+        return Mesh(
+            vertices=np.concatenate([mesh.vertices for mesh in meshes]),
+            normals=np.concatenate([mesh.normals for mesh in meshes]),
+            triangles=np.concatenate(triangles),
+            triangle_normals=np.concatenate(triangle_normals),
+            corner_normals=np.concatenate(corner_normals),
+        )
+
+    @property
+    def face_normals(self) -> np.ndarray:
+        return self.normals[self.triangle_normals]
+
+    def to_polygons(self, color: internals.rgb.RGB) -> tuple[list[Vertex], list[internals.vectors.Vector], list[Polygon]]:
+        vertices = [Vertex(*vertex) for vertex in self.vertices.tolist()]
+        normals = [internals.vectors.Vector(*normal) for normal in self.normals.tolist()]
+        polygons = [
+            Polygon(
+                first=vertices[first],
+                second=vertices[second],
+                third=vertices[third],
+                color=color,
+                normal=normals[normal],
+            )
+            for (first, second, third), normal in zip(self.triangles.tolist(), self.triangle_normals.tolist())
+        ]
+        return vertices, normals, polygons
+
+    def __len__(self):
+        return len(self.triangles)
+
+
+class Transform:
+    # Places an object in the scene: it is scaled, rotated and then moved to position, relative to the parent
+    # transform when there is one, so objects sharing a parent move together.
+    # to_tuple() covers the parents too and tells whether world space data computed earlier is stale
+    position: internals.vectors.Vector
+    rotation: internals.vectors.Quaternion
+    scale: float | tuple
+    parent: "Transform | None"
+
+    def __init__(self, position: internals.vectors.Vector | None = None,
+                 rotation: internals.vectors.Quaternion | None = None,
+                 scale: float | tuple = 1, parent: "Transform | None" = None):
+        self.position = internals.vectors.Vector(0, 0, 0) if position is None else position
+        self.rotation = internals.vectors.Quaternion(1, 0, 0, 0) if rotation is None else rotation
+        self.scale = scale
+        self.parent = parent
+
+    def to_tuple(self):
+        scale = tuple(np.broadcast_to(np.asarray(self.scale, dtype=np.float64), 3).tolist())
+        return (self.position.to_tuple(), self.rotation.to_tuple(), scale,
+                None if self.parent is None else self.parent.to_tuple())
+
+    def matrices(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # The whole chain of parents as a (3, 3) matrix and a translation for points, and a (3, 3) matrix
+        # for normals, which are divided by the scale to stay perpendicular to faces stretched along one axis
+        scale = np.broadcast_to(np.asarray(self.scale, dtype=np.float64), 3)
+        rotation = self.rotation.rotation_matrix
+        linear = rotation * scale
+        translation = np.array(self.position.to_tuple())
+        normal = rotation / scale
+        if self.parent is not None:
+            parent_linear, parent_translation, parent_normal = self.parent.matrices()
+            linear = parent_linear @ linear
+            translation = parent_linear @ translation + parent_translation
+            normal = parent_normal @ normal
+        return linear, translation, normal
+
+    def apply(self, vertices: np.ndarray) -> np.ndarray:
+        # (N, 3) model space points to world space
+        linear, translation, _ = self.matrices()
+        return vertices @ linear.T + translation
+
+    def apply_normals(self, normals: np.ndarray) -> np.ndarray:
+        # (N, 3) model space normals to world space, not normalized
+        _, _, normal = self.matrices()
+        return normals @ normal.T
+
+    @property
+    def scale_factor(self) -> float:
+        # how much longer distances get at most
+        factor = float(np.abs(np.asarray(self.scale, dtype=np.float64)).max())
+        return factor if self.parent is None else factor * self.parent.scale_factor
+
+
 class Object:
     name: str
     smooth_shading: int
     polygons: list
     normals: list
     vertices: list
+    triangles: list
+    triangle_normals: list
     color: internals.rgb.RGB
+    transform: Transform
+    _mesh: Mesh | None
 
     def __init__(self, name: str, color: internals.rgb.RGB):
         self.name = name
@@ -126,4 +257,34 @@ class Object:
         self.polygons = list()
         self.normals = list()
         self.vertices = list()
+        self.triangles = list()
+        self.triangle_normals = list()
         self.color = color
+        # the mesh stays in model space, SceneData keeps the transformed copy
+        self.transform = Transform()
+        self._mesh = None
+
+    @staticmethod
+    def from_mesh(name: str, color: internals.rgb.RGB, mesh: Mesh, smooth_shading: int = 0):
+        # Vertex and Polygon objects of such an object are only built when get_polygons is called
+        obj = Object(name, color=color)
+        obj.smooth_shading = smooth_shading
+        obj._mesh = mesh
+        return obj
+
+    def get_mesh(self) -> Mesh:
+        if self._mesh is None:
+            self._mesh = Mesh(
+                vertices=[vertex.to_tuple() for vertex in self.vertices],
+                normals=[normal.to_tuple() for normal in self.normals],
+                triangles=self.triangles,
+                triangle_normals=self.triangle_normals,
+            )
+        return self._mesh
+
+    def get_polygons(self) -> list[Polygon]:
+        if not self.polygons and len(self.get_mesh()):
+            self.vertices, self.normals, self.polygons = self._mesh.to_polygons(self.color)
+            self.triangles = self._mesh.triangles.tolist()
+            self.triangle_normals = self._mesh.triangle_normals.tolist()
+        return self.polygons
@@ -0,0 +1,202 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import internals.objects
+import internals.render
+import internals.vectors
+
+
+class _SharedArrays:
+    # numpy arrays in one shared memory block, the layout is (name, shape, dtype) per array and picklable
+    block: shared_memory.SharedMemory
+    layout: tuple
+    arrays: dict
+
+    def __init__(self, layout: tuple, name: str | None = None):
+        offsets = []
+        size = 0
+        for _, shape, dtype in layout:
+            offsets.append(size)
+            # keep every array 8 byte aligned
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // 8) * 8
+        if name is None:
+            self.block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        else:
+            self.block = shared_memory.SharedMemory(name=name)
+        self.layout = layout
+        self.arrays = {
+            array_name: np.ndarray(shape, dtype=dtype, buffer=self.block.buf, offset=offset)
+            for (array_name, shape, dtype), offset in zip(layout, offsets)
+        }
+
+    @property
+    def name(self) -> str:
+        return self.block.name
+
+    def close(self):
+        # arrays must not be used after closing
+        self.arrays = dict()
+        self.block.close()
+
+
+# shared arrays of the mesh a worker process currently renders, attached on its first chunk
+_worker_arrays: _SharedArrays | None = None
+
+
+def _attach(name: str, layout: tuple) -> dict:
+    global _worker_arrays
+    if _worker_arrays is None or _worker_arrays.name != name:
+        if _worker_arrays is not None:
+            _worker_arrays.close()
+        _worker_arrays = _SharedArrays(layout, name=name)
+    return _worker_arrays.arrays
+
+
+def _project_chunk(name: str, layout: tuple, start: int, stop: int,
+                   tan_fy: float, aspect_ratio: float,
+                   camera_position: internals.vectors.Vector,
+                   screen_height: int, camera_angle: internals.vectors.Quaternion,
+                   depth_interpolation_method: str) -> tuple[int, int, int]:
+    # Projects and culls the triangles listed at considered[start:stop] and writes the visible ones,
+    # furthest first, to the output arrays from row start on.
+    # Returns the number of visible, frustrum culled and normal culled triangles
+    arrays = _attach(name, layout)
+    considered = arrays["considered"][start:stop]
+    vertices, triangles = internals.render._compact(arrays["vertices"], arrays["triangles"][considered])
+    normals = arrays["face_normals"][considered]
+
+    vertex_points, vertex_depthes, vertex_visible = internals.render._convert_vertices_to_2d(
+        vertices=vertices,
+        tan_fy=tan_fy,
+        aspect_ratio=aspect_ratio,
+        camera_position=camera_position,
+        screen_height=screen_height,
+        camera_angle=camera_angle,
+    )
+    frustrum_visible, normal_visible = internals.render._cull_triangles(
+        vertices=vertices,
+        triangles=triangles,
+        normals=normals,
+        vertex_visible=vertex_visible,
+        camera_position=camera_position,
+    )
+    mask = frustrum_visible & normal_visible
+    triangles = triangles[mask]
+    depthes = vertex_depthes[triangles]
+    resulting_depthes = internals.render._interpolate_depthes(depthes, depth_interpolation_method)
+
+    # sorted chunks are merged by the stable sort of the calling process
+    order = np.argsort(-resulting_depthes, kind="stable")
+    count = len(order)
+    arrays["points"][start:start + count] = vertex_points[triangles[order]]
+    arrays["vertex_depthes"][start:start + count] = depthes[order]
+    arrays["depthes"][start:start + count] = resulting_depthes[order]
+    arrays["indexes"][start:start + count] = considered[mask][order]
+    return (
+        count,
+        int(np.count_nonzero(~frustrum_visible)),
+        int(np.count_nonzero(frustrum_visible & ~normal_visible)),
+    )
+
+
+class RenderPool:
+    # Worker processes that project, cull and depth sort chunks of one frame's triangles. The mesh is copied
+    # once into shared memory, per frame only the considered triangle indexes are written there, and every
+    # worker writes its visible triangles back into shared output arrays, so no triangles are pickled
+    workers: int
+    chunks_per_worker: int
+    _executor: ProcessPoolExecutor
+    _shared: _SharedArrays | None
+    _mesh: internals.objects.Mesh | None
+
+    def __init__(self, workers: int = os.cpu_count() or 1, chunks_per_worker: int = 2):
+        if workers < 1:
+            raise ValueError(f"Expected at least one worker but got {workers}")
+        self.workers = workers
+        self.chunks_per_worker = chunks_per_worker
+        self._executor = ProcessPoolExecutor(max_workers=workers)
+        self._shared = None
+        self._mesh = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown()
+        self._release()
+
+    def _release(self):
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.block.unlink()
+            self._shared = None
+            self._mesh = None
+
+    def _bind(self, mesh: internals.objects.Mesh):
+        # copies the mesh into shared memory, again only when another mesh is rendered
+        if mesh is self._mesh:
+            return
+        self._release()
+        count = len(mesh.triangles)
+        self._shared = _SharedArrays((
+            ("vertices", mesh.vertices.shape, np.float64),
+            ("triangles", mesh.triangles.shape, np.int64),
+            ("face_normals", (count, 3), np.float64),
+            ("considered", (count,), np.int64),
+            ("points", (count, 3, 2), np.float64),
+            ("vertex_depthes", (count, 3), np.float64),
+            ("depthes", (count,), np.float64),
+            ("indexes", (count,), np.int64),
+        ))
+        self._shared.arrays["vertices"][:] = mesh.vertices
+        self._shared.arrays["triangles"][:] = mesh.triangles
+        self._shared.arrays["face_normals"][:] = mesh.face_normals
+        self._mesh = mesh
+
+    def project(self, mesh: internals.objects.Mesh, colors: np.ndarray,
+                tan_fy: float, aspect_ratio: float,
+                camera_position: internals.vectors.Vector,
+                screen_height: int, camera_angle: internals.vectors.Quaternion,
+                depth_interpolation_method: str,
+                subset: np.ndarray | None = None) \
+            -> tuple["internals.render.ProjectedTriangles", int, int]:
+        # Parallel counterpart of internals.render._project_mesh. Returns the visible triangles as sorted runs,
+        # one per chunk, and the numbers of frustrum and normal culled triangles among the considered ones
+        self._bind(mesh)
+        arrays = self._shared.arrays
+        considered = np.arange(len(mesh.triangles), dtype=np.int64) if subset is None else subset
+        arrays["considered"][:len(considered)] = considered
+
+        bounds = np.linspace(0, len(considered), self.workers * self.chunks_per_worker + 1).astype(np.int64)
+        chunks = [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        futures = [
+            self._executor.submit(
+                _project_chunk, self._shared.name, self._shared.layout, start, stop,
+                tan_fy, aspect_ratio, camera_position, screen_height, camera_angle, depth_interpolation_method,
+            )
+            for start, stop in chunks
+        ]
+
+        rows = []
+        frustrum_culled = 0
+        normal_culled = 0
+        for (start, _), future in zip(chunks, futures):
+            count, chunk_frustrum_culled, chunk_normal_culled = future.result()
+            rows.append(np.arange(start, start + count))
+            frustrum_culled += chunk_frustrum_culled
+            normal_culled += chunk_normal_culled
+        rows = np.concatenate([np.zeros(0, dtype=np.int64)] + rows)
+
+        # fancy indexing copies the rows out of the shared arrays before the next frame overwrites them
+        indexes = arrays["indexes"][rows]
+        return internals.render.ProjectedTriangles(
+            points=arrays["points"][rows],
+            vertex_depthes=arrays["vertex_depthes"][rows],
+            depthes=arrays["depthes"][rows],
+            colors=colors[indexes],
+            indexes=indexes,
+        ), frustrum_culled, normal_culled
@@ -0,0 +1,178 @@
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class StageRecord:
+    # Timing of one stage, callers fill in how many polygons went in and came out
+    name: str
+    start: float
+    duration: float
+    polygons_in: int | None
+    polygons_out: int | None
+
+    def __init__(self, name: str, start: float, polygons_in: int | None = None):
+        self.name = name
+        self.start = start
+        self.duration = 0
+        self.polygons_in = polygons_in
+        self.polygons_out = None
+
+
+class Profiler:
+    # Times the stages of the render loop. Stages recorded inside frame() are summed per frame,
+    # so a stage split in several places counts once. The last history frames are kept for percentiles.
+    # Frames are per thread, stages of other threads are recorded on their own. Recording and reading
+    # the kept timings may happen on different threads
+    stages = ("transform", "cull", "shade", "sort", "emit", "draw")
+    history: int
+    enabled: bool
+    _durations: dict
+    _polygons: dict
+    _events: collections.deque
+    _local: threading.local
+    _frame_count: int
+    _lock: threading.Lock
+
+    def __init__(self, history: int = 1000, enabled: bool = True):
+        self.history = history
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._durations = collections.defaultdict(lambda: collections.deque(maxlen=self.history))
+            self._polygons = collections.defaultdict(lambda: collections.deque(maxlen=self.history))
+            # every stage and frame once as (name, start, duration, frame, thread, polygons in, polygons out)
+            self._events = collections.deque(maxlen=self.history * (len(self.stages) + 1))
+            # the stages and start of the frame a thread is in
+            self._local = threading.local()
+            self._frame_count = 0
+
+    @contextlib.contextmanager
+    def frame(self):
+        if not self.enabled or getattr(self._local, "frame", None) is not None:
+            yield
+            return
+        records = self._local.frame = dict()
+        total = StageRecord("frame", time.perf_counter())
+        try:
+            yield
+        finally:
+            self._local.frame = None
+            total.duration = time.perf_counter() - total.start
+            with self._lock:
+                for record in list(records.values()) + [total]:
+                    self._add(record)
+                self._frame_count += 1
+
+    @contextlib.contextmanager
+    def stage(self, name: str, polygons_in: int | None = None):
+        record = StageRecord(name, time.perf_counter(), polygons_in)
+        try:
+            yield record
+        finally:
+            if self.enabled:
+                record.duration = time.perf_counter() - record.start
+                frame = getattr(self._local, "frame", None)
+                if frame is None:
+                    with self._lock:
+                        self._add(record)
+                elif name in frame:
+                    # a stage entered again in the same frame adds its time, the first count in and the last out stay
+                    previous = frame[name]
+                    previous.duration += record.duration
+                    if record.polygons_out is not None:
+                        previous.polygons_out = record.polygons_out
+                else:
+                    frame[name] = record
+
+    def _add(self, record: StageRecord):
+        # callers hold _lock
+        self._durations[record.name].append(record.duration)
+        self._polygons[record.name].append((record.polygons_in, record.polygons_out))
+        self._events.append((record.name, record.start, record.duration, self._frame_count, threading.get_ident(),
+                             record.polygons_in, record.polygons_out))
+
+    def percentiles(self, name: str, quantiles: tuple = (50, 95, 99)) -> dict:
+        with self._lock:
+            durations = list(self._durations.get(name, ()))
+        return self._percentiles(durations, quantiles)
+
+    @staticmethod
+    def _percentiles(durations: list, quantiles: tuple = (50, 95, 99)) -> dict:
+        if not durations:
+            return {f"p{quantile}": None for quantile in quantiles}
+        values = np.percentile(np.array(durations), quantiles)
+        return {f"p{quantile}": float(value) for quantile, value in zip(quantiles, values)}
+
+    def summary(self) -> dict:
+        # Seconds per stage over the kept frames and the mean number of polygons in and out
+        with self._lock:
+            durations_by_name = {name: list(durations) for name, durations in self._durations.items()}
+            polygons_by_name = {name: list(polygons) for name, polygons in self._polygons.items()}
+        result = dict()
+        for name in [*self.stages, "frame"] + sorted(set(durations_by_name) - set(self.stages) - {"frame"}):
+            durations = durations_by_name.get(name)
+            if not durations:
+                continue
+            counts_in = [count for count, _ in polygons_by_name[name] if count is not None]
+            counts_out = [count for _, count in polygons_by_name[name] if count is not None]
+            result[name] = {
+                "samples": len(durations),
+                "mean": float(np.mean(durations)),
+                **self._percentiles(durations),
+                "polygons_in": float(np.mean(counts_in)) if counts_in else None,
+                "polygons_out": float(np.mean(counts_out)) if counts_out else None,
+            }
+        return result
+
+    def report(self) -> str:
+        lines = [f"{'stage':<10}{'p50':>10}{'p95':>10}{'p99':>10}{'in':>10}{'out':>10}  ms / polygons"]
+        for name, stage in self.summary().items():
+            lines.append(f"{name:<10}" + "".join(
+                f"{stage[key] * 1000:>10.2f}" for key in ("p50", "p95", "p99")
+            ) + "".join(
+                f"{round(stage[key]):>10}" if stage[key] is not None else f"{'':>10}"
+                for key in ("polygons_in", "polygons_out")
+            ))
+        return "\n".join(lines)
+
+    def export_json(self, path: str):
+        with self._lock:
+            events = list(self._events)
+        frames = collections.defaultdict(dict)
+        for name, _, duration, frame, _, polygons_in, polygons_out in events:
+            frames[frame][name] = {"seconds": duration, "polygons_in": polygons_in, "polygons_out": polygons_out}
+        with open(path, "w") as file:
+            json.dump({"summary": self.summary(), "frames": [frames[frame] for frame in sorted(frames)]}, file)
+
+    def export_chrome_trace(self, path: str):
+        # Trace Event Format, opens in chrome://tracing and Perfetto
+        # every thread gets its own track
+        process = os.getpid()
+        with self._lock:
+            recorded = list(self._events)
+        events = []
+        for name, start, duration, frame, thread, polygons_in, polygons_out in recorded:
+            events.append({
+                "name": name,
+                "cat": "frame" if name == "frame" else "stage",
+                "ph": "X",
+                "ts": start * 1e6,
+                "dur": duration * 1e6,
+                "pid": process,
+                "tid": thread,
+                "args": {"frame": frame, "polygons_in": polygons_in, "polygons_out": polygons_out},
+            })
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+# used by renderers that are not given a profiler
+disabled = Profiler(history=1, enabled=False)
@@ -0,0 +1,162 @@
+import struct
+import zlib
+import numpy as np
+import internals.rgb
+
+
+class Rasterizer:
+    # Fills triangles and lines into a color buffer with a depth buffer instead of drawing canvas items.
+    # Triangles are rasterized all at once over their bounding boxes, split into batches of at most
+    # batch_size candidate pixels to bound memory
+    width: int
+    height: int
+    background: internals.rgb.RGB
+    batch_size: int
+    color_buffer: np.ndarray
+    depth_buffer: np.ndarray
+
+    def __init__(self, width: int, height: int, background: internals.rgb.RGB = internals.rgb.RGB(128, 128, 128),
+                 batch_size: int = 1 << 20):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.batch_size = batch_size
+        self.color_buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.depth_buffer = np.empty((height, width), dtype=np.float64)
+        self.clear()
+
+    def clear(self):
+        self.color_buffer[:] = self.background.to_tuple()
+        self.depth_buffer[:] = np.inf
+
+    def draw_triangles(self, points: np.ndarray, depthes: np.ndarray, colors: np.ndarray):
+        # points (T, 3, 2) in screen coordinates, depthes (T, 3) per vertex, colors (T, 3) per triangle
+        # or (T, 3, 3) per vertex to be interpolated across the triangle
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3, 2)
+        depthes = np.asarray(depthes, dtype=np.float64).reshape(-1, 3)
+        colors = np.asarray(colors)
+        colors = colors.reshape(-1, 3, 3) if colors.ndim == 3 else colors.reshape(-1, 3)
+
+        first, second, third = points[:, 0], points[:, 1], points[:, 2]
+        areas = _cross(second - first, third - first)
+
+        x_min = np.clip(np.ceil(points[:, :, 0].min(axis=1)), 0, self.width).astype(np.int64)
+        x_max = np.clip(np.floor(points[:, :, 0].max(axis=1)), -1, self.width - 1).astype(np.int64)
+        y_min = np.clip(np.ceil(points[:, :, 1].min(axis=1)), 0, self.height).astype(np.int64)
+        y_max = np.clip(np.floor(points[:, :, 1].max(axis=1)), -1, self.height - 1).astype(np.int64)
+
+        # degenerate and off-screen triangles cover no pixels
+        keep = (areas != 0) & (x_max >= x_min) & (y_max >= y_min)
+        if not keep.any():
+            return
+        points, depthes, colors, areas = points[keep], depthes[keep], colors[keep], areas[keep]
+        x_min, y_min = x_min[keep], y_min[keep]
+        box_widths = x_max[keep] - x_min + 1
+        box_sizes = box_widths * (y_max[keep] - y_min + 1)
+
+        batch_ends = np.cumsum(box_sizes)
+        start = 0
+        while start < len(box_sizes):
+            limit = (batch_ends[start - 1] if start else 0) + self.batch_size
+            stop = max(int(np.searchsorted(batch_ends, limit, side="right")), start + 1)
+            batch = slice(start, stop)
+            self._draw_batch(points[batch], depthes[batch], colors[batch], areas[batch],
+                             x_min[batch], y_min[batch], box_widths[batch], box_sizes[batch])
+            start = stop
+
+    def _draw_batch(self, points, depthes, colors, areas, x_min, y_min, box_widths, box_sizes):
+        triangle = np.repeat(np.arange(len(box_sizes)), box_sizes)
+        offsets = np.arange(int(box_sizes.sum())) - np.repeat(np.cumsum(box_sizes) - box_sizes, box_sizes)
+        pixels = np.stack((
+            x_min[triangle] + offsets % box_widths[triangle],
+            y_min[triangle] + offsets // box_widths[triangle],
+        ), axis=1).astype(np.float64)
+
+        # edge functions are compared unnormalized so that pixels on shared edges are found exactly
+        vertices = points[triangle]
+        signs = np.sign(areas)[triangle]
+        edge_first = _cross(vertices[:, 2] - vertices[:, 1], pixels - vertices[:, 1]) * signs
+        edge_second = _cross(vertices[:, 0] - vertices[:, 2], pixels - vertices[:, 2]) * signs
+        edge_third = _cross(vertices[:, 1] - vertices[:, 0], pixels - vertices[:, 0]) * signs
+        inside = (edge_first >= 0) & (edge_second >= 0) & (edge_third >= 0)
+
+        triangle = triangle[inside]
+        weights = np.stack((edge_first[inside], edge_second[inside], edge_third[inside]), axis=1)
+        depth = np.einsum("pv,pv->p", weights, depthes[triangle]) / np.abs(areas[triangle])
+        pixel = (pixels[inside, 1] * self.width + pixels[inside, 0]).astype(np.int64)
+
+        if colors.ndim == 2:
+            self._write(pixel, depth, colors[triangle])
+            return
+        # corner colors are only interpolated for the fragments that pass the depth test
+        pixel, fragments = self._depth_test(pixel, depth)
+        triangle = triangle[fragments]
+        self.color_buffer.reshape(-1, 3)[pixel] = np.rint(
+            np.einsum("pv,pvc->pc", weights[fragments], colors[triangle]) / np.abs(areas[triangle])[:, None]
+        )
+
+    def draw_lines(self, points: np.ndarray, depthes: np.ndarray, colors: np.ndarray):
+        # points (L, 2, 2) in screen coordinates, depthes (L, 2) per end, colors (L, 3)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2, 2)
+        depthes = np.asarray(depthes, dtype=np.float64).reshape(-1, 2)
+        colors = np.asarray(colors).reshape(-1, 3)
+        if not len(points):
+            return
+
+        # one sample per pixel along the longer axis, clipped to the screen afterwards
+        lengths = np.abs(points[:, 1] - points[:, 0]).max(axis=1)
+        lengths = np.minimum(lengths, 4 * (self.width + self.height)).astype(np.int64) + 1
+        line = np.repeat(np.arange(len(points)), lengths)
+        fractions = (np.arange(int(lengths.sum())) - np.repeat(np.cumsum(lengths) - lengths, lengths)) \
+            / np.maximum(lengths - 1, 1)[line]
+
+        samples = points[line, 0] + (points[line, 1] - points[line, 0]) * fractions[:, None]
+        depth = depthes[line, 0] + (depthes[line, 1] - depthes[line, 0]) * fractions
+        x, y = np.rint(samples[:, 0]), np.rint(samples[:, 1])
+        on_screen = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+
+        pixel = (y[on_screen] * self.width + x[on_screen]).astype(np.int64)
+        self._write(pixel, depth[on_screen], colors[line[on_screen]])
+
+    def _write(self, pixel: np.ndarray, depth: np.ndarray, colors: np.ndarray):
+        pixel, fragments = self._depth_test(pixel, depth)
+        self.color_buffer.reshape(-1, 3)[pixel] = colors[fragments]
+
+    def _depth_test(self, pixel: np.ndarray, depth: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # Keeps the nearest fragment per pixel, then tests it against the depth buffer and updates it.
+        # Returns the pixels to color and the positions of their fragments
+        order = np.lexsort((depth, pixel))
+        pixel, depth = pixel[order], depth[order]
+        nearest = np.ones(len(pixel), dtype=bool)
+        nearest[1:] = pixel[1:] != pixel[:-1]
+        pixel, depth, order = pixel[nearest], depth[nearest], order[nearest]
+
+        depth_buffer = self.depth_buffer.reshape(-1)
+        closer = depth < depth_buffer[pixel]
+        depth_buffer[pixel[closer]] = depth[closer]
+        return pixel[closer], order[closer]
+
+
+def _cross(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    return first[..., 0] * second[..., 1] - first[..., 1] * second[..., 0]
+
+
+def to_ppm(color_buffer: np.ndarray) -> bytes:
+    height, width, _ = color_buffer.shape
+    return f"P6 {width} {height} 255\n".encode() + np.ascontiguousarray(color_buffer, dtype=np.uint8).tobytes()
+
+
+def to_png(color_buffer: np.ndarray) -> bytes:
+    height, width, _ = color_buffer.shape
+    # every scanline is prefixed with filter type 0 (none)
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = np.asarray(color_buffer, dtype=np.uint8).reshape(height, width * 3)
+    return b"\x89PNG\r\n\x1a\n" + b"".join((
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)),
+        _png_chunk(b"IEND", b""),
+    ))
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
@@ -2,7 +2,16 @@ import internals.vectors
 import internals.objects
 import internals.handlers
 import internals.rgb
-import math
+import internals.raster
+import internals.lod
+import internals.profiler
+import numpy as np
+
+VISIBLE = "visible"
+FRUSTRUM_CULLED = "frustrum"
+NORMAL_CULLED = "normal"
+
+NEAR_PLANE = 0.1
 
 
 class Renderer:
@@ -12,7 +21,23 @@ class Renderer:
     camera_position: internals.vectors.Vector
     screen_height: int
     camera_angle: internals.vectors.Quaternion
-    light: internals.rgb.Light
+    light: internals.rgb.Light | internals.rgb.PointLight | list
+    projection_method: str
+    depth_interpolation_method: str
+    shading_method: str
+    depth_order: "DepthOrder"
+    bvh_culling: bool
+    lod_tolerance: float
+    triangle_budget: int | None
+    profiler: internals.profiler.Profiler
+    render_pool: "internals.parallel.RenderPool | None"
+    frustrum_culled: int
+    normal_culled: int
+    nodes_tested: int
+    nodes_culled: int
+    triangles_skipped: int
+    detail_levels: list[int]
+    lod_triangles: int
 
     def __init__(self,
                  data_handler: internals.handlers.SceneData,
@@ -21,7 +46,16 @@ class Renderer:
                  camera_position: internals.vectors.Vector,
                  screen_height: int,
                  camera_angle: internals.vectors.Quaternion,
-                 light: internals.rgb.Light,
+                 light: internals.rgb.Light | internals.rgb.PointLight | list,
+                 projection_method: str = "batched",
+                 bvh_culling: bool = True,
+                 depth_interpolation_method: str = "average",
+                 shading_method: str = "flat",
+                 depth_order: "DepthOrder | None" = None,
+                 lod_tolerance: float = 1,
+                 triangle_budget: int | None = None,
+                 profiler: internals.profiler.Profiler | None = None,
+                 render_pool: "internals.parallel.RenderPool | None" = None,
                  ):
         self.data_handler = data_handler
         self.tan_fy = tan_fy
@@ -29,26 +63,186 @@ class Renderer:
         self.camera_position = camera_position
         self.screen_height = screen_height
         self.camera_angle = camera_angle
+        # one light or a list of directional and point lights, all of them are evaluated in one batch
         self.light = light
+        self.projection_method = projection_method
+        self.bvh_culling = bvh_culling
+        self.depth_interpolation_method = depth_interpolation_method
+        # "flat" lights every triangle with its face normal, "smooth" interpolates the colors lit at its corners,
+        # "object" is smooth only for objects whose "s" group turns smoothing on
+        self.shading_method = shading_method
+        # pass the same DepthOrder to the renderers of consecutive frames to reuse the previous order
+        self.depth_order = DepthOrder() if depth_order is None else depth_order
+        # simplified levels are used while their clusters look at most lod_tolerance pixels large
+        self.lod_tolerance = lod_tolerance
+        self.triangle_budget = triangle_budget
+        self.profiler = internals.profiler.disabled if profiler is None else profiler
+        # projects the triangles of a frame in worker processes, kept open between frames by the caller
+        self.render_pool = render_pool
+        self.frustrum_culled = 0
+        self.normal_culled = 0
+        # per-frame statistics of the bounding volume hierarchy
+        self.nodes_tested = 0
+        self.nodes_culled = 0
+        self.triangles_skipped = 0
+        # per-frame level of detail of every object and the number of triangles in these levels
+        self.detail_levels = []
+        self.lod_triangles = 0
 
     def render_polygons(self) -> list[internals.objects.CanvasPolygon]:
-        list_of_canvas_polygons_unsorted = []
+        if self.projection_method == "batched":
+            return self._render_polygons_batched()
+        elif self.projection_method == "per_vertex":
+            return self._render_polygons_per_vertex()
+        else:
+            raise KeyError("Unknown projection method")
+
+    def _project(self) -> "ProjectedTriangles":
+        with self.profiler.stage("transform"):
+            # only objects that moved since the last frame are transformed again
+            self.data_handler.update_transforms()
+        mesh = self.data_handler.get_lod_mesh()
+        objects = self.data_handler.get_detail_levels()
+        with self.profiler.stage("cull", polygons_in=len(self.data_handler.get_mesh())) as record:
+            self.detail_levels = internals.lod.select_levels(
+                objects=objects,
+                camera_position=self.camera_position,
+                tan_fy=self.tan_fy,
+                screen_height=self.screen_height,
+                tolerance=self.lod_tolerance,
+                budget=self.triangle_budget,
+            )
+            # ranges are numbered object after object, level after level
+            first_ranges = np.cumsum([0] + [len(detail_levels) for detail_levels in objects[:-1]], dtype=np.int64)
+            object_ranges = first_ranges[:len(objects)] + np.array(self.detail_levels, dtype=np.int64)
+            self.lod_triangles = sum(
+                detail_levels.triangle_count(level) for detail_levels, level in zip(objects, self.detail_levels)
+            )
 
-        for polygon in self.data_handler.get_polygons():
-            try:
-                canvas_polygon, depth = _convert_polygon_to_2d(
-                    polygon=polygon,
+            self.nodes_tested = 0
+            self.nodes_culled = 0
+            self.triangles_skipped = 0
+            if self.bvh_culling:
+                # whole objects and clusters outside the view frustrum are rejected before any per-triangle work
+                subset, self.nodes_tested, self.nodes_culled = self.data_handler.get_bvh().cull(
+                    camera_position=self.camera_position,
+                    camera_angle=self.camera_angle,
+                    tan_fy=self.tan_fy,
+                    aspect_ratio=self.aspect_ratio,
+                    near=NEAR_PLANE,
+                    object_ranges=object_ranges,
+                )
+                self.triangles_skipped = self.lod_triangles - len(subset)
+            else:
+                subset = np.concatenate([np.zeros(0, dtype=np.int64)] + [
+                    np.arange(*detail_levels.ranges[level], dtype=np.int64)
+                    for detail_levels, level in zip(objects, self.detail_levels)
+                ])
+            record.polygons_out = len(subset)
+            if len(subset) == len(mesh):
+                subset = None
+
+        with self.profiler.stage("shade", polygons_in=record.polygons_out) as shade_record:
+            # shading does not depend on the camera, it is cached until the light or the model changes
+            colors = self.data_handler.get_shaded_colors(self.light)
+            shade_record.polygons_out = record.polygons_out
+
+        if self.render_pool is not None:
+            with self.profiler.stage("transform", polygons_in=record.polygons_out) as pool_record:
+                projected, frustrum_culled, self.normal_culled = self.render_pool.project(
+                    mesh=mesh,
+                    colors=colors,
                     tan_fy=self.tan_fy,
                     aspect_ratio=self.aspect_ratio,
                     camera_position=self.camera_position,
                     screen_height=self.screen_height,
                     camera_angle=self.camera_angle,
-                    depth_interpolation_method="average",
-                    light=self.light,
+                    depth_interpolation_method=self.depth_interpolation_method,
+                    subset=subset,
                 )
-            except FrustrumCullingException:
+                pool_record.polygons_out = len(projected)
+            self.frustrum_culled = frustrum_culled + self.triangles_skipped
+            return self._shade_corners(projected)
+
+        projected, frustrum_visible, normal_visible = _project_mesh(
+            mesh=mesh,
+            colors=colors,
+            tan_fy=self.tan_fy,
+            aspect_ratio=self.aspect_ratio,
+            camera_position=self.camera_position,
+            screen_height=self.screen_height,
+            camera_angle=self.camera_angle,
+            depth_interpolation_method=self.depth_interpolation_method,
+            subset=subset,
+            profiler=self.profiler,
+        )
+        # triangles skipped by the hierarchy count as frustrum culled
+        self.frustrum_culled = int(np.count_nonzero(~frustrum_visible)) + self.triangles_skipped
+        self.normal_culled = int(np.count_nonzero(frustrum_visible & ~normal_visible))
+        return self._shade_corners(projected)
+
+    def _shade_corners(self, projected: "ProjectedTriangles") -> "ProjectedTriangles":
+        # Gouraud shading of the visible triangles: their corners look up the colors every normal was lit with.
+        # Lighting stays once per normal, only the corners of visible triangles cost a lookup
+        if self.shading_method == "flat":
+            return projected
+        elif self.shading_method not in ("smooth", "object"):
+            raise KeyError("Unknown shading method")
+
+        with self.profiler.stage("shade", polygons_in=len(projected)) as record:
+            mesh = self.data_handler.get_lod_mesh()
+            corner_normals = mesh.corner_normals[projected.indexes]
+            if self.shading_method == "object":
+                flat = ~self.data_handler.get_smooth_triangles()[projected.indexes]
+                corner_normals[flat] = mesh.triangle_normals[projected.indexes[flat], None]
+            projected.vertex_colors = self.data_handler.get_shaded_corners(self.light, projected.indexes, corner_normals)
+            record.polygons_out = len(projected)
+        return projected
+
+    def _render_polygons_batched(self) -> list[internals.objects.CanvasPolygon]:
+        projected = self.render_triangles()
+        with self.profiler.stage("emit", polygons_in=len(projected)) as record:
+            polygons = _convert_projected_to_2d(projected)
+            record.polygons_out = len(polygons)
+        return polygons
+
+    def render_triangles(self) -> "ProjectedTriangles":
+        # Visible triangles in drawing order, furthest first, for callers that keep their own canvas items
+        projected = self._project()
+        with self.profiler.stage("sort", polygons_in=len(projected)) as record:
+            order = self.depth_order.sort(projected.depthes, projected.indexes)
+            record.polygons_out = len(order)
+        with self.profiler.stage("emit", polygons_in=len(projected)) as record:
+            projected = projected.take(order)
+            if projected.vertex_colors is not None:
+                # backends that can not interpolate fill smooth triangles with the average of their corners
+                corners = projected.vertex_colors
+                projected.colors = (corners[:, 0] + corners[:, 1] + corners[:, 2]) // 3
+            record.polygons_out = len(projected)
+        return projected
+
+    def _render_polygons_per_vertex(self) -> list[internals.objects.CanvasPolygon]:
+        list_of_canvas_polygons_unsorted = []
+        self.frustrum_culled = 0
+        self.normal_culled = 0
+        self.data_handler.update_transforms()
+
+        for polygon in self.data_handler.get_polygons():
+            canvas_polygon, depth, culling = _convert_polygon_to_2d(
+                polygon=polygon,
+                tan_fy=self.tan_fy,
+                aspect_ratio=self.aspect_ratio,
+                camera_position=self.camera_position,
+                screen_height=self.screen_height,
+                camera_angle=self.camera_angle,
+                depth_interpolation_method=self.depth_interpolation_method,
+                light=self.light,
+            )
+            if culling == FRUSTRUM_CULLED:
+                self.frustrum_culled += 1
                 continue
-            except NormalCullingException:
+            elif culling == NORMAL_CULLED:
+                self.normal_culled += 1
                 continue
             list_of_canvas_polygons_unsorted.append((canvas_polygon, depth))
 
@@ -58,50 +252,91 @@ class Renderer:
 
         return list_of_canvas_polygons
 
-    def render_lines(self) -> list[internals.objects.CanvasLine]:
-
-        list_of_canvas_lines_unsorted = []
-        for line in self.data_handler.get_lines():
-            try:
-                canvas_line, depth = _convert_line_to_2d(
-                    line=line,
-                    tan_fy=self.tan_fy,
-                    aspect_ratio=self.aspect_ratio,
-                    camera_position=self.camera_position,
-                    screen_height=self.screen_height,
-                    camera_angle=self.camera_angle
-                )
-            except FrustrumCullingException:
-                continue
-            list_of_canvas_lines_unsorted.append((canvas_line, depth))
-
-        list_of_canvas_lines_unsorted.sort(key=lambda x: x[1])
-
-        list_of_canvas_lines = list(map(lambda x: x[0], list_of_canvas_lines_unsorted))
-
-        return list_of_canvas_lines
-
-
-class FrustrumCullingException(Exception):
-    pass
+    def render_frame(self, rasterizer: internals.raster.Rasterizer | None = None) -> np.ndarray:
+        # Z-buffered alternative to render_polygons and render_lines, returns a (height, width, 3) image
+        if rasterizer is None:
+            rasterizer = internals.raster.Rasterizer(
+                width=int(self.screen_height * self.aspect_ratio),
+                height=self.screen_height,
+            )
+        rasterizer.clear()
+
+        projected = self._project()
+        with self.profiler.stage("draw", polygons_in=len(projected)) as record:
+            rasterizer.draw_triangles(
+                projected.points,
+                projected.vertex_depthes,
+                projected.colors if projected.vertex_colors is None else projected.vertex_colors,
+            )
+            record.polygons_out = len(projected)
+
+        lines = self.data_handler.get_lines()
+        with self.profiler.stage("transform"):
+            indexes, points, depthes, _ = self._project_lines()
+        with self.profiler.stage("draw"):
+            rasterizer.draw_lines(
+                points=points,
+                depthes=depthes,
+                colors=np.array([internals.rgb.to_rgb(lines[index].color).to_tuple() for index in indexes.tolist()],
+                                dtype=np.int64).reshape(-1, 3),
+            )
 
+        return rasterizer.color_buffer
+
+    def _project_lines(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Returns the indexes (L,) of the lines in front of the near plane, their points (L, 2, 2),
+        # end depthes (L, 2) and depthes (L,)
+        lines = self.data_handler.get_lines()
+        if not lines:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 2, 2)), np.zeros((0, 2)), np.zeros(0)
+
+        points, depthes, visible = _convert_vertices_to_2d(
+            vertices=np.array([vertex.to_tuple() for line in lines for vertex in line.vertices]),
+            tan_fy=self.tan_fy,
+            aspect_ratio=self.aspect_ratio,
+            camera_position=self.camera_position,
+            screen_height=self.screen_height,
+            camera_angle=self.camera_angle,
+        )
+        visible = visible.reshape(-1, 2).all(axis=1)
+        depthes = depthes.reshape(-1, 2)[visible]
+        return (
+            np.flatnonzero(visible),
+            points.reshape(-1, 2, 2)[visible],
+            depthes,
+            _interpolate_depthes(depthes, self.depth_interpolation_method),
+        )
 
-class NormalCullingException(Exception):
-    pass
+    def render_lines(self) -> list[internals.objects.CanvasLine]:
+        lines = self.data_handler.get_lines()
+        with self.profiler.stage("transform"):
+            indexes, points, _, depthes = self._project_lines()
+
+        # nearest first
+        with self.profiler.stage("sort"):
+            order = np.argsort(depthes, kind="stable")
+        with self.profiler.stage("emit"):
+            return [
+                internals.objects.CanvasLine(
+                    internals.objects.Point2D(*line_points[0]),
+                    internals.objects.Point2D(*line_points[1]),
+                    color=lines[index].color,
+                )
+                for index, line_points in zip(indexes[order].tolist(), points[order].tolist())
+            ]
 
 
 def _convert_vertex_to_2d(vertex: internals.objects.Vertex, tan_fy: float, aspect_ratio: float,
                           camera_position: internals.vectors.Vector,
                           screen_height: int, camera_angle: internals.vectors.Quaternion) \
-        -> tuple[internals.objects.Point2D, float]:
+        -> tuple[internals.objects.Point2D | None, float, bool]:
 
     # position = vertex - camera_position
 
     rotated_position = internals.vectors.rotate_vector_by_quaternion(vertex - camera_position, camera_angle)
 
-    if rotated_position.y < 0.1:
-        raise FrustrumCullingException
-
+    if rotated_position.y < NEAR_PLANE:
+        return None, 0, False
 
     # For some reason, aspect ratio is not needed
     res_y = int(rotated_position.z * screen_height / (
@@ -119,49 +354,48 @@ def _convert_vertex_to_2d(vertex: internals.objects.Vertex, tan_fy: float, aspec
 
     # print(f'Vertex {vertex.to_tuple()} -> point ({res_x}, {res_y}) with depth {depth}')
 
-    return internals.objects.Point2D(res_x, res_y), depth
+    return internals.objects.Point2D(res_x, res_y), depth, True
 
 
 def _convert_polygon_to_2d(polygon: internals.objects.Polygon, tan_fy: float, aspect_ratio: float,
                            camera_position: internals.vectors.Vector,
                            screen_height: int, camera_angle: internals.vectors.Quaternion,
                            depth_interpolation_method: str,
-                           light: internals.rgb.Light
-                           ) -> tuple[internals.objects.CanvasPolygon, float]:
-    depthes = [0]
+                           light: internals.rgb.Light | internals.rgb.PointLight | list
+                           ) -> tuple[internals.objects.CanvasPolygon | None, float, str]:
+    depthes = []
     resulting_vertices = []
-
-    # TODO make use of light.color
-    cosine = internals.vectors.get_cosine(polygon.normal, light.direction)
-    multiplier = light.intensity * light.albedo * cosine / math.pi
-    new_color: internals.rgb.RGB = polygon.color * multiplier
-
-    # print(f'Color {polygon.color.to_tuple()} * {multiplier} -> {new_color.to_tuple()}')
-
-    try:
-        flag = False
-
-        for vertex in polygon.vertices:
-
-            position = internals.vectors.Vector(*vertex.to_tuple()) - camera_position
-            if position.dot_product(polygon.normal) < 0:
-                flag = True
-            point, depth = _convert_vertex_to_2d(
-                vertex=vertex,
-                tan_fy=tan_fy,
-                aspect_ratio=aspect_ratio,
-                camera_position=camera_position,
-                screen_height=screen_height,
-                camera_angle=camera_angle,
-            )
-            depthes.append(depth)
-            resulting_vertices.append(point)
-        if not flag:
-            raise NormalCullingException
-    except FrustrumCullingException:
-        raise FrustrumCullingException
-    except NormalCullingException:
-        raise NormalCullingException
+    facing = False
+
+    for vertex in polygon.vertices:
+        point, depth, visible = _convert_vertex_to_2d(
+            vertex=vertex,
+            tan_fy=tan_fy,
+            aspect_ratio=aspect_ratio,
+            camera_position=camera_position,
+            screen_height=screen_height,
+            camera_angle=camera_angle,
+        )
+        if not visible:
+            return None, 0, FRUSTRUM_CULLED
+
+        position = internals.vectors.Vector(*vertex.to_tuple()) - camera_position
+        if position.dot_product(polygon.normal) < 0:
+            facing = True
+        depthes.append(depth)
+        resulting_vertices.append(point)
+
+    if not facing:
+        return None, 0, NORMAL_CULLED
+
+    # the same lighting as the batched paths, for a single triangle lit at its center
+    shaded = internals.rgb.shade(
+        light,
+        np.array([polygon.normal.to_tuple()], dtype=np.float64),
+        np.array([polygon.color.to_tuple()], dtype=np.float64),
+        np.array([[sum(vertex.to_tuple()[axis] for vertex in polygon.vertices) / 3 for axis in range(3)]]),
+    )
+    new_color = internals.rgb.RGB(*shaded[0].tolist())
 
     resulting_depth: float
     if depth_interpolation_method == "average":
@@ -172,29 +406,215 @@ def _convert_polygon_to_2d(polygon: internals.objects.Polygon, tan_fy: float, as
         resulting_depth = max(depthes)
     else:
         raise KeyError("Unknown interpolation method")
-    return internals.objects.CanvasPolygon(*resulting_vertices, color=new_color), resulting_depth
+    return internals.objects.CanvasPolygon(*resulting_vertices, color=new_color), resulting_depth, VISIBLE
 
 
 def _convert_line_to_2d(line: internals.objects.Line, tan_fy: float, aspect_ratio: float,
                         camera_position: internals.vectors.Vector,
                         screen_height: int, camera_angle: internals.vectors.Quaternion) -> tuple[
-    internals.objects.CanvasLine, float]:
+    internals.objects.CanvasLine | None, float, str]:
     average_depth = 0
     resulting_vertices = []
-    try:
-        for vertex in line.vertices:
-            point, depth = _convert_vertex_to_2d(
-                vertex=vertex,
-                tan_fy=tan_fy,
-                aspect_ratio=aspect_ratio,
-                camera_position=camera_position,
-                screen_height=screen_height,
-                camera_angle=camera_angle
-            )
-            average_depth += depth
-            resulting_vertices.append(point)
-    except FrustrumCullingException:
-        raise FrustrumCullingException
+    for vertex in line.vertices:
+        point, depth, visible = _convert_vertex_to_2d(
+            vertex=vertex,
+            tan_fy=tan_fy,
+            aspect_ratio=aspect_ratio,
+            camera_position=camera_position,
+            screen_height=screen_height,
+            camera_angle=camera_angle
+        )
+        if not visible:
+            return None, 0, FRUSTRUM_CULLED
+        average_depth += depth
+        resulting_vertices.append(point)
 
     average_depth = round(average_depth / 2, 4)
-    return internals.objects.CanvasLine(*resulting_vertices, color=line.color), average_depth
+    return internals.objects.CanvasLine(*resulting_vertices, color=line.color), average_depth, VISIBLE
+
+
+def _convert_vertices_to_2d(vertices: np.ndarray, tan_fy: float, aspect_ratio: float,
+                            camera_position: internals.vectors.Vector,
+                            screen_height: int, camera_angle: internals.vectors.Quaternion) \
+        -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Batched counterpart of _convert_vertex_to_2d for an (N, 3) array of vertices.
+    # Returns points (N, 2), depths (N,) and a mask (N,) of vertices that pass the near plane
+
+    rotated_positions = camera_angle.rotate_many(vertices - np.array(camera_position.to_tuple()))
+
+    visible = rotated_positions[:, 1] >= NEAR_PLANE
+
+    # culled vertices get a dummy divisor, their points are meaningless and must be masked out
+    divisor = 2 * np.where(visible, rotated_positions[:, 1], 1.0) * tan_fy
+    res_x = np.trunc(rotated_positions[:, 0] * screen_height / divisor) + screen_height * aspect_ratio // 2
+    res_y = np.trunc(rotated_positions[:, 2] * screen_height / divisor) + screen_height // 2
+
+    depths = np.sqrt(np.einsum("ij,ij->i", rotated_positions, rotated_positions))
+
+    return np.stack((res_x, res_y), axis=1), depths, visible
+
+
+def _cull_triangles(vertices: np.ndarray, triangles: np.ndarray, normals: np.ndarray, vertex_visible: np.ndarray,
+                    camera_position: internals.vectors.Vector) -> tuple[np.ndarray, np.ndarray]:
+    # Returns (T,) masks of triangles that are in front of the near plane and that face the camera.
+    # Normal visibility is computed for every triangle, frustrum culling takes precedence when counting
+    frustrum_visible = vertex_visible[triangles].all(axis=1)
+
+    positions = vertices - np.array(camera_position.to_tuple())
+    normal_visible = (np.einsum("tvi,ti->tv", positions[triangles], normals) < 0).any(axis=1)
+
+    return frustrum_visible, normal_visible
+
+
+class ProjectedTriangles:
+    # Visible triangles of a mesh after projection and shading, indexes are their positions in the mesh.
+    # vertex_colors (T, 3, 3) are the colors of their corners when they are smooth shaded
+    points: np.ndarray
+    vertex_depthes: np.ndarray
+    depthes: np.ndarray
+    colors: np.ndarray
+    indexes: np.ndarray
+    vertex_colors: np.ndarray | None
+
+    def __init__(self, points: np.ndarray, vertex_depthes: np.ndarray, depthes: np.ndarray, colors: np.ndarray,
+                 indexes: np.ndarray, vertex_colors: np.ndarray | None = None):
+        self.points = points
+        self.vertex_depthes = vertex_depthes
+        self.depthes = depthes
+        self.colors = colors
+        self.indexes = indexes
+        self.vertex_colors = vertex_colors
+
+    def __len__(self):
+        return len(self.points)
+
+    def take(self, order: np.ndarray):
+        return ProjectedTriangles(
+            points=self.points[order],
+            vertex_depthes=self.vertex_depthes[order],
+            depthes=self.depthes[order],
+            colors=self.colors[order],
+            indexes=self.indexes[order],
+            vertex_colors=None if self.vertex_colors is None else self.vertex_colors[order],
+        )
+
+
+def _project_mesh(mesh: internals.objects.Mesh, colors: np.ndarray,
+                  tan_fy: float, aspect_ratio: float,
+                  camera_position: internals.vectors.Vector,
+                  screen_height: int, camera_angle: internals.vectors.Quaternion,
+                  depth_interpolation_method: str,
+                  subset: np.ndarray | None = None,
+                  profiler: internals.profiler.Profiler = internals.profiler.disabled,
+                  ) -> tuple[ProjectedTriangles, np.ndarray, np.ndarray]:
+    # Batched counterpart of _convert_polygon_to_2d: every unique vertex is projected once,
+    # then the results are gathered per triangle by index. colors is (T, 3), one already shaded row per triangle.
+    # subset, if given, are the indexes of the only triangles to consider, then only their vertices are projected.
+    # Returns the visible triangles and the frustrum and normal visibility masks of the considered triangles
+    vertices = mesh.vertices
+    triangles = mesh.triangles
+    normals = mesh.face_normals
+    if subset is not None:
+        normals = normals[subset]
+        colors = colors[subset]
+        vertices, triangles = _compact(vertices, triangles[subset])
+
+    with profiler.stage("transform", polygons_in=len(triangles)) as record:
+        vertex_points, vertex_depthes, vertex_visible = _convert_vertices_to_2d(
+            vertices=vertices,
+            tan_fy=tan_fy,
+            aspect_ratio=aspect_ratio,
+            camera_position=camera_position,
+            screen_height=screen_height,
+            camera_angle=camera_angle,
+        )
+        record.polygons_out = len(triangles)
+    with profiler.stage("cull", polygons_in=len(triangles)) as record:
+        frustrum_visible, normal_visible = _cull_triangles(
+            vertices=vertices,
+            triangles=triangles,
+            normals=normals,
+            vertex_visible=vertex_visible,
+            camera_position=camera_position,
+        )
+        mask = frustrum_visible & normal_visible
+        record.polygons_out = int(np.count_nonzero(mask))
+
+    with profiler.stage("emit", polygons_in=len(triangles)) as record:
+        indexes = np.flatnonzero(mask) if subset is None else subset[mask]
+        triangles = triangles[mask]
+        colors = colors[mask]
+        points = vertex_points[triangles]
+        depthes = vertex_depthes[triangles]
+        resulting_depthes = _interpolate_depthes(depthes, depth_interpolation_method)
+        record.polygons_out = len(triangles)
+
+    return ProjectedTriangles(
+        points=points,
+        vertex_depthes=depthes,
+        depthes=resulting_depthes,
+        colors=colors,
+        indexes=indexes,
+    ), frustrum_visible, normal_visible
+
+
+def _compact(vertices: np.ndarray, triangles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Only the vertices used by triangles, with triangles renumbered to them
+    used = np.zeros(len(vertices), dtype=bool)
+    used[triangles] = True
+    remap = np.cumsum(used) - 1
+    return vertices[used], remap[triangles]
+
+
+def _interpolate_depthes(depthes: np.ndarray, depth_interpolation_method: str) -> np.ndarray:
+    # One depth per row of (N, K) vertex depthes, batched counterpart of the modes of _convert_polygon_to_2d
+    if depth_interpolation_method == "average":
+        return np.round(depthes.sum(axis=1) / depthes.shape[1], 4)
+    elif depth_interpolation_method == "nearest":
+        return depthes.min(axis=1)
+    elif depth_interpolation_method == "furthest":
+        return depthes.max(axis=1)
+    else:
+        raise KeyError("Unknown interpolation method")
+
+
+class DepthOrder:
+    # Back to front order of triangles that is kept between frames. Sorting starts from the previous
+    # frame's order, which stays almost sorted for small camera moves, so the stable sort mostly finds
+    # sorted runs, and triangles with equal depth keep their previous places
+    _previous: np.ndarray
+
+    def __init__(self):
+        self._previous = np.zeros(0, dtype=np.int64)
+
+    def reset(self):
+        self._previous = np.zeros(0, dtype=np.int64)
+
+    def sort(self, depthes: np.ndarray, indexes: np.ndarray) -> np.ndarray:
+        # Returns positions into depthes, furthest first. indexes (N,) identify the triangles between frames
+        size = int(max(indexes.max(initial=-1), self._previous.max(initial=-1))) + 1
+        positions = np.full(size, -1, dtype=np.int64)
+        positions[indexes] = np.arange(len(indexes))
+
+        kept = positions[self._previous]
+        kept = kept[kept != -1]
+        is_new = np.ones(len(indexes), dtype=bool)
+        is_new[kept] = False
+        start = np.concatenate((kept, np.flatnonzero(is_new)))
+
+        order = start[np.argsort(-depthes[start], kind="stable")]
+        self._previous = indexes[order]
+        return order
+
+
+def _convert_projected_to_2d(projected: ProjectedTriangles) -> list[internals.objects.CanvasPolygon]:
+    # keeps the order of projected
+    return [
+        internals.objects.CanvasPolygon(
+            internals.objects.Point2D(*polygon_points[0]),
+            internals.objects.Point2D(*polygon_points[1]),
+            internals.objects.Point2D(*polygon_points[2]),
+            color=internals.rgb.RGB(*color),
+        )
+        for polygon_points, color in zip(projected.points.tolist(), projected.colors.tolist())
+    ]
@@ -1,7 +1,10 @@
+import math
 import random
+import numpy as np
 import internals.vectors
 
 class RGB:
+    __slots__ = ("_r", "_g", "_b")
     _r: int
     _g: int
     _b: int
@@ -22,7 +25,7 @@ class RGB:
         )
 
     def to_hex(self) -> str:
-        return f"#{str(hex(self.r))[2:]}{str(hex(self.g))[2:]}{str(hex(self.b))[2:]}"
+        return f"#{self.r:02x}{self.g:02x}{self.b:02x}"
 
     @property
     def r(self):
@@ -67,7 +70,7 @@ class RGB:
         return str(self.to_tuple())
 
     def __mul__(self, other):
-        if type(other) == float or type(other) == int:
+        if type(other) is float or type(other) is int:
             return RGB(
                 r=self.r * other,
                 g=self.g * other,
@@ -77,6 +80,61 @@ class RGB:
             raise NotImplementedError(type(other))
 
 
+named_colors = {
+    "red": RGB(255, 0, 0),
+    "green": RGB(0, 255, 0),
+    "blue": RGB(0, 0, 255),
+    "white": RGB(255, 255, 255),
+    "black": RGB(0, 0, 0),
+}
+
+
+def to_rgb(color: RGB | str) -> RGB:
+    # Canvas colors may be given as RGB, "#rrggbb" strings or one of named_colors
+    if type(color) is RGB:
+        return color
+    if color[0] == '#':
+        return RGB.from_hex(color)
+    return named_colors[color]
+
+
+class HexPalette:
+    # Canvas color strings of whole color arrays. Channels are quantized to levels steps per channel and every
+    # color is formatted once, later frames look the same string up again, so Tk also sees few distinct strings
+    levels: int
+    _strings: dict
+
+    def __init__(self, levels: int = 256):
+        if not 2 <= levels <= 256:
+            raise ValueError(f"Expected between 2 and 256 levels but got {levels}")
+        self.levels = levels
+        self._strings = dict()
+
+    def __len__(self):
+        return len(self._strings)
+
+    def quantize(self, colors: np.ndarray) -> np.ndarray:
+        # (K, 3) colors rounded to the nearest of levels values per channel
+        colors = np.clip(np.asarray(colors, dtype=np.int64), 0, 255)
+        if self.levels == 256:
+            return colors
+        steps = (colors * (self.levels - 1) + 127) // 255
+        return (steps * 255 + (self.levels - 1) // 2) // (self.levels - 1)
+
+    def lookup(self, colors: np.ndarray) -> list[str]:
+        # "#rrggbb" strings of (K, 3) colors
+        quantized = self.quantize(colors).reshape(-1, 3)
+        keys = quantized[:, 0] << 16 | quantized[:, 1] << 8 | quantized[:, 2]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        strings = np.empty(len(unique), dtype=object)
+        for position, key in enumerate(unique.tolist()):
+            string = self._strings.get(key)
+            if string is None:
+                string = self._strings[key] = f"#{key:06x}"
+            strings[position] = string
+        return strings[inverse].tolist()
+
+
 def light_gray_color():
     return RGB(50, 128, 200)
 
@@ -100,9 +158,15 @@ def random_color() -> RGB:
     return random.choice(colors)
 
 
+_next_color_index = 0
+
+
 def next_color() -> RGB:
-    global colors
-    return colors.pop(0)
+    # cycles through the palette so that any number of objects can be loaded
+    global colors, _next_color_index
+    color = colors[_next_color_index % len(colors)]
+    _next_color_index += 1
+    return RGB(*color.to_tuple())
 
 
 class Light:
@@ -137,3 +201,102 @@ class Light:
     @property
     def color(self):
         return self._color
+
+    def to_tuple(self):
+        # everything shading depends on, usable as a cache key
+        return "directional", self.intensity, self.direction.to_tuple(), self.albedo, self.color.to_tuple()
+
+    def shade(self, normals: np.ndarray, colors: np.ndarray) -> np.ndarray:
+        # Batched counterpart of the lighting in _convert_polygon_to_2d for (T, 3) normals and colors
+        return shade([self], normals, colors)
+
+
+class PointLight:
+    # Lights every surface point from position, falling off with the square of the distance
+    _intensity: float | int
+    _position: internals.vectors.Vector
+    _albedo: float
+    _color: RGB
+
+    def __init__(self,
+                 intensity: float | int,
+                 position: internals.vectors.Vector,
+                 albedo: float,
+                 color: RGB,
+                 ):
+        self._intensity = intensity
+        self._position = position
+        self._albedo = albedo
+        self._color = color
+
+    @property
+    def intensity(self):
+        return self._intensity
+
+    @property
+    def position(self):
+        return self._position
+
+    @property
+    def albedo(self):
+        return self._albedo
+
+    @property
+    def color(self):
+        return self._color
+
+    def to_tuple(self):
+        return "point", self.intensity, self.position.to_tuple(), self.albedo, self.color.to_tuple()
+
+    def shade(self, normals: np.ndarray, colors: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        return shade([self], normals, colors, positions)
+
+
+def as_lights(light: Light | PointLight | list) -> list:
+    # Renderers and scenes take one light or a list of them
+    if isinstance(light, (Light, PointLight)):
+        return [light]
+    return list(light)
+
+
+def lights_key(lights: Light | PointLight | list) -> tuple:
+    return tuple(light.to_tuple() for light in as_lights(lights))
+
+
+def _strengths(lights: list) -> np.ndarray:
+    # (L, 3) per channel multipliers of the lights, their color tints the lit surface
+    return np.array([
+        [light.intensity * light.albedo / math.pi * channel / 255 for channel in light.color.to_tuple()]
+        for light in lights
+    ], dtype=np.float64).reshape(-1, 3)
+
+
+def shade(lights: Light | PointLight | list, normals: np.ndarray, colors: np.ndarray,
+          positions: np.ndarray | None = None) -> np.ndarray:
+    # Lights (K, 3) normals in (K, 3) colors with every light at once: the cosines of all normals and lights
+    # are one (K, 3) x (3, L) product, and the (K, L) cosines times the (L, 3) light colors give the per channel
+    # multipliers. Point lights also need the (K, 3) surface positions the normals belong to
+    lights = as_lights(lights)
+    # zero length normals of degenerate faces stay zero and are not lit
+    normals = normals / np.maximum(np.linalg.norm(normals, axis=1), 1e-12)[:, None]
+    multipliers = np.zeros((len(normals), 3))
+
+    directional = [light for light in lights if isinstance(light, Light)]
+    if directional:
+        directions = np.array([light.direction.to_tuple() for light in directional], dtype=np.float64)
+        directions /= np.maximum(np.linalg.norm(directions, axis=1), 1e-12)[:, None]
+        # a light behind the surface does not darken it
+        cosines = np.maximum(normals @ directions.T, 0)
+        multipliers += cosines @ _strengths(directional)
+
+    points = [light for light in lights if isinstance(light, PointLight)]
+    if points:
+        if positions is None:
+            raise ValueError("Point lights need the positions of the shaded normals")
+        offsets = np.array([light.position.to_tuple() for light in points], dtype=np.float64) - positions[:, None]
+        # squared distances, a light at the shaded point lights it as if slightly away instead of dividing by 0
+        distances = np.maximum(np.einsum("klc,klc->kl", offsets, offsets), 1e-12)
+        cosines = np.maximum(np.einsum("kc,klc->kl", normals, offsets), 0) / np.sqrt(distances)
+        multipliers += cosines / distances @ _strengths(points)
+
+    return np.clip(colors * multipliers, 0, 255).astype(np.int64)
@@ -0,0 +1,102 @@
+import threading
+
+
+class RenderScheduler:
+    # Renders on a background thread so the caller never waits for a frame. Requests made while a frame
+    # is rendering replace each other, only the latest one is rendered next, and a finished frame is dropped
+    # when a newer request is already waiting. The caller collects finished frames with poll(),
+    # a Tk window from an after() loop, so that drawing stays on the thread that owns the widgets
+    requested: int
+    coalesced: int
+    rendered: int
+    dropped: int
+    _render: object
+    _condition: threading.Condition
+    _request: object
+    _generation: int
+    _result: tuple | None
+    _rendering: bool
+    _closed: bool
+    _thread: threading.Thread
+
+    def __init__(self, render):
+        # render(request) is called on the background thread and returns what poll() hands back
+        self._render = render
+        self._condition = threading.Condition()
+        self._request = None
+        self._generation = 0
+        self._result = None
+        self._rendering = False
+        self._closed = False
+        # counters of requests, of requests replaced before they were rendered, and of rendered and dropped frames
+        self.requested = 0
+        self.coalesced = 0
+        self.rendered = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="render", daemon=True)
+        self._thread.start()
+
+    def request(self, request):
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Requested a frame from a closed scheduler")
+            if self._request is not None:
+                self.coalesced += 1
+            self._request = request
+            self._generation += 1
+            self.requested += 1
+            self._condition.notify_all()
+
+    def poll(self):
+        # The latest finished frame or None, at most once per frame. Errors of render are raised here
+        with self._condition:
+            result, self._result = self._result, None
+        if result is None:
+            return None
+        value, error = result
+        if error is not None:
+            raise error
+        return value
+
+    @property
+    def busy(self) -> bool:
+        with self._condition:
+            return self._rendering or self._request is not None
+
+    def wait(self, timeout: float | None = None) -> bool:
+        # Blocks until nothing is requested or rendering, returns False on timeout
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._rendering and self._request is None, timeout)
+
+    def close(self):
+        # Finishes the frame being rendered, pending requests are discarded
+        with self._condition:
+            self._closed = True
+            self._request = None
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._request is not None)
+                if self._closed:
+                    return
+                request, self._request = self._request, None
+                generation = self._generation
+                self._rendering = True
+
+            try:
+                result = (self._render(request), None)
+            except Exception as error:
+                result = (None, error)
+
+            with self._condition:
+                self._rendering = False
+                if self._generation != generation and result[1] is None:
+                    # already stale, the newer request is rendered instead
+                    self.dropped += 1
+                else:
+                    self._result = result
+                    self.rendered += 1
+                self._condition.notify_all()
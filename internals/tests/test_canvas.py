@@ -0,0 +1,113 @@
+import random
+import unittest
+
+import numpy as np
+
+from interface.interface import CanvasLayer, _increasing_subsequence
+from internals.render import ProjectedTriangles
+
+
+class RecordingCanvas:
+    # Stands in for a Tk canvas, keeps the stacking order of its items from bottom to top
+    def __init__(self):
+        self.stack = []
+        self.options = dict()
+        self.calls = []
+
+    def create_polygon(self, points, **options):
+        item = len(self.options) + 1
+        self.stack.append(item)
+        self.options[item] = {"coords": points, "state": "normal", **options}
+        self.calls.append(("create_polygon", item))
+        return item
+
+    def coords(self, item, points):
+        self.options[item]["coords"] = points
+        self.calls.append(("coords", item))
+
+    def itemconfigure(self, item, **options):
+        self.options[item].update(options)
+        self.calls.append(("itemconfigure", item))
+
+    def tag_raise(self, item, above=None):
+        self.stack.remove(item)
+        self.stack.insert(len(self.stack) if above is None else self.stack.index(above) + 1, item)
+        self.calls.append(("tag_raise", item))
+
+    def tag_lower(self, item, below=None):
+        self.stack.remove(item)
+        self.stack.insert(0 if below is None else self.stack.index(below), item)
+        self.calls.append(("tag_lower", item))
+
+    def visible_stack(self) -> list[int]:
+        return [item for item in self.stack if self.options[item]["state"] == "normal"]
+
+
+def project(indexes: list[int]) -> ProjectedTriangles:
+    # triangles in drawing order, each at its own place with its own color
+    indexes = np.array(indexes, dtype=np.int64)
+    points = np.repeat(indexes[:, None, None], 6, axis=2).reshape(-1, 3, 2).astype(float)
+    return ProjectedTriangles(
+        points=points,
+        vertex_depthes=np.zeros((len(indexes), 3)),
+        depthes=np.zeros(len(indexes)),
+        colors=np.repeat(indexes[:, None], 3, axis=1),
+        indexes=indexes,
+    )
+
+
+class TestCanvasLayer(unittest.TestCase):
+
+    def setUp(self):
+        self.canvas = RecordingCanvas()
+        self.layer = CanvasLayer(self.canvas, triangle_count=10)
+
+    def draw(self, indexes: list[int]) -> int:
+        calls = self.layer.draw(project(indexes))
+        self.assertEqual([self.layer._items[index] for index in indexes], self.canvas.visible_stack())
+        return calls
+
+    def test_unchanged_frame(self):
+        self.assertEqual(3, self.draw([2, 0, 1]))
+        self.canvas.calls.clear()
+        self.assertEqual(0, self.draw([2, 0, 1]))
+        self.assertEqual([], self.canvas.calls)
+
+    def test_shown_before_created(self):
+        # a shown item is raised above the items created in the same frame
+        self.draw([0, 1])
+        self.draw([1])
+        self.draw([0, 2, 1])
+        self.assertEqual([1, 3, 2], self.canvas.visible_stack())
+
+    def test_reordered(self):
+        self.draw([0, 1, 2, 3])
+        self.canvas.calls.clear()
+        self.draw([0, 2, 1, 3])
+        # one item is restacked, the others keep their place
+        self.assertEqual(1, len([call for call in self.canvas.calls if call[0] in ("tag_raise", "tag_lower")]))
+        self.draw([3, 0, 2, 1])
+
+    def test_random_frames(self):
+        generator = random.Random(3)
+        for _ in range(200):
+            indexes = generator.sample(range(10), generator.randint(0, 10))
+            self.draw(indexes)
+
+
+class TestIncreasingSubsequence(unittest.TestCase):
+
+    def test_longest(self):
+        sequence = np.array([3, 1, 4, 1, 5, 9, 2, 6])
+        mask = _increasing_subsequence(sequence)
+        self.assertEqual(4, int(mask.sum()))
+        self.assertTrue((np.diff(sequence[mask]) > 0).all())
+
+    def test_edges(self):
+        self.assertEqual([], _increasing_subsequence(np.zeros(0, dtype=np.int64)).tolist())
+        self.assertEqual([True, True, True], _increasing_subsequence(np.array([0, 1, 2])).tolist())
+        self.assertEqual(1, int(_increasing_subsequence(np.array([2, 1, 0])).sum()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import math
+import unittest
+
+import internals.controls
+from internals.vectors import Vector, Quaternion
+
+
+class TestCameraController(unittest.TestCase):
+
+    def setUp(self):
+        self.controller = internals.controls.CameraController(move_speed=2, rotate_speed=math.pi / 2)
+        self.position = Vector(0, -5, 0)
+        self.angle = Quaternion.from_euler(0, (0, 1, 0))
+
+    def test_move_by_elapsed_time(self):
+        self.assertTrue(self.controller.press("W"))
+        self.assertFalse(self.controller.press("p"))
+        position, angle, changed = self.controller.update(self.position, self.angle, elapsed=0.5, now=0)
+        self.assertTrue(changed)
+        self.assertEqual((0, -4, 0), position.to_tuple())
+        self.assertIs(self.angle, angle)
+
+        # opposite keys cancel out
+        self.controller.press("s")
+        _, _, changed = self.controller.update(position, angle, elapsed=0.5, now=0)
+        self.assertFalse(changed)
+
+    def test_rotate(self):
+        self.controller.press("Left")
+        _, angle, changed = self.controller.update(self.position, self.angle, elapsed=0.5, now=0)
+        self.assertTrue(changed)
+        self.assertEqual(Quaternion.from_euler(math.pi / 4, (0, 0, 1)).to_tuple(), angle.to_tuple())
+
+    def test_auto_repeat(self):
+        self.controller.press("d")
+        # a release followed by a press within repeat_delay is auto-repeat
+        self.controller.release("d", now=1)
+        self.controller.press("d")
+        self.controller.update(self.position, self.angle, elapsed=0.1, now=2)
+        self.assertTrue(self.controller.active)
+
+        self.controller.release("d", now=2)
+        _, _, changed = self.controller.update(self.position, self.angle, elapsed=0.01, now=2.01)
+        self.assertTrue(changed)
+        _, _, changed = self.controller.update(self.position, self.angle, elapsed=0.1, now=2.1)
+        self.assertFalse(changed)
+        self.assertFalse(self.controller.active)
+
+
+class TestFramePacer(unittest.TestCase):
+
+    def test_rate_limit_and_skipping(self):
+        pacer = internals.controls.FramePacer(target_fps=10)
+        self.assertTrue(pacer.ready(0, busy=False))
+        pacer.requested(0)
+        self.assertFalse(pacer.ready(0.05, busy=False))
+        self.assertFalse(pacer.ready(0.1, busy=True))
+        self.assertEqual(1, pacer.skipped)
+        self.assertTrue(pacer.ready(0.15, busy=False))
+
+    def test_skipped_slots(self):
+        # a frame rendering for half a second at 30 frames per second misses 15 slots, asked 60 times a second
+        pacer = internals.controls.FramePacer(target_fps=30)
+        pacer.requested(0)
+        for tick in range(1, 31):
+            self.assertFalse(pacer.ready(tick / 60, busy=True))
+        self.assertEqual(15, pacer.skipped)
+        self.assertTrue(pacer.ready(31 / 60, busy=False))
+
+        pacer.requested(31 / 60)
+        self.assertFalse(pacer.ready(31 / 60 + 0.2, busy=True))
+        self.assertEqual(21, pacer.skipped)
+
+    def test_overlay_values(self):
+        pacer = internals.controls.FramePacer(target_fps=30, history=3)
+        self.assertEqual(0, pacer.fps)
+        for frame in range(5):
+            pacer.presented(frame * 0.1, 0.05 + frame * 0.01)
+        self.assertAlmostEqual(10, pacer.fps)
+        self.assertAlmostEqual(0.08, pacer.frame_time)
+        with self.assertRaises(ValueError):
+            internals.controls.FramePacer(target_fps=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
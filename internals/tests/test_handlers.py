@@ -0,0 +1,259 @@
+import unittest
+import json
+import os
+from unittest import mock
+
+import numpy as np
+
+import internals.handlers
+from internals.vectors import Vector
+from internals.tests.test_render import CUBE_OBJ, TWO_CUBES_OBJ, SMOOTH_SQUARE_OBJ, temporary_directory
+from internals.tests.test_lod import grid_obj
+
+
+def write_model(test: unittest.TestCase, obj_text: str) -> tuple[str, str]:
+    directory = temporary_directory(test)
+    with open(os.path.join(directory, "model.obj"), "w") as file:
+        file.write(obj_text)
+    return directory, "model.obj"
+
+
+PENTAGON_OBJ = """o Pentagon
+v 0 0 0
+v 1 0 0
+v 1.5 0 1
+v 0.5 0 1.5
+v -0.5 0 1
+vn 0 -1 0
+f 1//1 2//1 3//1 4//1 5//1
+"""
+
+
+class TestStreamingParser(unittest.TestCase):
+
+    def test_fan_triangulation(self):
+        objects = internals.handlers.FileHandler(*write_model(self, PENTAGON_OBJ)).interpret_file()
+        mesh = objects["Pentagon"].get_mesh()
+        self.assertEqual([[0, 1, 2], [0, 2, 3], [0, 3, 4]], mesh.triangles.tolist())
+        self.assertEqual([0, 0, 0], mesh.triangle_normals.tolist())
+
+    def test_corner_normals(self):
+        objects = internals.handlers.FileHandler(*write_model(self, SMOOTH_SQUARE_OBJ)).interpret_file()
+        mesh = objects["Square"].get_mesh()
+        self.assertEqual(1, objects["Square"].smooth_shading)
+        self.assertEqual([[0, 1, 2], [0, 2, 3]], mesh.corner_normals.tolist())
+        # the face normal stays that of the last corner
+        self.assertEqual([3, 3], mesh.triangle_normals.tolist())
+
+    def test_chunk_size(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        expected = internals.handlers.FileHandler(file_path, file_name).interpret_file()
+        actual = internals.handlers.FileHandler(file_path, file_name, chunk_size=7).interpret_file()
+        self.assertEqual(list(expected.keys()), list(actual.keys()))
+        for name in expected.keys():
+            for attribute in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals"):
+                self.assertTrue(np.array_equal(
+                    getattr(expected[name].get_mesh(), attribute),
+                    getattr(actual[name].get_mesh(), attribute),
+                ))
+
+    def test_local_indexes(self):
+        objects = internals.handlers.FileHandler(*write_model(self, TWO_CUBES_OBJ)).interpret_file()
+        first = objects["Cube"].get_mesh()
+        second = objects["Cube.001"].get_mesh()
+        self.assertTrue(np.array_equal(first.triangles, second.triangles))
+        self.assertTrue(np.array_equal(first.vertices + 3, second.vertices))
+
+    def test_progress(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        calls = []
+        internals.handlers.FileHandler(file_path, file_name, chunk_size=64).interpret_file(
+            progress=lambda bytes_processed, lines_processed: calls.append((bytes_processed, lines_processed))
+        )
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(sorted(calls), calls)
+        self.assertEqual((os.path.getsize(os.path.join(file_path, file_name)), len(TWO_CUBES_OBJ.splitlines())),
+                         calls[-1])
+
+    def test_missing_normals(self):
+        with self.assertRaises(internals.handlers.NoNormalsException):
+            internals.handlers.FileHandler(
+                *write_model(self, "o A\nv 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n")
+            ).interpret_file()
+
+    def test_unexpected_prefix(self):
+        with self.assertRaises(KeyError):
+            internals.handlers.FileHandler(*write_model(self, "o A\nvx 0 0 0\n")).interpret_file()
+
+    def test_malformed_vertex(self):
+        with self.assertRaises(ValueError):
+            internals.handlers.FileHandler(*write_model(self, "o A\nv 0 0 0\nv 1 0\n")).interpret_file()
+
+
+class TestParallelParser(unittest.TestCase):
+
+    def assertObjectsEqual(self, expected, actual):
+        self.assertEqual(list(expected.keys()), list(actual.keys()))
+        for name in expected.keys():
+            self.assertEqual(expected[name].smooth_shading, actual[name].smooth_shading)
+            for attribute in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals"):
+                self.assertTrue(np.array_equal(
+                    getattr(expected[name].get_mesh(), attribute),
+                    getattr(actual[name].get_mesh(), attribute),
+                ))
+
+    def test_matches_serial(self):
+        file_path, file_name = write_model(
+            self,
+            TWO_CUBES_OBJ + PENTAGON_OBJ.replace("f 1//1 2//1 3//1 4//1 5//1", "f 17//13 18//13 19//13 20//13 21//13")
+        )
+        expected = internals.handlers.FileHandler(file_path, file_name).interpret_file()
+        for workers in (2, 3, 8):
+            actual = internals.handlers.FileHandler(file_path, file_name, chunk_size=16).interpret_file(
+                workers=workers)
+            self.assertObjectsEqual(expected, actual)
+
+    def test_relative_indexes(self):
+        file_path, file_name = write_model(
+            self,
+            "o A\nv 0 0 0\nv 1 0 0\nv 0 1 0\nvn 0 0 1\nf -3//-1 -2//-1 -1//-1\n"
+            "o B\nv 0 0 1\nv 1 0 1\nv 0 1 1\nvn 0 0 1\nf -3//-1 -2//-1 -1//-1\n"
+        )
+        expected = internals.handlers.FileHandler(file_path, file_name).interpret_file()
+        actual = internals.handlers.FileHandler(file_path, file_name).interpret_file(workers=4)
+        self.assertObjectsEqual(expected, actual)
+        self.assertEqual([[0, 1, 2]], actual["B"].get_mesh().triangles.tolist())
+
+    def test_progress(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        calls = []
+        internals.handlers.FileHandler(file_path, file_name).interpret_file(
+            workers=2,
+            progress=lambda bytes_processed, lines_processed: calls.append(bytes_processed),
+        )
+        self.assertEqual(os.path.getsize(os.path.join(file_path, file_name)), calls[-1])
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_directory = temporary_directory(self)
+
+    def read(self, file_path, file_name, lod_levels: int = 3) -> internals.handlers.SceneData:
+        scene = internals.handlers.SceneData()
+        scene.read_file(file_path=file_path, file_name=file_name, cache_directory=self.cache_directory,
+                        lod_levels=lod_levels)
+        return scene
+
+    def test_roundtrip(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        parsed = self.read(file_path, file_name)
+        self.assertEqual(1, len(os.listdir(self.cache_directory)))
+
+        cached = self.read(file_path, file_name)
+        for name in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals"):
+            self.assertTrue(np.array_equal(getattr(parsed.get_mesh(), name), getattr(cached.get_mesh(), name)))
+        self.assertTrue(np.array_equal(parsed.get_triangle_colors(), cached.get_triangle_colors()))
+        self.assertEqual(
+            [[vertex.to_tuple() for vertex in polygon.vertices] for polygon in parsed.get_polygons()],
+            [[vertex.to_tuple() for vertex in polygon.vertices] for polygon in cached.get_polygons()],
+        )
+        self.assertEqual(
+            [polygon.normal.to_tuple() for polygon in parsed.get_polygons()],
+            [polygon.normal.to_tuple() for polygon in cached.get_polygons()],
+        )
+
+    def test_memory_mapped(self):
+        file_path, file_name = write_model(self, grid_obj(8))
+        self.read(file_path, file_name)
+        cached = self.read(file_path, file_name)
+        mesh, lod_mesh = cached.get_mesh(), cached.get_lod_mesh()
+        self.assertGreater(len(lod_mesh), len(mesh))
+        for name in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals"):
+            for array in (getattr(mesh, name), getattr(lod_mesh, name)):
+                self.assertFalse(array.flags.owndata, name)
+                self.assertFalse(array.flags.writeable, name)
+        # the full detail mesh is the start of the level of detail mesh
+        self.assertTrue(np.shares_memory(mesh.vertices, lod_mesh.vertices))
+        self.assertTrue(np.shares_memory(mesh.triangles, lod_mesh.triangles))
+
+    def test_moved_after_load(self):
+        file_path, file_name = write_model(self, grid_obj(8))
+        self.read(file_path, file_name)
+        cached = self.read(file_path, file_name)
+        self.assertEqual([], cached.update_transforms())
+        self.assertFalse(cached.get_lod_mesh().vertices.flags.writeable)
+
+        cached.get_objects()["Grid"].transform.position = Vector(0, 0, 1)
+        self.assertEqual(["Grid"], cached.update_transforms())
+        mesh, lod_mesh = cached.get_mesh(), cached.get_lod_mesh()
+        self.assertTrue(lod_mesh.vertices.flags.writeable)
+        self.assertTrue(np.shares_memory(mesh.vertices, lod_mesh.vertices))
+        self.assertTrue(np.array_equal(self.read(file_path, file_name).get_lod_mesh().vertices + [0, 0, 1],
+                                       lod_mesh.vertices))
+
+    def test_levels(self):
+        file_path, file_name = write_model(self, grid_obj(8) + grid_obj(6, "Small", 2, 81, 1))
+        parsed = self.read(file_path, file_name)
+        cached = self.read(file_path, file_name)
+        for name in ("vertices", "normals", "triangles", "triangle_normals", "corner_normals"):
+            self.assertTrue(np.array_equal(getattr(parsed.get_lod_mesh(), name), getattr(cached.get_lod_mesh(), name)))
+        self.assertEqual([(levels.ranges, levels.errors) for levels in parsed.get_detail_levels()],
+                         [(levels.ranges, levels.errors) for levels in cached.get_detail_levels()])
+        self.assertTrue(np.array_equal(parsed.get_triangle_colors(), cached.get_triangle_colors()))
+
+        # another number of levels is parsed and stored again
+        without_levels = self.read(file_path, file_name, lod_levels=0)
+        self.assertEqual(len(without_levels.get_mesh()), len(without_levels.get_lod_mesh()))
+        self.assertEqual(1, len(os.listdir(self.cache_directory)))
+        self.assertFalse(self.read(file_path, file_name, lod_levels=0).get_lod_mesh().vertices.flags.owndata)
+
+    def test_not_writable(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        with mock.patch("numpy.save", side_effect=OSError(28, "No space left on device")):
+            scene = self.read(file_path, file_name)
+        self.assertEqual(24, len(scene.get_mesh()))
+        self.assertEqual([], os.listdir(self.cache_directory))
+
+        # a cache directory that can not be created, even for root
+        scene = internals.handlers.SceneData()
+        scene.read_file(file_path=file_path, file_name=file_name,
+                        cache_directory=os.path.join(file_path, file_name, "cache"))
+        self.assertEqual(24, len(scene.get_mesh()))
+
+    def test_damaged_meta(self):
+        file_path, file_name = write_model(self, TWO_CUBES_OBJ)
+        expected = self.read(file_path, file_name)
+        entry_path = os.path.join(self.cache_directory, os.listdir(self.cache_directory)[0])
+        cube = {"name": "Cube", "color": [0, 0, 0], "smooth_shading": 0,
+                "normals": [0, 6], "vertices": [[0, 8]], "triangles": [[0, 12]], "errors": [0]}
+        damaged = (
+            {"version": 3},
+            {"lod_levels": 3, "objects": [{"name": "Cube"}]},
+            {"lod_levels": 3, "objects": [{**cube, "color": 0}]},
+            {"lod_levels": 3, "objects": [{**cube, "vertices": [[0, 80]]}]},
+            {"lod_levels": 3, "objects": [{**cube, "errors": [0, 1]}]},
+        )
+        for meta in damaged:
+            with open(os.path.join(entry_path, "objects.json"), "w") as file:
+                json.dump(meta, file)
+            # a damaged entry is a miss, the file is parsed and the entry stored again
+            scene = self.read(file_path, file_name)
+            self.assertEqual(list(expected.get_objects()), list(scene.get_objects()))
+            self.assertTrue(np.array_equal(expected.get_mesh().vertices, scene.get_mesh().vertices))
+            self.assertIsNotNone(internals.handlers.CacheHandler(self.cache_directory).load(
+                os.path.join(file_path, file_name), lod_levels=3))
+
+    def test_invalidated_on_change(self):
+        file_path, file_name = write_model(self, CUBE_OBJ)
+        self.read(file_path, file_name)
+        with open(os.path.join(file_path, file_name), "w") as file:
+            file.write(TWO_CUBES_OBJ)
+
+        scene = self.read(file_path, file_name)
+        self.assertEqual(24, len(scene.get_mesh()))
+        self.assertEqual(1, len(os.listdir(self.cache_directory)))
+
+
+if __name__ == '__main__':
+    unittest.main()
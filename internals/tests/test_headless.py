@@ -0,0 +1,160 @@
+import contextlib
+import io
+import json
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import interface.headless
+import internals.profiler
+from internals.vectors import Vector, rotate_vector_by_quaternion
+from internals.tests.test_render import TWO_CUBES_OBJ
+
+
+def write_model(directory: str) -> str:
+    path = os.path.join(directory, "model.obj")
+    with open(path, "w") as file:
+        file.write(TWO_CUBES_OBJ)
+    return path
+
+
+class TestCameras(unittest.TestCase):
+
+    def test_read_camera_path(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        path = os.path.join(temporary.name, "cameras.txt")
+        with open(path, "w") as file:
+            file.write("# x y z qw qx qy qz\n0 -10 0 1 0 0 0\n\n1 2 3 0 0 0 1\n")
+        cameras = interface.headless.read_camera_path(path)
+        self.assertEqual([(0, -10, 0), (1, 2, 3)], [position.to_tuple() for position, _ in cameras])
+        self.assertEqual([(1, 0, 0, 0), (0, 0, 0, 1)], [angle.to_tuple() for _, angle in cameras])
+
+        with open(path, "w") as file:
+            file.write("0 -10 0 1 0 0\n")
+        with self.assertRaises(ValueError):
+            interface.headless.read_camera_path(path)
+
+    def test_turntable(self):
+        cameras = interface.headless.turntable(4, distance=10, height=3)
+        self.assertEqual(4, len(cameras))
+        for frame, (position, angle) in enumerate(cameras):
+            orbit = 2 * math.pi * frame / 4
+            self.assertAlmostEqual(10 * math.sin(orbit), position.x)
+            self.assertAlmostEqual(-10 * math.cos(orbit), position.y)
+            self.assertEqual(3, position.z)
+            # every camera looks straight at the origin, along its own y axis
+            direction = rotate_vector_by_quaternion(Vector(0, 0, 0) - position, angle)
+            self.assertAlmostEqual(0, direction.x, places=2)
+            self.assertAlmostEqual(math.sqrt(109), direction.y, places=2)
+            self.assertAlmostEqual(0, direction.z, places=2)
+
+
+class TestRenderFrames(unittest.TestCase):
+
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = temporary.name
+        self.model_path = write_model(self.directory)
+        self.cameras = interface.headless.turntable(2, distance=10)
+
+    def render(self, name: str, **kwargs) -> dict:
+        # the written frames by file name
+        output_directory = os.path.join(self.directory, name)
+        reports = []
+        timings = interface.headless.render_frames(
+            self.model_path, self.cameras, width=30, height=20, output_directory=output_directory,
+            report=lambda index, path, seconds: reports.append((index, os.path.basename(path))), **kwargs
+        )
+        self.assertEqual(2, len(timings))
+        self.assertEqual([(0, "frame_00000.ppm"), (1, "frame_00001.ppm")], reports)
+        frames = dict()
+        for file_name in os.listdir(output_directory):
+            with open(os.path.join(output_directory, file_name), "rb") as file:
+                header = file.read(13)
+                self.assertEqual(b"P6 30 20 255\n", header)
+                frames[file_name] = np.frombuffer(file.read(), dtype=np.uint8).reshape(20, 30, 3)
+        return frames
+
+    def test_serial_and_workers(self):
+        serial = self.render("serial", image_format="ppm")
+        self.assertEqual(["frame_00000.ppm", "frame_00001.ppm"], sorted(serial))
+        workers = self.render("workers", image_format="ppm", workers=2)
+        self.assertEqual(sorted(serial), sorted(workers))
+        for file_name, frame in serial.items():
+            # object colors are picked at random, the covered pixels are the same
+            covered = (frame != frame[0, 0]).any(axis=2)
+            self.assertTrue(covered.any())
+            self.assertTrue(np.array_equal(covered, (workers[file_name] != workers[file_name][0, 0]).any(axis=2)))
+
+    def test_frame_renderer(self):
+        frame_renderer = interface.headless.FrameRenderer(self.model_path, 30, 20, self.directory)
+        try:
+            path, seconds = frame_renderer.render(7, *self.cameras[0])
+        finally:
+            frame_renderer.close()
+        self.assertEqual(os.path.join(self.directory, "frame_00007.png"), path)
+        self.assertGreater(seconds, 0)
+        with open(path, "rb") as file:
+            self.assertTrue(file.read().startswith(b"\x89PNG"))
+
+        with self.assertRaises(KeyError):
+            interface.headless.FrameRenderer(self.model_path, 30, 20, self.directory, image_format="bmp")
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            interface.headless.render_frames(self.model_path, self.cameras, 30, 20, self.directory, workers=2,
+                                             profiler=internals.profiler.Profiler())
+        with self.assertRaises(ValueError):
+            interface.headless.render_frames(self.model_path, self.cameras, 30, 20, self.directory, workers=2,
+                                             render_workers=2)
+
+
+class TestMain(unittest.TestCase):
+
+    def setUp(self):
+        temporary = tempfile.TemporaryDirectory()
+        self.addCleanup(temporary.cleanup)
+        self.directory = temporary.name
+        self.model_path = write_model(self.directory)
+        self.output_directory = os.path.join(self.directory, "frames")
+
+    def run_main(self, *arguments) -> str:
+        output = io.StringIO()
+        with mock.patch("sys.argv", ["headless", self.model_path, self.output_directory, *arguments]), \
+                contextlib.redirect_stdout(output):
+            interface.headless.main()
+        return output.getvalue()
+
+    def test_profile(self):
+        path = os.path.join(self.directory, "profile.json")
+        output = self.run_main("--turntable", "2", "--distance", "10", "--resolution", "30x20", "--profile", path)
+        self.assertEqual(["frame_00000.png", "frame_00001.png"], sorted(os.listdir(self.output_directory)))
+        self.assertIn("p50", output)
+        with open(path) as file:
+            exported = json.load(file)
+        self.assertEqual(2, len(exported["frames"]))
+        self.assertEqual(2, exported["summary"]["frame"]["samples"])
+
+    def test_chrome_trace(self):
+        path = os.path.join(self.directory, "trace.json")
+        self.run_main("--turntable", "1", "--distance", "10", "--resolution", "30x20", "--profile", path,
+                      "--profile-format", "chrome")
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        self.assertIn("frame", {event["name"] for event in events})
+
+    def test_invalid_workers(self):
+        for arguments in (("--workers", "2", "--profile", "profile.json"), ("--workers", "2", "--render-workers", "2")):
+            with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                self.run_main("--turntable", "1", *arguments)
+        self.assertFalse(os.path.exists(self.output_directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+
+import numpy as np
+
+import internals.lod
+from internals.vectors import Vector, Quaternion
+from internals.tests.test_render import TestBoundingVolumeHierarchy, make_scene, make_renderer, CUBE_OBJ
+
+
+def grid_obj(size: int, name: str = "Grid", offset: float = 0, vertex_start: int = 0, normal_start: int = 0) -> str:
+    # size x size quads in the y = offset plane facing the default camera. OBJ indexes are global,
+    # so further objects need the numbers of vertices and normals before them
+    lines = [f"o {name}"]
+    for i in range(size + 1):
+        for j in range(size + 1):
+            lines.append(f"v {i / size * 4 - 2} {offset} {j / size * 4 - 2}")
+    lines.append("vn 0 -1 0")
+    for i in range(size):
+        for j in range(size):
+            corner = vertex_start + i * (size + 1) + j + 1
+            normal = normal_start + 1
+            lines.append(f"f {corner}//{normal} {corner + size + 1}//{normal} "
+                         f"{corner + size + 2}//{normal} {corner + 1}//{normal}")
+    return "\n".join(lines) + "\n"
+
+
+class TestClustering(unittest.TestCase):
+
+    def test_cluster_vertices(self):
+        mesh = TestBoundingVolumeHierarchy.make_grid(32)
+        simplified = internals.lod.cluster_vertices(mesh, cell_size=2)
+
+        self.assertEqual(17 * 17, len(simplified.vertices))
+        self.assertLess(len(simplified), len(mesh))
+        triangles = simplified.triangles
+        self.assertTrue((triangles >= 0).all() and (triangles < len(simplified.vertices)).all())
+        self.assertTrue(((triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2])
+                         & (triangles[:, 2] != triangles[:, 0])).all())
+        self.assertEqual(len(triangles), len(np.unique(np.sort(triangles, axis=1), axis=0)))
+        self.assertTrue((simplified.face_normals == (0, 0, 1)).all())
+
+    def test_generate_levels(self):
+        levels = internals.lod.generate_levels(TestBoundingVolumeHierarchy.make_grid(64), count=3)
+        self.assertEqual(3, len(levels))
+        counts = [2 * 64 * 64] + [len(mesh) for mesh, _ in levels]
+        errors = [error for _, error in levels]
+        self.assertTrue(all(current <= previous / 2 for previous, current in zip(counts, counts[1:])))
+        self.assertEqual(sorted(errors), errors)
+
+    def test_nothing_to_simplify(self):
+        cube = make_scene(CUBE_OBJ).get_mesh()
+        self.assertEqual([], internals.lod.generate_levels(cube))
+
+
+class TestSelection(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = [
+            internals.lod.DetailLevels(np.zeros(3), 1, [(0, 1000), (1000, 1200), (1200, 1250)], [0, 0.1, 0.2]),
+            internals.lod.DetailLevels(np.array((0, 100, 0)), 1, [(1250, 2250), (2250, 2450)], [0, 0.1]),
+        ]
+
+    def test_distance(self):
+        # clusters of the second object look 0.4 pixels large from 104 units away
+        near = internals.lod.select_levels(self.objects, Vector(0, -5, 0), tan_fy=1, screen_height=800)
+        self.assertEqual([0, 1], near)
+        far = internals.lod.select_levels(self.objects, Vector(0, -500, 0), tan_fy=1, screen_height=800)
+        self.assertEqual([2, 1], far)
+
+    def test_budget(self):
+        # levels are only coarsened as far as needed, the budget may stay exceeded at the coarsest levels
+        camera_position = Vector(0, -5, 0)
+        for budget, expected in ((1200, [0, 1]), (1100, [1, 1]), (300, [2, 1]), (0, [2, 1])):
+            self.assertEqual(expected, internals.lod.select_levels(self.objects, camera_position, tan_fy=1,
+                                                                   screen_height=800, budget=budget))
+
+
+class TestSceneLevels(unittest.TestCase):
+
+    def test_lod_mesh(self):
+        scene = make_scene(grid_obj(48) + grid_obj(4, name="Small", offset=1, vertex_start=49 * 49, normal_start=1))
+        mesh, lod_mesh = scene.get_mesh(), scene.get_lod_mesh()
+        self.assertTrue((lod_mesh.vertices[lod_mesh.triangles[:len(mesh)]]
+                         == mesh.vertices[mesh.triangles]).all())
+        self.assertEqual(len(lod_mesh), len(scene.get_triangle_colors()))
+        self.assertEqual(len(scene.get_detail_levels()), 2)
+        for detail_levels, triangle_count in zip(scene.get_detail_levels(), (2 * 48 * 48, 2 * 4 * 4)):
+            self.assertEqual(triangle_count, detail_levels.triangle_count(0))
+            counts = [detail_levels.triangle_count(level) for level in range(len(detail_levels))]
+            self.assertEqual(sorted(counts, reverse=True), counts)
+        self.assertGreater(len(scene.get_detail_levels()[0]), 1)
+        self.assertEqual(2 * 48 * 48 + 2 * 4 * 4, len(mesh))
+
+    def test_renderer_selection(self):
+        scene = make_scene(grid_obj(48))
+        angle = Quaternion.from_euler(0, (0, 1, 0))
+
+        near = make_renderer(scene, Vector(0, -5, 0), angle)
+        self.assertEqual(len(near.render_polygons()), 2 * 48 * 48)
+        self.assertEqual([0], near.detail_levels)
+
+        far = make_renderer(scene, Vector(0, -400, 0), angle)
+        polygons = far.render_polygons()
+        self.assertGreater(far.detail_levels[0], 0)
+        self.assertLess(len(polygons), 2 * 48 * 48)
+        self.assertEqual(far.lod_triangles, len(polygons) + far.frustrum_culled + far.normal_culled)
+
+        budget = make_renderer(scene, Vector(0, -5, 0), angle, triangle_budget=1000)
+        self.assertLessEqual(len(budget.render_polygons()), 1000)
+
+        no_levels = make_renderer(make_scene(grid_obj(48)), Vector(0, -400, 0), angle, lod_tolerance=0)
+        self.assertEqual(len(no_levels.render_polygons()), 2 * 48 * 48)
+
+    def test_moved_levels(self):
+        scene = make_scene(grid_obj(48))
+        model = scene.get_lod_mesh().vertices.copy()
+        errors = list(scene.get_detail_levels()[0].errors)
+        transform = scene.get_objects()["Grid"].transform
+        transform.position = Vector(0, 100, 0)
+        transform.scale = 3
+        scene.update_transforms()
+        # simplified levels move along and look as much coarser as the object got larger
+        self.assertTrue(np.allclose(model * 3 + (0, 100, 0), scene.get_lod_mesh().vertices))
+        self.assertEqual([error * 3 for error in errors], scene.get_detail_levels()[0].errors)
+
+        far = make_renderer(scene, Vector(0, -400, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        far.render_polygons()
+        self.assertGreater(far.detail_levels[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
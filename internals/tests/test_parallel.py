@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+import internals.parallel
+from internals.vectors import Vector, Quaternion
+from internals.tests.test_render import make_scene, make_renderer, TWO_CUBES_OBJ
+from internals.tests.test_lod import grid_obj
+
+
+class TestRenderPool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = internals.parallel.RenderPool(workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def assertSameFrame(self, scene, camera_position, camera_angle, **kwargs):
+        serial = make_renderer(scene, camera_position, camera_angle, **kwargs)
+        parallel = make_renderer(scene, camera_position, camera_angle, render_pool=self.pool, **kwargs)
+        expected = serial.render_triangles()
+        actual = parallel.render_triangles()
+        for attribute in ("points", "vertex_depthes", "depthes", "colors", "indexes"):
+            self.assertTrue(np.array_equal(getattr(expected, attribute), getattr(actual, attribute)), attribute)
+        self.assertEqual(serial.frustrum_culled, parallel.frustrum_culled)
+        self.assertEqual(serial.normal_culled, parallel.normal_culled)
+        return actual
+
+    def test_matches_serial(self):
+        scene = make_scene(grid_obj(24))
+        angle = Quaternion.from_euler(0.2, (0, 0, 1))
+        projected = self.assertSameFrame(scene, Vector(0.5, -3, 0.2), angle)
+        self.assertGreater(len(projected), 0)
+        # a subset from the hierarchy and one without it
+        self.assertSameFrame(scene, Vector(1, -1, 0), angle)
+        self.assertSameFrame(scene, Vector(1, -1, 0), angle, bvh_culling=False)
+
+    def test_culling_counts(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        projected = self.assertSameFrame(scene, Vector(0, -10, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        self.assertEqual(8, len(projected))
+        self.assertSameFrame(scene, Vector(0, 10, 0), Quaternion.from_euler(0, (0, 1, 0)), bvh_culling=False)
+
+    def test_another_mesh(self):
+        self.assertSameFrame(make_scene(grid_obj(8)), Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        self.assertSameFrame(make_scene(grid_obj(12)), Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+
+    def test_moved_object(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        camera_position, camera_angle = Vector(0, -10, 0), Quaternion.from_euler(0, (0, 1, 0))
+        self.assertSameFrame(scene, camera_position, camera_angle)
+        scene.get_objects()["Cube.001"].transform.position = Vector(-3, 0, -3)
+        self.assertSameFrame(scene, camera_position, camera_angle)
+
+
+if __name__ == '__main__':
+    unittest.main()
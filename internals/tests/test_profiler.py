@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import unittest
+
+import internals.profiler
+from internals.vectors import Vector, Quaternion
+from internals.tests.test_render import make_scene, make_renderer, temporary_directory, TWO_CUBES_OBJ
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_frame_sums_stages(self):
+        profiler = internals.profiler.Profiler()
+        with profiler.frame():
+            with profiler.stage("emit", polygons_in=10) as record:
+                record.polygons_out = 8
+            with profiler.stage("emit", polygons_in=8) as record:
+                record.polygons_out = 6
+        summary = profiler.summary()
+        self.assertEqual(1, summary["emit"]["samples"])
+        self.assertEqual(10, summary["emit"]["polygons_in"])
+        self.assertEqual(6, summary["emit"]["polygons_out"])
+        self.assertGreaterEqual(summary["frame"]["mean"], summary["emit"]["mean"])
+
+    def test_threads(self):
+        # a stage of another thread is not part of the frame
+        profiler = internals.profiler.Profiler()
+        with profiler.frame():
+            with profiler.stage("cull"):
+                pass
+            with profiler.stage("draw"):
+                pass
+            other = threading.Thread(target=self.record_draw, args=(profiler,))
+            other.start()
+            other.join()
+        summary = profiler.summary()
+        self.assertEqual(1, summary["cull"]["samples"])
+        self.assertEqual(2, summary["draw"]["samples"])
+
+    @staticmethod
+    def record_draw(profiler):
+        with profiler.stage("draw"):
+            pass
+
+    def test_report_while_recording(self):
+        profiler = internals.profiler.Profiler(history=50)
+        stop = threading.Event()
+
+        def record():
+            while not stop.is_set():
+                with profiler.frame(), profiler.stage("cull"):
+                    pass
+                with profiler.stage("draw"):
+                    pass
+
+        other = threading.Thread(target=record)
+        other.start()
+        try:
+            for _ in range(200):
+                profiler.report()
+                profiler.percentiles("cull")
+        finally:
+            stop.set()
+            other.join()
+        self.assertIn("draw", profiler.summary())
+
+    def test_trace_threads(self):
+        profiler = internals.profiler.Profiler()
+        with profiler.frame(), profiler.stage("cull"):
+            pass
+        other = threading.Thread(target=self.record_draw, args=(profiler,))
+        other.start()
+        other.join()
+        path = os.path.join(temporary_directory(self), "trace.json")
+        profiler.export_chrome_trace(path)
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        threads = {event["name"]: event["tid"] for event in events}
+        self.assertEqual(threading.get_ident(), threads["cull"])
+        self.assertEqual(threads["cull"], threads["frame"])
+        self.assertEqual(other.ident, threads["draw"])
+
+    def test_percentiles(self):
+        profiler = internals.profiler.Profiler(history=100)
+        for index in range(200):
+            record = internals.profiler.StageRecord("cull", 0)
+            record.duration = index
+            profiler._add(record)
+        percentiles = profiler.percentiles("cull")
+        self.assertAlmostEqual(149.5, percentiles["p50"])
+        self.assertAlmostEqual(194.05, percentiles["p95"])
+        self.assertEqual({"p50": None, "p95": None, "p99": None}, profiler.percentiles("draw"))
+
+    def test_disabled(self):
+        profiler = internals.profiler.Profiler(enabled=False)
+        with profiler.frame(), profiler.stage("cull"):
+            pass
+        self.assertEqual({}, profiler.summary())
+
+    def test_renderer_stages(self):
+        profiler = internals.profiler.Profiler()
+        renderer = make_renderer(make_scene(TWO_CUBES_OBJ), Vector(0, -10, 0), Quaternion.from_euler(0, (0, 1, 0)),
+                                 profiler=profiler)
+        with profiler.frame():
+            polygons = renderer.render_polygons()
+        summary = profiler.summary()
+        for name in ("transform", "cull", "shade", "sort", "emit", "frame"):
+            self.assertIn(name, summary)
+        self.assertEqual(24, summary["cull"]["polygons_in"])
+        self.assertEqual(len(polygons), summary["emit"]["polygons_out"])
+        self.assertEqual(len(polygons), summary["sort"]["polygons_out"])
+
+    def test_exports(self):
+        profiler = internals.profiler.Profiler()
+        for _ in range(3):
+            with profiler.frame(), profiler.stage("cull", polygons_in=4) as record:
+                record.polygons_out = 2
+        directory = temporary_directory(self)
+
+        path = os.path.join(directory, "profile.json")
+        profiler.export_json(path)
+        with open(path) as file:
+            exported = json.load(file)
+        self.assertEqual(3, len(exported["frames"]))
+        self.assertEqual(2, exported["frames"][0]["cull"]["polygons_out"])
+        self.assertEqual(3, exported["summary"]["cull"]["samples"])
+
+        path = os.path.join(directory, "trace.json")
+        profiler.export_chrome_trace(path)
+        with open(path) as file:
+            events = json.load(file)["traceEvents"]
+        self.assertEqual(6, len(events))
+        self.assertEqual({"X"}, {event["ph"] for event in events})
+        self.assertEqual([0, 0, 1, 1, 2, 2], [event["args"]["frame"] for event in events])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+import zlib
+
+import numpy as np
+
+import internals.rgb
+from internals.raster import Rasterizer, to_ppm, to_png
+from internals.vectors import Vector, Quaternion
+from internals.tests.test_render import make_scene, make_renderer
+
+
+class TestRasterizer(unittest.TestCase):
+
+    def setUp(self):
+        self.rasterizer = Rasterizer(width=20, height=10, background=internals.rgb.RGB(0, 0, 0))
+
+    def test_fill(self):
+        self.rasterizer.draw_triangles(
+            points=[[[2, 2], [12, 2], [2, 7]]],
+            depthes=[[1, 1, 1]],
+            colors=[[255, 0, 0]],
+        )
+        filled = self.rasterizer.color_buffer[:, :, 0] == 255
+        # pixel centers on the edges are included: 11 + 9 + 7 + 5 + 3 + 1 pixels on rows 2..7
+        self.assertEqual(36, int(filled.sum()))
+        self.assertTrue(filled[2, 2] and filled[2, 12] and filled[7, 2])
+        self.assertFalse(filled[7, 3] or filled[1, 2])
+
+    def test_depth(self):
+        # two overlapping triangles with crossing depthes, each wins on one side
+        self.rasterizer.draw_triangles(
+            points=[[[0, 0], [19, 0], [0, 9]], [[0, 0], [19, 0], [0, 9]]],
+            depthes=[[1, 3, 1], [3, 1, 3]],
+            colors=[[255, 0, 0], [0, 255, 0]],
+        )
+        self.assertEqual([255, 0, 0], self.rasterizer.color_buffer[0, 0].tolist())
+        self.assertEqual([0, 255, 0], self.rasterizer.color_buffer[0, 18].tolist())
+
+        self.rasterizer.draw_triangles(points=[[[0, 0], [19, 0], [0, 9]]], depthes=[[5, 5, 5]], colors=[[9, 9, 9]])
+        self.assertEqual([255, 0, 0], self.rasterizer.color_buffer[0, 0].tolist())
+
+    def test_vertex_colors(self):
+        # corner colors are interpolated, pixels on the corners get them unchanged
+        self.rasterizer.draw_triangles(
+            points=[[[0, 0], [18, 0], [0, 9]]],
+            depthes=[[1, 1, 1]],
+            colors=[[[255, 0, 0], [0, 255, 0], [0, 0, 255]]],
+        )
+        buffer = self.rasterizer.color_buffer
+        self.assertEqual([255, 0, 0], buffer[0, 0].tolist())
+        self.assertEqual([0, 255, 0], buffer[0, 18].tolist())
+        self.assertEqual([0, 0, 255], buffer[9, 0].tolist())
+        self.assertEqual([128, 128, 0], buffer[0, 9].tolist())
+        self.assertEqual([85, 85, 85], buffer[3, 6].tolist())
+
+    def test_small_batches(self):
+        points = [[[0, 0], [19, 0], [0, 9]], [[19, 9], [19, 0], [0, 9]]]
+        self.rasterizer.draw_triangles(points=points, depthes=[[1, 1, 1], [2, 2, 2]], colors=[[1, 1, 1], [2, 2, 2]])
+        expected = self.rasterizer.color_buffer.copy()
+
+        batched = Rasterizer(width=20, height=10, background=internals.rgb.RGB(0, 0, 0), batch_size=7)
+        batched.draw_triangles(points=points, depthes=[[1, 1, 1], [2, 2, 2]], colors=[[1, 1, 1], [2, 2, 2]])
+        self.assertTrue(np.array_equal(expected, batched.color_buffer))
+        self.assertFalse((expected == 0).all(axis=2).any())
+
+    def test_offscreen(self):
+        self.rasterizer.draw_triangles(
+            points=[[[-100, -100], [-50, -100], [-100, -50]], [[0, 0], [0, 5], [0, 9]]],
+            depthes=[[1, 1, 1], [1, 1, 1]],
+            colors=[[255, 255, 255], [255, 255, 255]],
+        )
+        self.assertEqual(0, int(self.rasterizer.color_buffer.sum()))
+
+    def test_lines(self):
+        self.rasterizer.draw_lines(points=[[[0, 5], [30, 5]]], depthes=[[1, 1]], colors=[[0, 0, 255]])
+        self.assertEqual(20, int((self.rasterizer.color_buffer[:, :, 2] == 255).sum()))
+
+    def test_ppm(self):
+        self.assertEqual(b"P6 20 10 255\n", to_ppm(self.rasterizer.color_buffer)[:13])
+        self.assertEqual(13 + 20 * 10 * 3, len(to_ppm(self.rasterizer.color_buffer)))
+
+    def test_png(self):
+        self.rasterizer.draw_triangles(points=[[[2, 2], [12, 2], [2, 7]]], depthes=[[1, 1, 1]], colors=[[255, 0, 0]])
+        png = to_png(self.rasterizer.color_buffer)
+        self.assertEqual(b"\x89PNG\r\n\x1a\n", png[:8])
+        self.assertEqual((20, 10), (int.from_bytes(png[16:20], "big"), int.from_bytes(png[20:24], "big")))
+
+        data_length = int.from_bytes(png[33:37], "big")
+        scanlines = np.frombuffer(zlib.decompress(png[41:41 + data_length]), dtype=np.uint8).reshape(10, -1)
+        self.assertTrue((scanlines[:, 0] == 0).all())
+        self.assertTrue(np.array_equal(self.rasterizer.color_buffer, scanlines[:, 1:].reshape(10, 20, 3)))
+
+
+class TestRenderFrame(unittest.TestCase):
+
+    def test_front_face(self):
+        renderer = make_renderer(make_scene(), Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        frame = renderer.render_frame()
+        self.assertEqual((800, 1200, 3), frame.shape)
+
+        # the y = -1 face spans the square from (500, 300) to (700, 500) on screen
+        polygons = renderer.render_polygons()
+        color = polygons[0].color.to_tuple()
+        self.assertEqual(list(color), frame[350, 650].tolist())
+        self.assertEqual(list(color), frame[301, 501].tolist())
+        self.assertEqual([128, 128, 128], frame[250, 250].tolist())
+        # the y axis starts in front of the face and ends up in the screen center
+        self.assertEqual([255, 0, 0], frame[400, 600].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,638 @@
+import unittest
+import math
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+import internals.bvh
+import internals.handlers
+import internals.objects
+import internals.rgb
+from internals.render import Renderer, DepthOrder
+from internals.vectors import Vector, Quaternion
+
+CUBE_OBJ = """# cube
+o Cube
+v 1.0 1.0 -1.0
+v 1.0 -1.0 -1.0
+v 1.0 1.0 1.0
+v 1.0 -1.0 1.0
+v -1.0 1.0 -1.0
+v -1.0 -1.0 -1.0
+v -1.0 1.0 1.0
+v -1.0 -1.0 1.0
+vn -0.0 1.0 -0.0
+vn -0.0 -0.0 1.0
+vn -1.0 -0.0 -0.0
+vn -0.0 -1.0 -0.0
+vn 1.0 -0.0 -0.0
+vn -0.0 -0.0 -1.0
+s 0
+f 1//1 5//1 7//1 3//1
+f 4//2 3//2 7//2 8//2
+f 8//3 7//3 5//3 6//3
+f 6//4 2//4 4//4 8//4
+f 2//5 1//5 3//5 4//5
+f 6//6 5//6 1//6 2//6
+"""
+
+
+def _shift_cube_line(line: str) -> str:
+    # second cube is moved by 3 along every axis, OBJ indexes are global so faces are offset too
+    prefix = line.split(" ")[0]
+    if prefix == "o":
+        return "o Cube.001"
+    if prefix == "v":
+        return "v " + " ".join(str(float(value) + 3) for value in line.split()[1:])
+    return _offset_faces(line, vertices=8, normals=6)
+
+
+def _offset_faces(line: str, vertices: int, normals: int) -> str:
+    # faces of a model placed after others in the same file
+    if line.split(" ")[0] != "f":
+        return line
+    return "f " + " ".join(
+        f"{int(vertex) + vertices}//{int(normal) + normals}"
+        for vertex, _, normal in (index.split("/") for index in line.split()[1:])
+    )
+
+
+TWO_CUBES_OBJ = CUBE_OBJ + "\n".join(map(_shift_cube_line, CUBE_OBJ.splitlines())) + "\n"
+
+SMOOTH_SQUARE_OBJ = """o Square
+v -1 -2 -1
+v 1 -2 -1
+v 1 -2 1
+v -1 -2 1
+vn -0.5 -1 -0.5
+vn 0.5 -1 -0.5
+vn 0.5 -1 0.5
+vn -0.5 -1 0.5
+s 1
+f 1//1 2//2 3//3 4//4
+"""
+
+# the smooth square in front of the flat cube, facing a camera on the negative y axis
+SQUARE_AND_CUBE_OBJ = SMOOTH_SQUARE_OBJ + "\n".join(
+    _offset_faces(line, vertices=4, normals=4) for line in CUBE_OBJ.splitlines()
+) + "\n"
+
+
+def temporary_directory(test: unittest.TestCase) -> str:
+    # removed when the test ends
+    temporary = tempfile.TemporaryDirectory()
+    test.addCleanup(temporary.cleanup)
+    return temporary.name
+
+
+def make_scene(obj_text: str = CUBE_OBJ) -> internals.handlers.SceneData:
+    # the model is parsed into memory, so its file is not needed afterwards
+    scene = internals.handlers.SceneData()
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "model.obj"), "w") as file:
+            file.write(obj_text)
+        scene.read_file(file_path=directory, file_name="model.obj")
+    return scene
+
+
+def make_renderer(scene, camera_position, camera_angle, **kwargs) -> Renderer:
+    return Renderer(
+        data_handler=scene,
+        tan_fy=math.tan(math.pi / 4),
+        aspect_ratio=1.5,
+        camera_position=camera_position,
+        screen_height=800,
+        camera_angle=camera_angle,
+        light=internals.rgb.Light(
+            intensity=1000,
+            direction=Vector(-1, -1, -1),
+            albedo=0.18,
+            color=internals.rgb.RGB(255, 255, 255),
+        ),
+        **kwargs
+    )
+
+
+def to_comparable(polygons):
+    return [(polygon.to_tuple(), polygon.color.to_tuple()) for polygon in polygons]
+
+
+class RenderTestCase(unittest.TestCase):
+
+    def assertPolygonsAlmostEqual(self, expected, actual, pixels=1):
+        # the per-vertex path rounds every quaternion product to 4 decimals, so points may differ by a pixel
+        # and triangles with nearly equal depth may swap places
+        self.assertEqual(len(expected), len(actual))
+        unmatched = list(actual)
+        for expected_points, expected_color in expected:
+            for candidate in unmatched:
+                actual_points, actual_color = candidate
+                if expected_color == actual_color and all(
+                        abs(expected_coordinate - actual_coordinate) <= pixels
+                        for expected_coordinate, actual_coordinate in zip(expected_points, actual_points)
+                ):
+                    unmatched.remove(candidate)
+                    break
+            else:
+                self.fail(f"No match for polygon {expected_points} with color {expected_color}")
+
+
+class TestBatchedProjection(RenderTestCase):
+    cameras = [
+        (Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0))),
+        (Vector(3, -4, 2), Quaternion.from_euler(0.6, (0, 0, 1))),
+        (Vector(-3, -3, -3), Quaternion.from_euler(-0.7, (1, 0, 1))),
+        (Vector(0, 5, 0), Quaternion.from_euler(math.pi, (0, 0, 1))),
+    ]
+
+    def test_matches_per_vertex(self):
+        scene = make_scene()
+        for camera_position, camera_angle in self.cameras:
+            batched = make_renderer(scene, camera_position, camera_angle, projection_method="batched")
+            per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex")
+            self.assertPolygonsAlmostEqual(
+                to_comparable(per_vertex.render_polygons()),
+                to_comparable(batched.render_polygons()),
+            )
+
+    def test_behind_camera(self):
+        scene = make_scene()
+        renderer = make_renderer(scene, Vector(0, 5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        self.assertEqual([], renderer.render_polygons())
+
+    def test_unknown_method(self):
+        scene = make_scene()
+        renderer = make_renderer(scene, Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)),
+                                 projection_method="unknown")
+        with self.assertRaises(KeyError):
+            renderer.render_polygons()
+
+
+class TestIndexedMesh(RenderTestCase):
+
+    def test_shared_vertices(self):
+        mesh = make_scene().get_mesh()
+        self.assertEqual((8, 3), mesh.vertices.shape)
+        self.assertEqual((12, 3), mesh.triangles.shape)
+        self.assertEqual((12, 3), mesh.face_normals.shape)
+
+    def test_multiple_objects(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        mesh = scene.get_mesh()
+        self.assertEqual((16, 3), mesh.vertices.shape)
+        self.assertEqual(24, len(mesh))
+        self.assertEqual(len(scene.get_polygons()), len(mesh))
+        for polygon, triangle in zip(scene.get_polygons(), mesh.triangles):
+            self.assertEqual(
+                [vertex.to_tuple() for vertex in polygon.vertices],
+                [tuple(mesh.vertices[index]) for index in triangle],
+            )
+
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            batched = make_renderer(scene, camera_position, camera_angle, projection_method="batched")
+            per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex")
+            self.assertPolygonsAlmostEqual(
+                to_comparable(per_vertex.render_polygons()),
+                to_comparable(batched.render_polygons()),
+            )
+
+    def test_render_triangles(self):
+        # same triangles in the same order as render_polygons, tagged with their index in the mesh
+        scene = make_scene(TWO_CUBES_OBJ)
+        mesh = scene.get_mesh()
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            renderer = make_renderer(scene, camera_position, camera_angle)
+            projected = renderer.render_triangles()
+            polygons = renderer.render_polygons()
+
+            self.assertEqual(to_comparable(polygons), [
+                (tuple(points), tuple(color))
+                for points, color in zip(projected.points.reshape(-1, 6).tolist(), projected.colors.tolist())
+            ])
+            self.assertTrue((projected.depthes[:-1] >= projected.depthes[1:]).all())
+            self.assertEqual(len(set(projected.indexes.tolist())), len(projected))
+            self.assertTrue((mesh.face_normals[projected.indexes] != 0).any(axis=1).all())
+
+
+class TestCulling(RenderTestCase):
+
+    def test_counters(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            batched = make_renderer(scene, camera_position, camera_angle, projection_method="batched")
+            per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex")
+            polygons = batched.render_polygons()
+            per_vertex.render_polygons()
+
+            self.assertEqual(per_vertex.frustrum_culled, batched.frustrum_culled)
+            self.assertEqual(per_vertex.normal_culled, batched.normal_culled)
+            self.assertEqual(24, len(polygons) + batched.frustrum_culled + batched.normal_culled)
+
+    def test_front_face(self):
+        # camera in front of the cube only sees the two triangles of the y = -1 face
+        renderer = make_renderer(make_scene(), Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        self.assertEqual(2, len(renderer.render_polygons()))
+        self.assertEqual(0, renderer.frustrum_culled)
+        self.assertEqual(10, renderer.normal_culled)
+
+    def test_behind_camera(self):
+        renderer = make_renderer(make_scene(), Vector(0, 5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        renderer.render_polygons()
+        self.assertEqual(12, renderer.frustrum_culled)
+        self.assertEqual(0, renderer.normal_culled)
+
+
+class TestBoundingVolumeHierarchy(RenderTestCase):
+
+    @staticmethod
+    def make_grid(size: int) -> internals.objects.Mesh:
+        # size x size quads in the z = 0 plane facing up, two triangles each
+        xs, ys = np.meshgrid(np.arange(size + 1), np.arange(size + 1), indexing="ij")
+        vertices = np.stack((xs.ravel(), ys.ravel(), np.zeros(xs.size)), axis=1)
+        corner = (np.arange(size)[:, None] * (size + 1) + np.arange(size)[None, :]).ravel()
+        triangles = np.concatenate((
+            np.stack((corner, corner + size + 1, corner + size + 2), axis=1),
+            np.stack((corner, corner + size + 2, corner + 1), axis=1),
+        ))
+        return internals.objects.Mesh(vertices, [(0, 0, 1)], triangles, np.zeros(len(triangles)))
+
+    def test_structure(self):
+        mesh = self.make_grid(16)
+        bvh = internals.bvh.BoundingVolumeHierarchy(mesh, [(0, 200), (200, len(mesh))], leaf_size=8)
+
+        self.assertEqual(2, len(bvh.roots))
+        self.assertEqual(list(range(len(mesh))), sorted(bvh.triangle_order.tolist()))
+        leaves = bvh.left == -1
+        self.assertTrue((bvh.stop[leaves] - bvh.start[leaves] <= 8).all())
+        self.assertEqual(len(mesh), int((bvh.stop[leaves] - bvh.start[leaves]).sum()))
+        for node in range(len(bvh)):
+            corners = mesh.vertices[mesh.triangles[bvh.triangle_order[bvh.start[node]:bvh.stop[node]]]]
+            self.assertTrue((corners.min(axis=(0, 1)) >= bvh.bounds_min[node]).all())
+            self.assertTrue((corners.max(axis=(0, 1)) <= bvh.bounds_max[node]).all())
+
+    def test_conservative(self):
+        # every triangle with a vertex on screen survives the hierarchy
+        mesh = self.make_grid(32)
+        bvh = internals.bvh.BoundingVolumeHierarchy(mesh, [(0, len(mesh))], leaf_size=16)
+        camera_position = Vector(4, 4, 6)
+        camera_angle = Quaternion.from_euler(math.pi / 2, (1, 0, 0))
+
+        triangles, tested, culled = bvh.cull(camera_position, camera_angle, tan_fy=0.5, aspect_ratio=1.5)
+        rotated = camera_angle.rotate_many(mesh.vertices - np.array(camera_position.to_tuple()))
+        on_screen = (rotated[:, 1] >= 0.1) & (np.abs(rotated[:, 0]) <= rotated[:, 1] * 0.75) \
+            & (np.abs(rotated[:, 2]) <= rotated[:, 1] * 0.5)
+
+        self.assertGreater(culled, 0)
+        self.assertLess(len(triangles), len(mesh))
+        self.assertTrue(set(np.flatnonzero(on_screen[mesh.triangles].any(axis=1)).tolist()) <= set(triangles.tolist()))
+
+    def test_object_culled(self):
+        # the first cube is left of the view, only the second one is in front of the camera
+        scene = make_scene(TWO_CUBES_OBJ)
+        camera_position, camera_angle = Vector(3, 0.5, 3), Quaternion.from_euler(0, (0, 1, 0))
+        culled = make_renderer(scene, camera_position, camera_angle)
+        reference = make_renderer(scene, camera_position, camera_angle, bvh_culling=False)
+
+        self.assertPolygonsAlmostEqual(
+            to_comparable(reference.render_polygons()),
+            to_comparable(culled.render_polygons()),
+        )
+        self.assertEqual(1, culled.nodes_culled)
+        self.assertEqual(12, culled.triangles_skipped)
+        # skipped triangles count as frustrum culled even if they would have been normal culled
+        self.assertEqual(reference.frustrum_culled + reference.normal_culled,
+                         culled.frustrum_culled + culled.normal_culled)
+
+    def test_behind_camera(self):
+        renderer = make_renderer(make_scene(TWO_CUBES_OBJ), Vector(0, 5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        self.assertEqual([], renderer.render_polygons())
+        self.assertEqual(2, renderer.nodes_tested)
+        self.assertEqual(2, renderer.nodes_culled)
+        self.assertEqual(24, renderer.frustrum_culled)
+
+
+class TestTransforms(RenderTestCase):
+
+    def test_static_scene(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        lod_mesh = scene.get_lod_mesh()
+        self.assertEqual([], scene.update_transforms())
+        self.assertIs(lod_mesh, scene.get_lod_mesh())
+
+    def test_moved_object(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        cube, moved = scene.get_objects()["Cube"], scene.get_objects()["Cube.001"]
+        model_vertices = moved.get_mesh().vertices.copy()
+        moved.transform.position = Vector(-3, -3, -3)
+        self.assertEqual(["Cube.001"], scene.update_transforms())
+        self.assertEqual([], scene.update_transforms())
+
+        vertices = scene.get_mesh().vertices
+        self.assertTrue(np.array_equal(cube.get_mesh().vertices, vertices[:8]))
+        self.assertTrue(np.array_equal(cube.get_mesh().vertices, vertices[8:]))
+        # the model stays where the file put it
+        self.assertTrue(np.array_equal(model_vertices, moved.get_mesh().vertices))
+        self.assertTrue(np.allclose([0, 0, 0], scene.get_detail_levels()[1].center))
+
+        # both cubes are in the same place now and look the same from any camera
+        camera_position, camera_angle = TestBatchedProjection.cameras[0]
+        projected = make_renderer(scene, camera_position, camera_angle, bvh_culling=False).render_triangles()
+        points = {index: points.tolist() for index, points in zip(projected.indexes.tolist(), projected.points)}
+        self.assertEqual(sorted(index for index in points if index < 12),
+                         sorted(index - 12 for index in points if index >= 12))
+        for index in points:
+            if index < 12:
+                self.assertEqual(points[index], points[index + 12])
+
+    def test_rotation_and_scale(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        light = make_renderer(scene, *TestBatchedProjection.cameras[0]).light
+        obj = scene.get_objects()["Cube"]
+        scene.get_shaded_colors(light)
+        obj.transform.rotation = Quaternion.from_euler(math.pi / 4, (0, 0, 1))
+        obj.transform.scale = 2
+        scene.update_transforms()
+
+        mesh = scene.get_mesh()
+        model = obj.get_mesh()
+        self.assertTrue(np.allclose(obj.transform.rotation.rotate_many(model.vertices * 2), mesh.vertices[:8]))
+        normals = mesh.face_normals[:12]
+        self.assertTrue(np.allclose(obj.transform.rotation.rotate_many(model.face_normals),
+                                    normals / np.linalg.norm(normals, axis=1)[:, None], atol=1e-3))
+        # the box around the turned cube is wider than the cube
+        self.assertAlmostEqual(math.sqrt(20), scene.get_detail_levels()[0].radius, places=2)
+        # the lighting follows the turned faces
+        self.assertEqual(light.shade(mesh.face_normals, scene.get_triangle_colors()).tolist(),
+                         scene.get_shaded_colors(light).tolist())
+
+        # the refitted hierarchy still holds every triangle
+        bvh = scene.get_bvh()
+        for node in range(len(bvh)):
+            corners = mesh.vertices[mesh.triangles[bvh.triangle_order[bvh.start[node]:bvh.stop[node]]]]
+            self.assertTrue((corners.min(axis=(0, 1)) >= bvh.bounds_min[node] - 1e-9).all())
+            self.assertTrue((corners.max(axis=(0, 1)) <= bvh.bounds_max[node] + 1e-9).all())
+
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            culled = make_renderer(scene, camera_position, camera_angle)
+            per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex")
+            self.assertPolygonsAlmostEqual(
+                to_comparable(per_vertex.render_polygons()),
+                to_comparable(culled.render_polygons()),
+            )
+
+    def test_parent(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        group = internals.objects.Transform()
+        for obj in scene.get_objects().values():
+            obj.transform.parent = group
+        # a new parent counts as a change even where it does not move anything
+        self.assertEqual(["Cube", "Cube.001"], scene.update_transforms())
+        self.assertEqual([], scene.update_transforms())
+
+        group.position = Vector(0, 0, 10)
+        self.assertEqual(["Cube", "Cube.001"], scene.update_transforms())
+        scene.get_objects()["Cube"].transform.position = Vector(1, 0, 0)
+        self.assertEqual(["Cube"], scene.update_transforms())
+        models = [obj.get_mesh().vertices for obj in scene.get_objects().values()]
+        self.assertTrue(np.array_equal(models[0] + (1, 0, 10), scene.get_mesh().vertices[:8]))
+        self.assertTrue(np.array_equal(models[1] + (0, 0, 10), scene.get_mesh().vertices[8:]))
+
+
+class TestInstances(RenderTestCase):
+
+    def test_add_instances(self):
+        scene = make_scene(CUBE_OBJ)
+        cube = scene.get_objects()["Cube"]
+        instances = scene.add_instances("Cube", [internals.objects.Transform(position=Vector(3, 3, 3))])
+        self.assertEqual(["Cube:1"], [instance.name for instance in instances])
+        self.assertIs(cube.get_mesh(), instances[0].get_mesh())
+        # copies of a copy are copies of its source
+        self.assertEqual(["Cube:2", "Cube:3"], [instance.name for instance in scene.add_instances(
+            "Cube:1", [internals.objects.Transform(), internals.objects.Transform()])])
+        self.assertEqual(48, len(scene.get_mesh()))
+        self.assertEqual(4, len(scene.get_detail_levels()))
+
+    def test_placed_like_parsed_objects(self):
+        scene = make_scene(CUBE_OBJ)
+        scene.add_instances("Cube", [internals.objects.Transform(position=Vector(3, 3, 3))])
+        scene.update_transforms()
+        parsed = make_scene(TWO_CUBES_OBJ)
+        self.assertTrue(np.array_equal(parsed.get_mesh().vertices, scene.get_mesh().vertices))
+        self.assertTrue(np.array_equal(parsed.get_mesh().triangles, scene.get_mesh().triangles))
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            self.assertEqual(
+                [points for points, _ in to_comparable(make_renderer(parsed, camera_position, camera_angle,
+                                                                     lod_tolerance=0).render_polygons())],
+                [points for points, _ in to_comparable(make_renderer(scene, camera_position, camera_angle,
+                                                                     lod_tolerance=0).render_polygons())],
+            )
+
+    def test_batched_transforms(self):
+        scene = make_scene(CUBE_OBJ)
+        transforms = [
+            internals.objects.Transform(position=Vector(4 * index, 0, 0),
+                                        rotation=Quaternion.from_euler(index / 3, (0, 0, 1)), scale=1 + index / 4)
+            for index in range(1, 7)
+        ]
+        instances = scene.add_instances("Cube", transforms)
+        self.assertEqual([instance.name for instance in instances], sorted(scene.update_transforms()))
+        model = scene.get_objects()["Cube"].get_mesh()
+        for index, transform in enumerate(transforms):
+            vertices = scene.get_mesh().vertices[8 * (index + 1):8 * (index + 2)]
+            self.assertTrue(np.allclose(transform.apply(model.vertices), vertices))
+
+        transforms[2].position = Vector(0, 0, 20)
+        self.assertEqual(["Cube:3"], scene.update_transforms())
+        self.assertTrue(np.allclose(transforms[2].apply(model.vertices), scene.get_mesh().vertices[24:32]))
+
+    def test_instances_culled(self):
+        # a row of copies along x, the camera only sees the ones in front of it
+        scene = make_scene(CUBE_OBJ)
+        scene.add_instances("Cube", [
+            internals.objects.Transform(position=Vector(4 * index, 0, 0)) for index in range(1, 30)
+        ])
+        camera_position, camera_angle = Vector(0, -8, 0), Quaternion.from_euler(0, (0, 1, 0))
+        culled = make_renderer(scene, camera_position, camera_angle)
+        reference = make_renderer(scene, camera_position, camera_angle, bvh_culling=False)
+        # triangles are only clipped at the near plane, so the reference also keeps copies beside the screen
+        on_screen = [
+            points for points, _ in to_comparable(reference.render_polygons())
+            if any(0 <= x <= 1200 and 0 <= y <= 800 for x, y in zip(points[::2], points[1::2]))
+        ]
+        kept = [points for points, _ in to_comparable(culled.render_polygons())]
+        self.assertGreater(len(on_screen), 0)
+        self.assertTrue(set(on_screen) <= set(kept))
+        self.assertGreater(culled.nodes_culled, 20)
+        self.assertEqual(12 * culled.nodes_culled, culled.triangles_skipped)
+
+    def test_copied_trees(self):
+        grid = TestBoundingVolumeHierarchy.make_grid(16)
+        count = len(grid)
+        mesh = internals.objects.Mesh.merge([grid, grid])
+        built = internals.bvh.BoundingVolumeHierarchy(mesh, [(0, count), (count, 2 * count)], leaf_size=8)
+        copied = internals.bvh.BoundingVolumeHierarchy(mesh, [(0, count), (count, 2 * count)], leaf_size=8,
+                                                       copies={1: 0})
+        for attribute in ("left", "right", "start", "stop", "roots", "triangle_order", "bounds_min", "bounds_max"):
+            self.assertTrue(np.array_equal(getattr(built, attribute), getattr(copied, attribute)), attribute)
+
+
+class TestDepthOrder(RenderTestCase):
+
+    def test_sorted(self):
+        generator = np.random.default_rng(0)
+        depth_order = DepthOrder()
+        indexes = np.arange(1000)
+        for _ in range(5):
+            depthes = generator.random(1000).round(2)
+            visible = np.sort(generator.choice(indexes, 700, replace=False))
+            order = depth_order.sort(depthes[visible], visible)
+            self.assertEqual(sorted(order.tolist()), list(range(700)))
+            self.assertTrue((np.diff(depthes[visible][order]) <= 0).all())
+
+    def test_ties_keep_previous_order(self):
+        depth_order = DepthOrder()
+        indexes = np.array([0, 1, 2, 3])
+        self.assertEqual([1, 3, 0, 2], depth_order.sort(np.array([1.0, 2.0, 1.0, 2.0]), indexes).tolist())
+        # 1 and 3 tie again, 0 and 2 now tie with 1 and 3 but stay after them
+        self.assertEqual([1, 3, 0, 2], depth_order.sort(np.array([1.0, 1.0, 1.0, 1.0]), indexes).tolist())
+        # triangle 2 is gone, the result are positions into the new arrays
+        self.assertEqual([1, 2, 0], depth_order.sort(np.array([1.0, 1.0, 1.0]), np.array([0, 1, 3])).tolist())
+
+    def test_reused_between_frames(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        depth_order = DepthOrder()
+        for camera_position, camera_angle in TestBatchedProjection.cameras:
+            reused = make_renderer(scene, camera_position, camera_angle, depth_order=depth_order)
+            fresh = make_renderer(scene, camera_position, camera_angle)
+            self.assertEqual(
+                sorted(to_comparable(fresh.render_polygons())),
+                sorted(to_comparable(reused.render_polygons())),
+            )
+            self.assertTrue((np.diff(reused.render_triangles().depthes) <= 0).all())
+
+    def test_interpolation_methods(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        for method in ("average", "nearest", "furthest"):
+            for camera_position, camera_angle in TestBatchedProjection.cameras:
+                batched = make_renderer(scene, camera_position, camera_angle, depth_interpolation_method=method)
+                per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex",
+                                           depth_interpolation_method=method)
+                self.assertPolygonsAlmostEqual(
+                    to_comparable(per_vertex.render_polygons()),
+                    to_comparable(batched.render_polygons()),
+                )
+        with self.assertRaises(KeyError):
+            make_renderer(scene, *TestBatchedProjection.cameras[0], depth_interpolation_method="median").render_lines()
+
+    def test_lines(self):
+        renderer = make_renderer(make_scene(), Vector(0, -5, 0), Quaternion.from_euler(0, (0, 1, 0)))
+        lines = renderer.render_lines()
+        # all axis lines are in front of the camera, nearest first
+        self.assertEqual(3, len(lines))
+        depthes = [
+            (Vector(*line.vertices[0].to_tuple()) - renderer.camera_position).length
+            + (Vector(*line.vertices[1].to_tuple()) - renderer.camera_position).length
+            for line in renderer.data_handler.get_lines()
+        ]
+        self.assertEqual(sorted(range(3), key=lambda index: depthes[index]),
+                         [["blue", "red", "green"].index(line.color) for line in lines])
+
+
+class TestShadingCache(unittest.TestCase):
+
+    def test_camera_moves_skip_lighting(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        with mock.patch.object(internals.rgb, "shade", side_effect=internals.rgb.shade) as shade:
+            for camera_position, camera_angle in TestBatchedProjection.cameras:
+                make_renderer(scene, camera_position, camera_angle).render_polygons()
+            # once per object
+            self.assertEqual(2, shade.call_count)
+
+    def test_light_change(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        mesh = scene.get_lod_mesh()
+        camera_position, camera_angle = TestBatchedProjection.cameras[0]
+        renderer = make_renderer(scene, camera_position, camera_angle)
+        renderer.render_polygons()
+
+        light = internals.rgb.Light(
+            intensity=500,
+            direction=Vector(1, -1, 0),
+            albedo=0.18,
+            color=internals.rgb.RGB(255, 255, 255),
+        )
+        renderer.light = light
+        projected = renderer.render_triangles()
+        expected = light.shade(mesh.face_normals, scene.get_triangle_colors())
+        self.assertEqual(expected[projected.indexes].tolist(), projected.colors.tolist())
+        self.assertEqual(
+            [internals.rgb.RGB(*color).to_hex() for color in expected.tolist()],
+            scene.get_shaded_hex(light),
+        )
+
+    def test_invalidate_object(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        light = make_renderer(scene, *TestBatchedProjection.cameras[0]).light
+        scene.get_shaded_colors(light)
+        with mock.patch.object(internals.rgb, "shade", side_effect=internals.rgb.shade) as shade:
+            scene.invalidate_shading("Cube.001")
+            scene.get_shaded_colors(light)
+            # lit once per normal of the object, not per triangle
+            self.assertEqual(1, shade.call_count)
+            self.assertEqual(6, len(shade.call_args.args[1]))
+
+
+class TestSmoothShading(unittest.TestCase):
+
+    def setUp(self):
+        self.scene = make_scene(SQUARE_AND_CUBE_OBJ)
+        self.camera = (Vector(0, -5, 0.5), Quaternion.from_euler(0, (0, 1, 0)))
+
+    def test_lod_mesh_shares_normals(self):
+        self.assertEqual(len(self.scene.get_mesh().normals), len(self.scene.get_lod_mesh().normals))
+        self.assertEqual([True] * 2 + [False] * 12, self.scene.get_smooth_triangles().tolist())
+
+    def test_shading_methods(self):
+        flat = make_renderer(self.scene, *self.camera).render_triangles()
+        self.assertIsNone(flat.vertex_colors)
+
+        renderer = make_renderer(self.scene, *self.camera, shading_method="smooth")
+        smooth = renderer.render_triangles()
+        self.assertTrue(np.array_equal(flat.indexes, smooth.indexes))
+        mesh = self.scene.get_lod_mesh()
+        corner_normals = mesh.corner_normals[smooth.indexes]
+        expected = renderer.light.shade(mesh.normals[corner_normals].reshape(-1, 3),
+                                        np.repeat(self.scene.get_triangle_colors()[smooth.indexes], 3, axis=0))
+        self.assertTrue(np.array_equal(expected.reshape(-1, 3, 3), smooth.vertex_colors))
+        self.assertTrue(np.array_equal(smooth.vertex_colors.sum(axis=1) // 3, smooth.colors))
+
+        # corners of flat objects keep their face color
+        square = np.isin(smooth.indexes, [0, 1])
+        self.assertTrue((smooth.vertex_colors[square] != smooth.vertex_colors[square][:, :1]).any())
+        self.assertTrue((smooth.vertex_colors[~square] == smooth.colors[~square][:, None]).all())
+
+        by_object = make_renderer(self.scene, *self.camera, shading_method="object").render_triangles()
+        self.assertTrue(np.array_equal(smooth.vertex_colors, by_object.vertex_colors))
+
+        with self.assertRaises(KeyError):
+            make_renderer(self.scene, *self.camera, shading_method="phong").render_triangles()
+
+    def test_object_method(self):
+        scene = make_scene(TWO_CUBES_OBJ.replace("s 0", "s 1", 1))
+        by_object = make_renderer(scene, Vector(0, -10, 3), Quaternion.from_euler(0, (0, 1, 0)),
+                                  shading_method="object").render_triangles()
+        flat = make_renderer(scene, Vector(0, -10, 3), Quaternion.from_euler(0, (0, 1, 0))).render_triangles()
+        self.assertTrue(np.array_equal(flat.colors, by_object.colors))
+        self.assertIsNotNone(by_object.vertex_colors)
+
+    def test_render_frame(self):
+        flat = make_renderer(self.scene, *self.camera).render_frame()
+        smooth = make_renderer(self.scene, *self.camera, shading_method="smooth").render_frame()
+        self.assertEqual(flat.shape, smooth.shape)
+        self.assertTrue((flat != smooth).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
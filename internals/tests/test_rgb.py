@@ -0,0 +1,125 @@
+import math
+import unittest
+
+import numpy as np
+
+import internals.rgb
+import internals.tests.test_render
+from internals.vectors import Vector
+from internals.tests.test_render import make_scene, make_renderer, TWO_CUBES_OBJ
+
+# importing the test case itself would run its tests again in this module
+cameras = internals.tests.test_render.TestBatchedProjection.cameras
+
+
+class TestHexPalette(unittest.TestCase):
+
+    def test_zero_padded(self):
+        self.assertEqual("#0a00ff", internals.rgb.RGB(10, 0, 255).to_hex())
+        self.assertEqual(["#0a00ff", "#010203"], internals.rgb.HexPalette().lookup(np.array([[10, 0, 255], [1, 2, 3]])))
+
+    def test_strings_are_reused(self):
+        palette = internals.rgb.HexPalette()
+        colors = np.array([[10, 20, 30], [40, 50, 60], [10, 20, 30]])
+        first = palette.lookup(colors)
+        second = palette.lookup(colors[::-1])
+        self.assertEqual(2, len(palette))
+        self.assertIs(first[0], first[2])
+        self.assertIs(first[1], second[1])
+
+    def test_quantized(self):
+        palette = internals.rgb.HexPalette(levels=16)
+        self.assertEqual(["#000011", "#ffff88"], palette.lookup(np.array([[0, 8, 9], [255, 254, 128]])))
+        with self.assertRaises(ValueError):
+            internals.rgb.HexPalette(levels=1)
+
+    def test_scene_fills(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        light = make_renderer(scene, *cameras[0]).light
+        exact = list(scene.get_shaded_hex(light))
+        self.assertEqual([internals.rgb.RGB(*color).to_hex() for color in scene.get_shaded_colors(light).tolist()],
+                         exact)
+        palette = internals.rgb.HexPalette(levels=4)
+        self.assertEqual(palette.lookup(scene.get_shaded_colors(light)), scene.get_shaded_hex(light, palette))
+
+
+class TestLights(unittest.TestCase):
+    normals = np.array([[0, -1, 0], [1, 0, 0], [0, 1, 0], [-1, -1, 0]], dtype=np.float64)
+    colors = np.full((4, 3), 100)
+
+    @staticmethod
+    def make_light(direction, intensity=10, color=internals.rgb.RGB(255, 255, 255)):
+        return internals.rgb.Light(intensity=intensity, direction=direction, albedo=1, color=color)
+
+    def test_single_light(self):
+        light = self.make_light(Vector(-1, -1, -1))
+        direction = np.array(light.direction.to_tuple())
+        cosines = self.normals @ direction / (np.linalg.norm(self.normals, axis=1) * np.linalg.norm(direction))
+        expected = np.clip(self.colors * (10 * cosines / math.pi)[:, None], 0, 255).astype(np.int64)
+        self.assertEqual(expected.tolist(), light.shade(self.normals, self.colors).tolist())
+
+    def test_color_tints(self):
+        shaded = self.make_light(Vector(0, -1, 0), color=internals.rgb.RGB(255, 0, 0)).shade(self.normals, self.colors)
+        self.assertEqual([[255, 0, 0]] + [[0, 0, 0]] * 2, shaded[:3].tolist())
+
+    def test_lights_add_up(self):
+        lights = [self.make_light(Vector(0, -1, 0), intensity=1), self.make_light(Vector(1, 0, 0), intensity=2)]
+        shaded = internals.rgb.shade(lights, self.normals, self.colors)
+        separate = sum(light.shade(self.normals, self.colors) for light in lights)
+        self.assertTrue((np.abs(shaded - separate) <= 1).all())
+        # a light behind a surface does not take away from the others
+        self.assertEqual([31, 63, 0], shaded[:3, 0].tolist())
+
+    def test_point_light(self):
+        light = internals.rgb.PointLight(intensity=20, position=Vector(0, -2, 0), albedo=1,
+                                         color=internals.rgb.RGB(255, 255, 255))
+        normals = np.array([[0, -1, 0], [0, -1, 0], [0, 1, 0]], dtype=np.float64)
+        positions = np.array([[0, 0, 0], [0, 2, 0], [0, 0, 0]], dtype=np.float64)
+        shaded = light.shade(normals, np.full((3, 3), 100), positions)
+        # the light falls off with the square of the distance
+        self.assertEqual([int(20 * 100 / math.pi / 4), int(20 * 100 / math.pi / 16), 0], shaded[:, 0].tolist())
+        with self.assertRaises(ValueError):
+            internals.rgb.shade([light], normals, np.full((3, 3), 100))
+
+    def test_zero_normal(self):
+        normals = np.array([[0, 0, 0], [0, -1, 0]], dtype=np.float64)
+        point = internals.rgb.PointLight(intensity=20, position=Vector(0, -2, 0), albedo=1,
+                                         color=internals.rgb.RGB(255, 255, 255))
+        shaded = internals.rgb.shade([self.make_light(Vector(0, -1, 0)), point], normals, np.full((2, 3), 100),
+                                     np.zeros((2, 3)))
+        self.assertEqual([0, 0, 0], shaded[0].tolist())
+        self.assertTrue((shaded[1] > 0).all())
+
+    def test_point_light_on_surface(self):
+        light = internals.rgb.PointLight(intensity=20, position=Vector(0, 0, 0), albedo=1,
+                                         color=internals.rgb.RGB(255, 255, 255))
+        shaded = light.shade(np.array([[0, -1, 0]], dtype=np.float64), np.full((1, 3), 100), np.zeros((1, 3)))
+        self.assertEqual([[0, 0, 0]], shaded.tolist())
+
+    def test_renderers_agree(self):
+        scene = make_scene(TWO_CUBES_OBJ)
+        lights = [
+            self.make_light(Vector(-1, -1, -1), intensity=3, color=internals.rgb.RGB(255, 128, 0)),
+            internals.rgb.PointLight(intensity=200, position=Vector(0, -6, 4), albedo=1,
+                                     color=internals.rgb.RGB(0, 128, 255)),
+        ]
+        for camera_position, camera_angle in cameras:
+            batched = make_renderer(scene, camera_position, camera_angle)
+            per_vertex = make_renderer(scene, camera_position, camera_angle, projection_method="per_vertex")
+            batched.light = per_vertex.light = lights
+            self.assertEqual(
+                sorted(polygon.color.to_tuple() for polygon in per_vertex.render_polygons()),
+                sorted(polygon.color.to_tuple() for polygon in batched.render_polygons()),
+            )
+        self.assertNotEqual(list(scene.get_shaded_hex(lights)), scene.get_shaded_hex(lights[0]))
+
+        smooth = make_renderer(scene, *cameras[0], shading_method="smooth")
+        smooth.light = lights
+        projected = smooth.render_triangles()
+        # corners of a flat face only differ by their distance to the point light
+        self.assertEqual((len(projected), 3, 3), projected.vertex_colors.shape)
+        self.assertTrue((projected.vertex_colors != projected.vertex_colors[:, :1]).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
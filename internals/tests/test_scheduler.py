@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+import internals.scheduler
+
+
+class TestRenderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.rendered = []
+
+    def render(self, request):
+        self.started.set()
+        self.release.wait(5)
+        self.rendered.append(request)
+        if request == "error":
+            raise ValueError(request)
+        return request * 2
+
+    def make_scheduler(self):
+        scheduler = internals.scheduler.RenderScheduler(self.render)
+        self.addCleanup(scheduler.close)
+        self.addCleanup(self.release.set)
+        return scheduler
+
+    def test_render(self):
+        scheduler = self.make_scheduler()
+        self.assertIsNone(scheduler.poll())
+        self.release.set()
+        scheduler.request(2)
+        self.assertTrue(scheduler.wait(5))
+        self.assertEqual(4, scheduler.poll())
+        self.assertIsNone(scheduler.poll())
+        self.assertFalse(scheduler.busy)
+
+    def test_coalescing(self):
+        scheduler = self.make_scheduler()
+        scheduler.request(1)
+        self.assertTrue(self.started.wait(5))
+        # requests made while 1 renders replace each other, 1 is stale once it is done
+        for request in range(2, 6):
+            scheduler.request(request)
+        self.assertTrue(scheduler.busy)
+        self.release.set()
+        self.assertTrue(scheduler.wait(5))
+
+        self.assertEqual([1, 5], self.rendered)
+        self.assertEqual(10, scheduler.poll())
+        self.assertEqual((5, 3, 1, 1), (scheduler.requested, scheduler.coalesced, scheduler.rendered,
+                                        scheduler.dropped))
+
+    def test_error(self):
+        scheduler = self.make_scheduler()
+        self.release.set()
+        scheduler.request("error")
+        self.assertTrue(scheduler.wait(5))
+        with self.assertRaises(ValueError):
+            scheduler.poll()
+        scheduler.request(3)
+        self.assertTrue(scheduler.wait(5))
+        self.assertEqual(6, scheduler.poll())
+
+    def test_close(self):
+        scheduler = internals.scheduler.RenderScheduler(self.render)
+        self.release.set()
+        scheduler.close()
+        with self.assertRaises(RuntimeError):
+            scheduler.request(1)
+
+
+if __name__ == '__main__':
+    unittest.main()
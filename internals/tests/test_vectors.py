@@ -1,5 +1,5 @@
 import unittest
-from internals.vectors import Vector, Quaternion, rotate_vector_by_quaternion
+from internals.vectors import Vector, Quaternion, rotate_vector_by_quaternion, set_rounding
 from math import pi
 import math
 
@@ -137,5 +137,43 @@ class TestVectorRotation(unittest.TestCase):
     # TODO make sure quaternion rotation works as intended as there are strange behaviours observed when rotating along non-X axis
 
 
+class TestRotationMatrix(unittest.TestCase):
+    def test_rotate_many(self):
+        quaternion = Quaternion.from_euler(0.7, (1, 2, -3))
+        vectors = [Vector(1, 0, 0), Vector(0, -2, 0), Vector(3, 4, 5)]
+        rotated = quaternion.rotate_many(vectors)
+        for vector, row in zip(vectors, rotated):
+            expected = rotate_vector_by_quaternion(vector, quaternion).to_tuple()
+            for expected_coordinate, coordinate in zip(expected, row):
+                self.assertAlmostEqual(expected_coordinate, coordinate, places=3)
+
+    def test_cached(self):
+        quaternion = Quaternion.from_euler(pi / 2, (0, 0, 1))
+        self.assertIs(quaternion.rotation_matrix, quaternion.rotation_matrix)
+        quaternion.w = 1
+        quaternion.z = 0
+        self.assertEqual([[1, 0, 0], [0, 1, 0], [0, 0, 1]], quaternion.rotation_matrix.tolist())
+
+
+class TestRounding(unittest.TestCase):
+    def tearDown(self):
+        set_rounding(True)
+
+    def test_disabled(self):
+        self.assertTrue(set_rounding(False))
+        vector = Vector(1, 1, 0).normalize()
+        self.assertEqual(1 / 2 ** 0.5, vector.x)
+
+    def test_enabled(self):
+        set_rounding(False)
+        self.assertFalse(set_rounding(True))
+        quaternion = Quaternion(0.70711, 0.70711, 0, 0) * Quaternion(0.70711, 0, 0.70711, 0)
+        self.assertEqual((0.5, 0.5, 0.5, 0.5), quaternion.to_tuple())
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            Vector(1, 2, 3).w = 4
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,28 @@
 import math
+import numpy as np
+
+# Results of multiplications and normalizations are rounded to 4 decimals unless disabled with set_rounding
+_round = round
+
+
+def _keep(value: float, ndigits: int) -> float:
+    return value
+
+
+def set_rounding(enabled: bool) -> bool:
+    # Switches rounding for every thread of the process and returns the previous setting. Call it at startup,
+    # before renderers run on other threads: a switch in the middle of a frame mixes rounded and unrounded math
+    global _round
+    previous = _round is round
+    _round = round if enabled else _keep
+    return previous
 
 
 class Vector:
-    x: float = 0
-    y: float = 0
-    z: float = 0
+    __slots__ = ("x", "y", "z")
+    x: float
+    y: float
+    z: float
 
     def __init__(self, x, y, z):
         self.x = float(x)
@@ -22,13 +40,13 @@ class Vector:
         return (self.x ** 2 + self.y ** 2 + self.z ** 2) ** 0.5
 
     def dot_product(self, other) -> float:
-        if type(other) == Vector:
+        if type(other) is Vector:
             return self.x * other.x + self.y * other.y + self.z * other.z
         else:
             raise TypeError(f'Unsupported dot product operation for Vector and {type(other)}')
 
     def __add__(self, other):
-        if type(other) != Vector:
+        if type(other) is not Vector:
             raise TypeError
         return Vector(
             x=self.x + other.x,
@@ -37,7 +55,7 @@ class Vector:
         )
 
     def __sub__(self, other):
-        if type(other) != Vector:
+        if type(other) is not Vector:
             raise TypeError
         return Vector(
             x=self.x - other.x,
@@ -46,13 +64,13 @@ class Vector:
         )
 
     def __mul__(self, other):
-        if type(other) == Vector:
+        if type(other) is Vector:
             raise NotImplementedError
-        if type(other) == int or type(other) == float:
+        if type(other) is int or type(other) is float:
             return Vector(
-                x=round(self.x * other, 4),
-                y=round(self.y * other, 4),
-                z=round(self.z * other, 4)
+                x=_round(self.x * other, 4),
+                y=_round(self.y * other, 4),
+                z=_round(self.z * other, 4)
             )
         else:
             raise TypeError
@@ -60,22 +78,27 @@ class Vector:
     def normalize(self):
         length = self.length
         return Vector(
-            x=round(self.x / length, 4),
-            y=round(self.y / length, 4),
-            z=round(self.z / length, 4)
+            x=_round(self.x / length, 4),
+            y=_round(self.y / length, 4),
+            z=_round(self.z / length, 4)
         )
 
 
 class Quaternion(Vector):
-    w: float = 0
+    __slots__ = ("w", "_rotation_matrix", "_rotation_key")
+    w: float
+    _rotation_matrix: np.ndarray | None
+    _rotation_key: tuple | None
 
     def __init__(self, w, x, y, z):
         super().__init__(x, y, z)
         self.w = float(w)
+        self._rotation_matrix = None
+        self._rotation_key = None
 
     @staticmethod
     def from_euler(rotation_angle: float | int, rotate_axis: Vector | tuple):
-        if type(rotate_axis) == tuple:
+        if type(rotate_axis) is tuple:
             rotate_axis = Vector(
                 x=rotate_axis[0],
                 y=rotate_axis[1],
@@ -85,10 +108,10 @@ class Quaternion(Vector):
         rotate_axis = rotate_axis.normalize()
 
         return Quaternion(
-            w=round(math.cos(rotation_angle / 2), 4),
-            x=round(rotate_axis.x * math.sin(rotation_angle / 2), 4),
-            y=round(rotate_axis.y * math.sin(rotation_angle / 2), 4),
-            z=round(rotate_axis.z * math.sin(rotation_angle / 2), 4)
+            w=_round(math.cos(rotation_angle / 2), 4),
+            x=_round(rotate_axis.x * math.sin(rotation_angle / 2), 4),
+            y=_round(rotate_axis.y * math.sin(rotation_angle / 2), 4),
+            z=_round(rotate_axis.z * math.sin(rotation_angle / 2), 4)
         )
 
     @property
@@ -119,24 +142,24 @@ class Quaternion(Vector):
     def __mul__(self, other):
         if type(other) == int | float:
             return Quaternion(
-                w=round(self.w * other, 4),
-                x=round(self.x * other, 4),
-                y=round(self.y * other, 4),
-                z=round(self.z * other, 4)
+                w=_round(self.w * other, 4),
+                x=_round(self.x * other, 4),
+                y=_round(self.y * other, 4),
+                z=_round(self.z * other, 4)
             )
-        elif type(other) == Quaternion:
+        elif type(other) is Quaternion:
             return Quaternion(
-                w=round(self.w * other.w - self.x * other.x - self.y * other.y - self.z * other.z, 4),
-                x=round(self.w * other.x + self.x * other.w + self.y * other.z - self.z * other.y, 4),
-                y=round(self.w * other.y - self.x * other.z + self.y * other.w + self.z * other.x, 4),
-                z=round(self.w * other.z + self.x * other.y - self.y * other.x + self.z * other.w, 4)
+                w=_round(self.w * other.w - self.x * other.x - self.y * other.y - self.z * other.z, 4),
+                x=_round(self.w * other.x + self.x * other.w + self.y * other.z - self.z * other.y, 4),
+                y=_round(self.w * other.y - self.x * other.z + self.y * other.w + self.z * other.x, 4),
+                z=_round(self.w * other.z + self.x * other.y - self.y * other.x + self.z * other.w, 4)
             )
-        elif type(other) == Vector:
+        elif type(other) is Vector:
             return Quaternion(
-                w=round(-self.x * other.x - self.y * other.y - self.z * other.z, 4),
-                x=round(self.w * other.x + self.y * other.z - self.z * other.y, 4),
-                y=round(self.w * other.y - self.x * other.z + self.z * other.x, 4),
-                z=round(self.w * other.z + self.x * other.y - self.y * other.x, 4)
+                w=_round(-self.x * other.x - self.y * other.y - self.z * other.z, 4),
+                x=_round(self.w * other.x + self.y * other.z - self.z * other.y, 4),
+                y=_round(self.w * other.y - self.x * other.z + self.z * other.x, 4),
+                z=_round(self.w * other.z + self.x * other.y - self.y * other.x, 4)
             )
         else:
             raise TypeError
@@ -147,6 +170,29 @@ class Quaternion(Vector):
     def dot_product(self, other):
         raise NotImplementedError
 
+    @property
+    def rotation_matrix(self) -> np.ndarray:
+        # Matrix form of q * v * q.invert() as done by rotate_vector_by_quaternion, without intermediate rounding.
+        # Computed once and reused until one of the components changes
+        key = self.to_tuple()
+        if self._rotation_key != key:
+            w, x, y, z = key
+            matrix = np.array([
+                [w * w + x * x - y * y - z * z, 2 * (x * y - w * z), 2 * (x * z + w * y)],
+                [2 * (x * y + w * z), w * w - x * x + y * y - z * z, 2 * (y * z - w * x)],
+                [2 * (x * z - w * y), 2 * (y * z + w * x), w * w - x * x - y * y + z * z],
+            ], dtype=np.float64)
+            matrix.flags.writeable = False
+            self._rotation_matrix = matrix
+            self._rotation_key = key
+        return self._rotation_matrix
+
+    def rotate_many(self, vectors) -> np.ndarray:
+        # Rotates an (N, 3) array or a sequence of Vectors, returns an (N, 3) array
+        if not isinstance(vectors, np.ndarray):
+            vectors = np.array([vector.to_tuple() for vector in vectors], dtype=np.float64).reshape(-1, 3)
+        return vectors @ self.rotation_matrix.T
+
 
 def rotate_vector_by_quaternion(vector: Vector, quaternion: Quaternion) -> Vector:
     resulting_vector = quaternion * vector